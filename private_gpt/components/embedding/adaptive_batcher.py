@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_mb() -> float | None:
+    """Resident memory of the current process, or None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _is_out_of_memory(e: BaseException) -> bool:
+    # torch raises a RuntimeError (or its OutOfMemoryError subclass)
+    return isinstance(e, MemoryError) or (
+        isinstance(e, RuntimeError) and "out of memory" in str(e).lower()
+    )
+
+
+class AdaptiveEmbeddingBatcher(TransformComponent):
+    """Embedding transformation sizing its batches from the measured latency.
+
+    The nodes are sorted by length before being batched, so that each batch
+    holds chunks of similar length and the model pads them less. The batch
+    size then doubles while a batch takes less than half `target_latency_s`,
+    and halves when it takes longer than `target_latency_s`, when the process
+    memory exceeds `max_memory_mb` or when the model runs out of memory (the
+    batch is then retried). A batch never holds more than `max_batch_chars`
+    characters, which bounds the memory used by batches of long chunks.
+
+    The learnt batch size is kept across calls.
+    """
+
+    _model: BaseEmbedding = PrivateAttr()
+    _batch_size: int = PrivateAttr()
+    _min_batch_size: int = PrivateAttr()
+    _max_batch_size: int = PrivateAttr()
+    _target_latency_s: float = PrivateAttr()
+    _max_batch_chars: int = PrivateAttr()
+    _max_memory_mb: int = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+    _nodes: int = PrivateAttr()
+    _batches: int = PrivateAttr()
+    _busy_s: float = PrivateAttr()
+
+    def __init__(
+        self,
+        model: BaseEmbedding,
+        initial_batch_size: int = 16,
+        min_batch_size: int = 1,
+        max_batch_size: int = 256,
+        target_latency_s: float = 2.0,
+        max_batch_chars: int = 200_000,
+        max_memory_mb: int = 0,
+    ) -> None:
+        super().__init__()
+        assert 0 < min_batch_size <= max_batch_size, "Invalid batch size bounds"
+        self._model = model
+        self._min_batch_size = min_batch_size
+        self._max_batch_size = max_batch_size
+        self._batch_size = min(max(initial_batch_size, min_batch_size), max_batch_size)
+        self._target_latency_s = target_latency_s
+        self._max_batch_chars = max_batch_chars
+        self._max_memory_mb = max_memory_mb
+        self._lock = threading.Lock()
+        self._nodes = 0
+        self._batches = 0
+        self._busy_s = 0.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "AdaptiveEmbeddingBatcher"
+
+    @property
+    def model(self) -> BaseEmbedding:
+        return self._model
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    def _next_batch(self, texts: list[str], start: int) -> int:
+        """End of the batch starting at `start`, within the size and char budget."""
+        end = start
+        chars = 0
+        while end < len(texts) and end - start < self._batch_size:
+            chars += len(texts[end])
+            # A single chunk longer than the budget still gets its own batch
+            if chars > self._max_batch_chars and end > start:
+                break
+            end += 1
+        return end
+
+    def _resize(self, batch_len: int, latency_s: float) -> None:
+        with self._lock:
+            rss_mb = _rss_mb() if self._max_memory_mb > 0 else None
+            if latency_s > self._target_latency_s or (
+                rss_mb is not None and rss_mb > self._max_memory_mb
+            ):
+                self._batch_size = max(self._batch_size // 2, self._min_batch_size)
+            elif (
+                latency_s < self._target_latency_s / 2
+                # Only grow when the batch was full, not cut by the char budget
+                and batch_len >= self._batch_size
+            ):
+                self._batch_size = min(self._batch_size * 2, self._max_batch_size)
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        embeddings: list[list[float]] = []
+        start = 0
+        while start < len(texts):
+            end = self._next_batch(texts, start)
+            batch_start = time.perf_counter()
+            try:
+                batch = self._model._get_text_embeddings(texts[start:end])
+            except Exception as e:
+                if not _is_out_of_memory(e) or end - start <= self._min_batch_size:
+                    raise
+                with self._lock:
+                    self._batch_size = max((end - start) // 2, self._min_batch_size)
+                    # Do not grow back to the size that failed
+                    self._max_batch_size = max(self._batch_size, self._min_batch_size)
+                logger.warning(
+                    "Out of memory embedding a batch of size=%s, retrying with size=%s",
+                    end - start,
+                    self._batch_size,
+                )
+                continue
+            latency_s = time.perf_counter() - batch_start
+            embeddings.extend(batch)
+            with self._lock:
+                self._batches += 1
+                self._busy_s += latency_s
+            self._resize(end - start, latency_s)
+            start = end
+        return embeddings
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        if not nodes:
+            return nodes
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        # Similar lengths in a batch means less padding
+        order = sorted(range(len(nodes)), key=lambda i: len(texts[i]))
+        start = time.perf_counter()
+        embeddings = self._embed([texts[i] for i in order])
+        elapsed = time.perf_counter() - start
+        for i, embedding in zip(order, embeddings, strict=True):
+            nodes[i].embedding = embedding
+        with self._lock:
+            self._nodes += len(nodes)
+        logger.info(
+            "Embedded count=%s nodes in %.1fs nodes_per_s=%.1f batch_size=%s",
+            len(nodes),
+            elapsed,
+            len(nodes) / elapsed if elapsed else 0.0,
+            self._batch_size,
+        )
+        return nodes
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "model": self._model.model_name,
+            "batch_size": self._batch_size,
+            "max_batch_size": self._max_batch_size,
+            "nodes": self._nodes,
+            "batches": self._batches,
+            "nodes_per_s": self._nodes / self._busy_s if self._busy_s else 0.0,
+        }
@@ -0,0 +1,215 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from private_gpt.components.embedding.embedding_store import (
+    PersistentEmbeddingStore,
+    embedding_key,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key of a query: the same question typed twice maps to one entry."""
+    return " ".join(text.split())
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper caching query and text embeddings.
+
+    Users tend to repeat the same questions, and every query is embedded again
+    before retrieval. Query embeddings are kept in a bounded LRU (disabled when
+    `max_size` is 0). Entries are keyed by (model name, normalized text), expire
+    after `ttl_s` seconds when set, and can be saved to `persist_path` on close
+    to warm the cache up on the next start.
+
+    When a `text_store` is given, text (document) embeddings are looked up in
+    it by content before calling the model, so re-ingesting unchanged chunks
+    does not embed them again.
+    """
+
+    _model: BaseEmbedding = PrivateAttr()
+    _max_size: int = PrivateAttr()
+    _ttl_s: float = PrivateAttr()
+    _persist_path: Path | None = PrivateAttr()
+    _entries: "OrderedDict[tuple[str, str], tuple[Embedding, float]]" = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+    _hits: int = PrivateAttr()
+    _misses: int = PrivateAttr()
+    _text_store: PersistentEmbeddingStore | None = PrivateAttr()
+
+    def __init__(
+        self,
+        model: BaseEmbedding,
+        max_size: int = 1024,
+        ttl_s: float = 0,
+        persist_path: Path | None = None,
+        text_store: PersistentEmbeddingStore | None = None,
+    ) -> None:
+        super().__init__(
+            model_name=model.model_name,
+            embed_batch_size=model.embed_batch_size,
+            callback_manager=model.callback_manager,
+            num_workers=model.num_workers,
+        )
+        self._model = model
+        self._max_size = max_size
+        self._ttl_s = ttl_s
+        self._persist_path = persist_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._text_store = text_store
+        if persist_path is not None and persist_path.exists():
+            self._load(persist_path)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def model(self) -> BaseEmbedding:
+        return self._model
+
+    def _key(self, query: str) -> tuple[str, str]:
+        return self.model_name, normalize_query(query)
+
+    def _lookup(self, key: tuple[str, str]) -> Embedding | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                self._ttl_s <= 0 or time.time() - entry[1] < self._ttl_s
+            ):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def _store(
+        self, key: tuple[str, str], embedding: Embedding, created: float | None = None
+    ) -> None:
+        with self._lock:
+            self._entries[key] = (embedding, created or time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    @property
+    def text_store(self) -> PersistentEmbeddingStore | None:
+        return self._text_store
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        if self._max_size <= 0:
+            return self._model._get_query_embedding(query)
+        key = self._key(query)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = self._model._get_query_embedding(query)
+            self._store(key, embedding)
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        if self._max_size <= 0:
+            return await self._model._aget_query_embedding(query)
+        key = self._key(query)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = await self._model._aget_query_embedding(query)
+            self._store(key, embedding)
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[Embedding]:
+        if self._text_store is None:
+            return self._model._get_text_embeddings(texts)
+        keys = [embedding_key(self.model_name, text) for text in texts]
+        embeddings = self._text_store.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = self._model._get_text_embeddings([texts[i] for i in missing])
+            self._text_store.put_many([keys[i] for i in missing], computed)
+            for i, embedding in zip(missing, computed, strict=True):
+                embeddings[i] = embedding
+        return embeddings  # type: ignore[return-value]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    async def _aget_text_embeddings(self, texts: list[str]) -> list[Embedding]:
+        if self._text_store is None:
+            return await self._model._aget_text_embeddings(texts)
+        keys = [embedding_key(self.model_name, text) for text in texts]
+        embeddings = self._text_store.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = await self._model._aget_text_embeddings(
+                [texts[i] for i in missing]
+            )
+            self._text_store.put_many([keys[i] for i in missing], computed)
+            for i, embedding in zip(missing, computed, strict=True):
+                embeddings[i] = embedding
+        return embeddings  # type: ignore[return-value]
+
+    def _load(self, path: Path) -> None:
+        try:
+            with path.open(encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable query embedding cache path=%s", path)
+            return
+        now = time.time()
+        loaded = 0
+        for model_name, text, embedding, created in saved.get("entries", []):
+            # Entries of another model are useless, expired ones too
+            if model_name != self.model_name:
+                continue
+            if self._ttl_s > 0 and now - created >= self._ttl_s:
+                continue
+            self._store((model_name, text), embedding, created)
+            loaded += 1
+        logger.info("Loaded count=%s query embeddings from path=%s", loaded, path)
+
+    def save(self) -> None:
+        """Write the cache to `persist_path`, if set."""
+        if self._persist_path is None:
+            return
+        with self._lock:
+            entries = [
+                [model_name, text, embedding, created]
+                for (model_name, text), (embedding, created) in self._entries.items()
+            ]
+        self._persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._persist_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f)
+        tmp_path.replace(self._persist_path)
+        logger.info(
+            "Saved count=%s query embeddings to path=%s",
+            len(entries),
+            self._persist_path,
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "model": self.model_name,
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+        }
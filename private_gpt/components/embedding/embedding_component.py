@@ -1,10 +1,22 @@
+import atexit
 import logging
+import re
+from pathlib import Path
 
 from injector import inject, singleton
 from llama_index.core.embeddings import BaseEmbedding, MockEmbedding
-
-from private_gpt.paths import models_cache_path
+from llama_index.core.schema import TransformComponent
+
+from private_gpt.components.embedding.adaptive_batcher import (
+    AdaptiveEmbeddingBatcher,
+)
+from private_gpt.components.embedding.embedding_cache import CachedEmbedding
+from private_gpt.components.embedding.embedding_store import (
+    PersistentEmbeddingStore,
+)
+from private_gpt.paths import local_data_path, models_cache_path
 from private_gpt.settings.settings import Settings
+from private_gpt.utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +24,8 @@ logger = logging.getLogger(__name__)
 @singleton
 class EmbeddingComponent:
     embedding_model: BaseEmbedding
+    # Transformation embedding the ingested nodes
+    embedding_transformation: TransformComponent
 
     @inject
     def __init__(self, settings: Settings) -> None:
@@ -165,3 +179,48 @@ class EmbeddingComponent:
                 # Not a random number, is the dimensionality used by
                 # the default embedding model
                 self.embedding_model = MockEmbedding(384)
+
+        query_cache = settings.embedding.query_cache
+        text_cache = settings.embedding.text_cache
+        if query_cache.enabled or text_cache.enabled:
+            persist_path = None
+            if query_cache.enabled and query_cache.persist_path:
+                persist_path = Path(query_cache.persist_path)
+                if not persist_path.is_absolute():
+                    persist_path = local_data_path / persist_path
+            text_store = None
+            if text_cache.enabled:
+                text_store_path = Path(text_cache.path)
+                if not text_store_path.is_absolute():
+                    text_store_path = local_data_path / text_store_path
+                # Embeddings of different models never mix, not even their size
+                model_folder = re.sub(r"[^\w.-]", "_", self.embedding_model.model_name)
+                text_store = PersistentEmbeddingStore(text_store_path / model_folder)
+                register_metrics("text_embedding_cache", text_store.metrics)
+            cached_model = CachedEmbedding(
+                self.embedding_model,
+                max_size=query_cache.max_size if query_cache.enabled else 0,
+                ttl_s=query_cache.ttl_s,
+                persist_path=persist_path,
+                text_store=text_store,
+            )
+            if persist_path is not None:
+                atexit.register(cached_model.save)
+            if query_cache.enabled:
+                register_metrics("query_embedding_cache", cached_model.metrics)
+            self.embedding_model = cached_model
+
+        self.embedding_transformation = self.embedding_model
+        adaptive_batch = settings.embedding.adaptive_batch
+        if adaptive_batch.enabled:
+            batcher = AdaptiveEmbeddingBatcher(
+                self.embedding_model,
+                initial_batch_size=adaptive_batch.initial_size,
+                min_batch_size=adaptive_batch.min_size,
+                max_batch_size=adaptive_batch.max_size,
+                target_latency_s=adaptive_batch.target_latency_s,
+                max_batch_chars=adaptive_batch.max_batch_chars,
+                max_memory_mb=adaptive_batch.max_memory_mb,
+            )
+            register_metrics("embedding_batcher", batcher.metrics)
+            self.embedding_transformation = batcher
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.idx"
+META_FILE = "meta.json"
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """Content address of an embedding: the model and the exact text it embedded."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+
+class PersistentEmbeddingStore:
+    """Append-only, content-addressed store of text embeddings on disk.
+
+    Vectors are appended as raw float32 rows to `vectors.f32`, which is read
+    through a memory map, and their keys are appended, one per line, to
+    `keys.idx`: the n-th key addresses the n-th row. Only the key index is kept
+    in memory. A partially written row (e.g. after a crash) is dropped on load.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._dim: int | None = None
+        self._vectors: np.memmap[Any, np.dtype[np.float32]] | None = None
+        self._hits = 0
+        self._misses = 0
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.path / VECTORS_FILE
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.path / KEYS_FILE
+
+    def _load(self) -> None:
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            return
+        self._dim = int(json.loads(meta_path.read_text())["dim"])
+        keys = self._keys_path.read_text().split() if self._keys_path.exists() else []
+        row_size = self._dim * np.dtype(np.float32).itemsize
+        vectors_size = (
+            self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        )
+        count = min(len(keys), vectors_size // row_size)
+        if count < len(keys) or count * row_size < vectors_size:
+            logger.warning(
+                "Truncating the embedding store path=%s to count=%s complete rows",
+                self.path,
+                count,
+            )
+            with self._vectors_path.open("r+b") as f:
+                f.truncate(count * row_size)
+            self._keys_path.write_text("".join(f"{key}\n" for key in keys[:count]))
+        self._rows = {key: row for row, key in enumerate(keys[:count])}
+        logger.info("Loaded count=%s cached embeddings from path=%s", count, self.path)
+
+    def _vector_rows(self) -> np.memmap[Any, np.dtype[np.float32]] | None:
+        # The memory map is reopened when rows were appended since it was mapped
+        if self._dim is None or not self._rows:
+            return None
+        if self._vectors is None or len(self._vectors) < len(self._rows):
+            self._vectors = np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self._rows), self._dim),
+            )
+        return self._vectors
+
+    def get_many(self, keys: list[str]) -> list[list[float] | None]:
+        """Return the stored embedding of each key, or None when it is missing."""
+        with self._lock:
+            vectors = self._vector_rows()
+            found: list[list[float] | None] = []
+            for key in keys:
+                row = self._rows.get(key)
+                if row is None or vectors is None:
+                    found.append(None)
+                    self._misses += 1
+                else:
+                    found.append(vectors[row].tolist())
+                    self._hits += 1
+            return found
+
+    def put_many(self, keys: list[str], embeddings: list[list[float]]) -> None:
+        """Append the embeddings whose key is not stored yet."""
+        with self._lock:
+            new_rows: dict[str, list[float]] = {}
+            for key, embedding in zip(keys, embeddings, strict=True):
+                if key not in self._rows:
+                    new_rows[key] = embedding
+            if not new_rows:
+                return
+            array = np.asarray(list(new_rows.values()), dtype=np.float32)
+            if self._dim is None:
+                self._dim = int(array.shape[1])
+                (self.path / META_FILE).write_text(json.dumps({"dim": self._dim}))
+            elif array.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {array.shape[1]} does not match the "
+                    f"store dimension {self._dim} at {self.path}"
+                )
+            # Vectors first: a key is only valid once its row is complete
+            with self._vectors_path.open("ab") as f:
+                f.write(array.tobytes())
+            with self._keys_path.open("a") as f:
+                f.write("".join(f"{key}\n" for key in new_rows))
+            first_row = len(self._rows)
+            for offset, key in enumerate(new_rows):
+                self._rows[key] = first_row + offset
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def metrics(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "path": str(self.path),
+            "size": len(self._rows),
+            "dim": self._dim,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+        }
@@ -5,6 +5,10 @@ import multiprocessing
 import multiprocessing.pool
 import os
 import threading
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 from queue import Queue
 from typing import Any
@@ -16,14 +20,71 @@ from llama_index.core.indices.base import BaseIndex
 from llama_index.core.ingestion import run_transformations
 from llama_index.core.schema import BaseNode, Document, TransformComponent
 from llama_index.core.storage import StorageContext
+from llama_index.core.storage.docstore import BaseDocumentStore
+from llama_index.core.storage.docstore.types import RefDocInfo
 
 from private_gpt.components.ingest.ingest_helper import IngestionHelper
+from private_gpt.components.ingest.parse_worker_pool import ParseWorkerPool
 from private_gpt.paths import local_data_path
 from private_gpt.settings.settings import Settings
 from private_gpt.utils.eta import eta
 
 logger = logging.getLogger(__name__)
 
+# Key prefix of the file hashes, stored next to the document hashes
+FILE_HASH_PREFIX = "file::"
+# Id prefix of the index structs of the vector store collections
+COLLECTION_INDEX_PREFIX = "collection:"
+
+
+def collection_index_id(collection: str) -> str:
+    """Id of the index struct listing the nodes of a vector store collection."""
+    return COLLECTION_INDEX_PREFIX + collection
+
+
+def upsert_doc_id(file_name: str, position: int) -> str:
+    """Deterministic id of the document at `position` (e.g. the page) of a file."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{file_name}#{position}"))
+
+
+def _get_file_record(
+    docstore: BaseDocumentStore, file_name: str
+) -> tuple[str, int] | None:
+    # Stored as "<file hash>:<count of documents>"
+    record = docstore.get_document_hash(FILE_HASH_PREFIX + file_name)
+    if record is None:
+        return None
+    file_hash, _, count = record.rpartition(":")
+    return file_hash, int(count)
+
+
+class IngestFilesError(RuntimeError):
+    """The documents of some files could not be saved in the index."""
+
+    def __init__(self, file_names: list[str]) -> None:
+        super().__init__(f"Failed to ingest the files {file_names}")
+        self.file_names = file_names
+
+
+@dataclass
+class UpsertResult:
+    """Outcome of an upsert: which documents were saved, kept or deleted.
+
+    The files whose documents could not be saved are listed in `failed_files`,
+    their next upsert ingests them again.
+    """
+
+    documents: list[Document] = field(default_factory=list)
+    unchanged_doc_ids: list[str] = field(default_factory=list)
+    deleted_doc_ids: list[str] = field(default_factory=list)
+    failed_files: list[str] = field(default_factory=list)
+    added: int = 0
+    updated: int = 0
+
+    @property
+    def skipped(self) -> int:
+        return len(self.unchanged_doc_ids)
+
 
 class BaseIngestComponent(abc.ABC):
     def __init__(
@@ -47,10 +108,25 @@ class BaseIngestComponent(abc.ABC):
     def bulk_ingest(self, files: list[tuple[str, Path]]) -> list[Document]:
         pass
 
+    @abc.abstractmethod
+    def upsert(self, files: list[tuple[str, Path]]) -> UpsertResult:
+        pass
+
     @abc.abstractmethod
     def delete(self, doc_id: str) -> None:
         pass
 
+    @abc.abstractmethod
+    def delete_many(self, doc_ids: list[str]) -> None:
+        pass
+
+    @abc.abstractmethod
+    def is_indexed(self, ref_doc_info: RefDocInfo) -> bool:
+        """Whether the nodes of the document are in the index of this component."""
+
+    def close(self) -> None:  # noqa: B027
+        """Release the threads of the component, started again by the next ingest."""
+
 
 class BaseIngestComponentWithIndex(BaseIngestComponent, abc.ABC):
     def __init__(
@@ -58,10 +134,22 @@ class BaseIngestComponentWithIndex(BaseIngestComponent, abc.ABC):
         storage_context: StorageContext,
         embed_model: EmbedType,
         transformations: list[TransformComponent],
+        parse_pool: ParseWorkerPool,
         *args: Any,
+        index_id: str | None = None,
+        adopt_unnamed_index: bool = False,
+        upsert_key_prefix: str = "",
         **kwargs: Any,
     ) -> None:
         super().__init__(storage_context, embed_model, transformations, *args, **kwargs)
+        # Files are always parsed in the worker processes of the shared pool
+        self.parse_pool = parse_pool
+        # Several indexes (one per collection) share the doc and index stores.
+        # Without an id, the index store must hold a single index.
+        self.index_id = index_id
+        self.adopt_unnamed_index = adopt_unnamed_index
+        # Keeps apart the upserts of the same file in different collections
+        self.upsert_key_prefix = upsert_key_prefix
 
         self.show_progress = True
         self._index_thread_lock = (
@@ -71,10 +159,13 @@ class BaseIngestComponentWithIndex(BaseIngestComponent, abc.ABC):
 
     def _initialize_index(self) -> BaseIndex[IndexDict]:
         """Initialize the index from the storage context."""
+        if self.adopt_unnamed_index:
+            self._adopt_unnamed_index()
         try:
             # Load the index with store_nodes_override=True to be able to delete them
             index = load_index_from_storage(
                 storage_context=self.storage_context,
+                index_id=self.index_id,
                 store_nodes_override=True,  # Force store nodes in index and document stores
                 show_progress=self.show_progress,
                 embed_model=self.embed_model,
@@ -82,7 +173,7 @@ class BaseIngestComponentWithIndex(BaseIngestComponent, abc.ABC):
             )
         except ValueError:
             # There are no index in the storage context, creating a new one
-            logger.info("Creating a new vector store index")
+            logger.info("Creating a new vector store index=%s", self.index_id)
             index = VectorStoreIndex.from_documents(
                 [],
                 storage_context=self.storage_context,
@@ -91,19 +182,193 @@ class BaseIngestComponentWithIndex(BaseIngestComponent, abc.ABC):
                 embed_model=self.embed_model,
                 transformations=self.transformations,
             )
+            if self.index_id is not None:
+                index.set_index_id(self.index_id)
             index.storage_context.persist(persist_dir=local_data_path)
         return index
 
+    def _adopt_unnamed_index(self) -> None:
+        # The index created before collections existed has a random id, it
+        # becomes the index of this component (the default collection)
+        index_store = self.storage_context.index_store
+        if self.index_id is None or index_store.get_index_struct(self.index_id):
+            return
+        unnamed = [
+            index_struct
+            for index_struct in index_store.index_structs()
+            if not index_struct.index_id.startswith(COLLECTION_INDEX_PREFIX)
+        ]
+        if len(unnamed) != 1:
+            return
+        index_struct = unnamed[0]
+        logger.info(
+            "Renaming the index=%s to index=%s", index_struct.index_id, self.index_id
+        )
+        index_store.delete_index_struct(index_struct.index_id)
+        index_struct.index_id = self.index_id
+        index_store.add_index_struct(index_struct)
+
+    def is_indexed(self, ref_doc_info: RefDocInfo) -> bool:
+        if self.index_id is None:
+            # The only index holds every document
+            return True
+        nodes_dict = self._index.index_struct.nodes_dict
+        return any(node_id in nodes_dict for node_id in ref_doc_info.node_ids)
+
     def _save_index(self) -> None:
         self._index.storage_context.persist(persist_dir=local_data_path)
 
     def delete(self, doc_id: str) -> None:
+        self.delete_many([doc_id])
+
+    def delete_many(self, doc_ids: list[str]) -> None:
         with self._index_thread_lock:
-            # Delete the document from the index
-            self._index.delete_ref_doc(doc_id, delete_from_docstore=True)
+            self._delete_ref_docs(doc_ids)
+            # Save the index once for all the documents
+            self._save_index()
+
+    def _delete_ref_docs(self, doc_ids: list[str]) -> None:
+        """Delete the documents and their nodes, without saving the index.
+
+        Same as `delete_ref_doc` for each document, with one delete call to the
+        vector store and one update of the index struct for all of them.
+        """
+        docstore = self._index.docstore
+        node_ids = []
+        invalidated_hashes: dict[str, str] = {}
+        deleted_doc_ids = []
+        for doc_id in doc_ids:
+            ref_doc_info = docstore.get_ref_doc_info(doc_id)
+            # The documents of the other indexes are left alone
+            if ref_doc_info is None or not self.is_indexed(ref_doc_info):
+                continue
+            deleted_doc_ids.append(doc_id)
+            node_ids.extend(ref_doc_info.node_ids)
+            file_name = ref_doc_info.metadata.get("file_name")
+            if not file_name:
+                continue
+            file_key = self.upsert_key_prefix + file_name
+            record = _get_file_record(docstore, file_key)
+            if record is not None:
+                # The next upsert of the file must not skip the deleted document
+                invalidated_hashes[FILE_HASH_PREFIX + file_key] = f":{record[1]}"
+        vector_store = self._index.storage_context.vector_store
+        try:
+            # An empty list of ids would match every node of some vector stores
+            if node_ids:
+                vector_store.delete_nodes(node_ids)
+        except NotImplementedError:
+            for doc_id in deleted_doc_ids:
+                vector_store.delete(doc_id)
+        index_struct = self._index.index_struct
+        for node_id in node_ids:
+            index_struct.delete(node_id)
+        for doc_id in deleted_doc_ids:
+            docstore.delete_ref_doc(doc_id, raise_error=False)
+        docstore.set_document_hashes(invalidated_hashes)
+        self._index.storage_context.index_store.add_index_struct(index_struct)
+
+    def _transform_file(self, file_name: str, file_data: Path) -> list[Document]:
+        return self.parse_pool.apply(
+            IngestionHelper.transform_file_into_documents, file_name, file_data
+        )
+
+    def _transform_files(self, files: list[tuple[str, Path]]) -> list[list[Document]]:
+        return self.parse_pool.starmap(
+            IngestionHelper.transform_file_into_documents, files
+        )
 
-            # Save the index
+    @abc.abstractmethod
+    def _save_files(
+        self, files: list[tuple[str, list[Document]]]
+    ) -> tuple[list[Document], list[str]]:
+        """Embed and save the documents of each file in the index.
+
+        Returns the saved documents, and the names of the files whose documents
+        could not be saved.
+        """
+
+    def upsert(self, files: list[tuple[str, Path]]) -> UpsertResult:
+        """Ingest the files, skipping what did not change since the last upsert.
+
+        Each document gets a deterministic id derived from its file name and its
+        position in the file (the page, for paginated formats). A file whose hash
+        did not change is not even parsed. Otherwise, the documents whose hash
+        changed replace their previous version, and the ones past the new end of
+        the file are deleted.
+        """
+        docstore = self._index.docstore
+        result = UpsertResult()
+        changed_files: list[tuple[str, Path, str, int]] = []
+        for file_name, file_data in files:
+            file_key = self.upsert_key_prefix + file_name
+            file_hash = IngestionHelper.file_hash(file_data)
+            record = _get_file_record(docstore, file_key)
+            if record is not None and record[0] == file_hash:
+                result.unchanged_doc_ids.extend(
+                    upsert_doc_id(file_key, position) for position in range(record[1])
+                )
+            else:
+                changed_files.append(
+                    (file_name, file_data, file_hash, record[1] if record else 0)
+                )
+        if not changed_files:
+            return result
+
+        parsed_files = self._transform_files(
+            [(file_name, file_data) for file_name, file_data, _, _ in changed_files]
+        )
+        files_to_save: list[tuple[str, list[Document]]] = []
+        replaced_doc_ids: list[str] = []
+        file_records: dict[str, str] = {}
+        # Added and updated documents of each file, counted once it is saved
+        file_counts: dict[str, tuple[int, int]] = {}
+        for (file_name, _, file_hash, stored_count), documents in zip(
+            changed_files, parsed_files, strict=True
+        ):
+            file_key = self.upsert_key_prefix + file_name
+            changed_documents = []
+            added = updated = 0
+            for position, document in enumerate(documents):
+                document.id_ = upsert_doc_id(file_key, position)
+                # Hashes past the stored count belong to already deleted documents
+                if position >= stored_count:
+                    added += 1
+                elif docstore.get_document_hash(document.id_) == document.hash:
+                    result.unchanged_doc_ids.append(document.id_)
+                    continue
+                else:
+                    replaced_doc_ids.append(document.id_)
+                    updated += 1
+                changed_documents.append(document)
+            file_counts[file_name] = (added, updated)
+            result.deleted_doc_ids.extend(
+                upsert_doc_id(file_key, position)
+                for position in range(len(documents), stored_count)
+            )
+            if changed_documents:
+                files_to_save.append((file_name, changed_documents))
+            file_records[file_name] = f"{file_hash}:{len(documents)}"
+
+        with self._index_thread_lock:
+            self._delete_ref_docs(replaced_doc_ids + result.deleted_doc_ids)
+        if files_to_save:
+            result.documents, result.failed_files = self._save_files(files_to_save)
+        for file_name in result.failed_files:
+            # Not recorded, so that the next upsert ingests the file again
+            file_records.pop(file_name, None)
+            file_counts.pop(file_name, None)
+        result.added = sum(added for added, _ in file_counts.values())
+        result.updated = sum(updated for _, updated in file_counts.values())
+        file_records = {
+            FILE_HASH_PREFIX + self.upsert_key_prefix + file_name: record
+            for file_name, record in file_records.items()
+        }
+        # The file hashes are only recorded once their documents are saved
+        with self._index_thread_lock:
+            docstore.set_document_hashes(file_records)
             self._save_index()
+        return result
 
 
 class SimpleIngestComponent(BaseIngestComponentWithIndex):
@@ -119,7 +384,7 @@ class SimpleIngestComponent(BaseIngestComponentWithIndex):
 
     def ingest(self, file_name: str, file_data: Path) -> list[Document]:
         logger.info("Ingesting file_name=%s", file_name)
-        documents = IngestionHelper.transform_file_into_documents(file_name, file_data)
+        documents = self._transform_file(file_name, file_data)
         logger.info(
             "Transformed file=%s into count=%s documents", file_name, len(documents)
         )
@@ -129,12 +394,19 @@ class SimpleIngestComponent(BaseIngestComponentWithIndex):
     def bulk_ingest(self, files: list[tuple[str, Path]]) -> list[Document]:
         saved_documents = []
         for file_name, file_data in files:
-            documents = IngestionHelper.transform_file_into_documents(
-                file_name, file_data
-            )
+            documents = self._transform_file(file_name, file_data)
             saved_documents.extend(self._save_docs(documents))
         return saved_documents
 
+    def _save_files(
+        self, files: list[tuple[str, list[Document]]]
+    ) -> tuple[list[Document], list[str]]:
+        # Failures are raised, before any file hash is recorded
+        documents = self._save_docs(
+            list(itertools.chain.from_iterable(documents for _, documents in files))
+        )
+        return documents, []
+
     def _save_docs(self, documents: list[Document]) -> list[Document]:
         logger.debug("Transforming count=%s documents into nodes", len(documents))
         with self._index_thread_lock:
@@ -171,13 +443,9 @@ class BatchIngestComponent(BaseIngestComponentWithIndex):
         assert count_workers > 0, "count_workers must be > 0"
         self.count_workers = count_workers
 
-        self._file_to_documents_work_pool = multiprocessing.Pool(
-            processes=self.count_workers
-        )
-
     def ingest(self, file_name: str, file_data: Path) -> list[Document]:
         logger.info("Ingesting file_name=%s", file_name)
-        documents = IngestionHelper.transform_file_into_documents(file_name, file_data)
+        documents = self._transform_file(file_name, file_data)
         logger.info(
             "Transformed file=%s into count=%s documents", file_name, len(documents)
         )
@@ -185,13 +453,7 @@ class BatchIngestComponent(BaseIngestComponentWithIndex):
         return self._save_docs(documents)
 
     def bulk_ingest(self, files: list[tuple[str, Path]]) -> list[Document]:
-        documents = list(
-            itertools.chain.from_iterable(
-                self._file_to_documents_work_pool.starmap(
-                    IngestionHelper.transform_file_into_documents, files
-                )
-            )
-        )
+        documents = list(itertools.chain.from_iterable(self._transform_files(files)))
         logger.info(
             "Transformed count=%s files into count=%s documents",
             len(files),
@@ -199,6 +461,15 @@ class BatchIngestComponent(BaseIngestComponentWithIndex):
         )
         return self._save_docs(documents)
 
+    def _save_files(
+        self, files: list[tuple[str, list[Document]]]
+    ) -> tuple[list[Document], list[str]]:
+        # Failures are raised, before any file hash is recorded
+        documents = self._save_docs(
+            list(itertools.chain.from_iterable(documents for _, documents in files))
+        )
+        return documents, []
+
     def _save_docs(self, documents: list[Document]) -> list[Document]:
         logger.debug("Transforming count=%s documents into nodes", len(documents))
         nodes = run_transformations(
@@ -249,21 +520,20 @@ class ParallelizedIngestComponent(BaseIngestComponentWithIndex):
         # To do not collide with the multiprocessing of huggingface, we disable it
         os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-        self._ingest_work_pool = multiprocessing.pool.ThreadPool(
-            processes=self.count_workers
-        )
+        self._ingest_work_pool_lock = threading.Lock()
+        self._ingest_work_pool: multiprocessing.pool.ThreadPool | None = None
 
-        self._file_to_documents_work_pool = multiprocessing.Pool(
-            processes=self.count_workers
-        )
+    def _work_pool(self) -> multiprocessing.pool.ThreadPool:
+        with self._ingest_work_pool_lock:
+            if self._ingest_work_pool is None:
+                self._ingest_work_pool = multiprocessing.pool.ThreadPool(
+                    processes=self.count_workers
+                )
+            return self._ingest_work_pool
 
     def ingest(self, file_name: str, file_data: Path) -> list[Document]:
         logger.info("Ingesting file_name=%s", file_name)
-        # Running in a single (1) process to release the current
-        # thread, and take a dedicated CPU core for computation
-        documents = self._file_to_documents_work_pool.apply(
-            IngestionHelper.transform_file_into_documents, (file_name, file_data)
-        )
+        documents = self._transform_file(file_name, file_data)
         logger.info(
             "Transformed file=%s into count=%s documents", file_name, len(documents)
         )
@@ -274,12 +544,23 @@ class ParallelizedIngestComponent(BaseIngestComponentWithIndex):
         # Lightweight threads, used for parallelize the
         # underlying IO calls made in the ingestion
 
+        documents = list(
+            itertools.chain.from_iterable(self._work_pool().starmap(self.ingest, files))
+        )
+        return documents
+
+    def _save_files(
+        self, files: list[tuple[str, list[Document]]]
+    ) -> tuple[list[Document], list[str]]:
+        # Failures are raised, before any file hash is recorded
         documents = list(
             itertools.chain.from_iterable(
-                self._ingest_work_pool.starmap(self.ingest, files)
+                self._work_pool().map(
+                    self._save_docs, [documents for _, documents in files]
+                )
             )
         )
-        return documents
+        return documents, []
 
     def _save_docs(self, documents: list[Document]) -> list[Document]:
         logger.debug("Transforming count=%s documents into nodes", len(documents))
@@ -302,38 +583,107 @@ class ParallelizedIngestComponent(BaseIngestComponentWithIndex):
             logger.debug("Persisted the index and nodes")
         return documents
 
-    def __del__(self) -> None:
-        # We need to do the appropriate cleanup of the multiprocessing pools
-        # when the object is deleted. Using root logger to avoid
-        # the logger to be deleted before the pool
-        logging.debug("Closing the ingest work pool")
-        self._ingest_work_pool.close()
-        self._ingest_work_pool.join()
-        self._ingest_work_pool.terminate()
-        logging.debug("Closing the file to documents work pool")
-        self._file_to_documents_work_pool.close()
-        self._file_to_documents_work_pool.join()
-        self._file_to_documents_work_pool.terminate()
+    def close(self) -> None:
+        # The parse processes belong to the shared ParseWorkerPool, only the
+        # threads are ours
+        with self._ingest_work_pool_lock:
+            pool, self._ingest_work_pool = self._ingest_work_pool, None
+        if pool is not None:
+            logger.debug("Closing the ingest work pool")
+            pool.close()
+            pool.join()
+
+
+def _timed_transform_file(file: tuple[str, Path]) -> tuple[list[Document], float]:
+    # Runs in a parse worker process, which measures its own busy time
+    start = time.perf_counter()
+    documents = IngestionHelper.transform_file_into_documents(*file)
+    return documents, time.perf_counter() - start
+
+
+class PipelineStats:
+    """Throughput of each stage of the ingestion pipeline, since the last reset.
+
+    Every stage records the files and items (documents or nodes) it processed,
+    and the time its workers were busy. The busy time is summed over the
+    workers of the stage, so a stage keeping N workers busy reports up to N
+    times the elapsed time.
+    """
+
+    STAGES = (
+        ("parse", "documents"),
+        ("embed", "nodes"),
+        ("write", "nodes"),
+    )
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._start = time.perf_counter()
+            self._stages = {stage: [0, 0, 0.0] for stage, _ in self.STAGES}
+
+    def add(self, stage: str, files: int, items: int, busy_s: float) -> None:
+        with self._lock:
+            counters = self._stages[stage]
+            counters[0] += files
+            counters[1] += items
+            counters[2] += busy_s
+
+    def metrics(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {"files": files, unit: items, "busy_s": busy_s}
+                for (stage, unit), (files, items, busy_s) in zip(
+                    self.STAGES, self._stages.values(), strict=True
+                )
+            }
+
+    def log(self) -> None:
+        with self._lock:
+            elapsed = max(time.perf_counter() - self._start, 1e-9)
+            for stage, unit in self.STAGES:
+                files, items, busy_s = self._stages[stage]
+                logger.info(
+                    "Ingestion stage=%s files=%s %s=%s busy=%.1fs "
+                    "throughput=%.1f files/s %.1f %s/s",
+                    stage,
+                    files,
+                    unit,
+                    items,
+                    busy_s,
+                    files / elapsed,
+                    items / elapsed,
+                    unit,
+                )
 
 
 class PipelineIngestComponent(BaseIngestComponentWithIndex):
     """Pipeline ingestion - keeping the embedding worker pool as busy as possible.
 
-    This class implements a threaded ingestion pipeline, which comprises two threads
-    and two queues. The primary thread is responsible for reading and parsing files
-    into documents. These documents are then placed into a queue, which is
-    distributed to a pool of worker processes for embedding computation. After
+    This class implements an ingestion pipeline of three stages connected by
+    bounded queues. Files are read and parsed into documents by a pool of worker
+    processes; the parsed documents are placed into a queue, which is
+    distributed to a pool of workers for embedding computation. After
     embedding, the documents are transferred to another queue where they are
     accumulated until a threshold is reached. Upon reaching this threshold, the
     accumulated documents are flushed to the document store, index, and vector
     store.
 
+    Every stage blocks when the queue of the next one is full, so a slow
+    embedding model holds back parsing instead of piling up parsed files in
+    memory. The throughput of each stage is logged at the end of a bulk ingest.
+
     Exception handling ensures robustness against erroneous files. However, in the
     pipelined design, one error can lead to the discarding of multiple files. Any
-    discarded files will be reported.
+    discarded files will be reported: they are logged, and returned by `_flush`
+    to the caller that queued them.
     """
 
     NODE_FLUSH_COUNT = 5000  # Save the index every # nodes.
+    PARSE_QUEUE_FACTOR = 2  # Files being parsed, per parse worker.
 
     def __init__(
         self,
@@ -371,6 +721,10 @@ class PipelineIngestComponent(BaseIngestComponentWithIndex):
         self.node_q: Queue[
             tuple[str, str | None, list[Document] | None, list[BaseNode] | None]
         ] = Queue(40)
+        self.stats = PipelineStats()
+        # Files whose documents could not be embedded or saved, until flushed
+        self._failed_files: set[str] = set()
+        self._failed_files_lock = threading.Lock()
         threading.Thread(target=self._doc_to_node, daemon=True).start()
         threading.Thread(target=self._write_nodes, daemon=True).start()
 
@@ -398,12 +752,17 @@ class PipelineIngestComponent(BaseIngestComponentWithIndex):
     def _doc_to_node_worker(self, file_name: str, documents: list[Document]) -> None:
         # CPU/GPU intensive work in its own process
         try:
+            start = time.perf_counter()
             nodes = run_transformations(
                 documents,  # type: ignore[arg-type]
                 self.transformations,
                 show_progress=self.show_progress,
             )
+            self.stats.add("embed", 1, len(nodes), time.perf_counter() - start)
             self.node_q.put(("process", file_name, documents, list(nodes)))
+        except Exception:
+            logger.exception("Embedding file=%s", file_name)
+            self._add_failed_files([file_name])
         finally:
             self.doc_semaphore.release()
             self.doc_q.task_done()  # unblock Q joins
@@ -415,15 +774,18 @@ class PipelineIngestComponent(BaseIngestComponentWithIndex):
             logger.info(
                 f"Saving {len(files)} files ({len(documents)} documents / {len(nodes)} nodes)"
             )
+            start = time.perf_counter()
             self._index.insert_nodes(nodes)
             for document in documents:
                 self._index.docstore.set_document_hash(
                     document.get_doc_id(), document.hash
                 )
             self._save_index()
+            self.stats.add("write", len(files), len(nodes), time.perf_counter() - start)
         except Exception:
             # Tell the user so they can investigate these files
             logger.exception(f"Processing files {files}")
+            self._add_failed_files(files)
         finally:
             # Clearing work, even on exception, maintains a clean state.
             nodes.clear()
@@ -453,65 +815,147 @@ class PipelineIngestComponent(BaseIngestComponentWithIndex):
             finally:
                 self.node_q.task_done()
 
-    def _flush(self) -> None:
+    def _add_failed_files(self, file_names: list[str]) -> None:
+        with self._failed_files_lock:
+            self._failed_files.update(file_names)
+
+    def _flush(self, file_names: list[str]) -> list[str]:
+        """Wait until the queued files are saved, returning the ones that failed.
+
+        Only the failures of the given files are returned (and forgotten), the
+        other files belong to concurrent callers.
+        """
         self.doc_q.put(("flush", None, None))
         self.doc_q.join()
         self.node_q.put(("flush", None, None, None))
         self.node_q.join()
+        with self._failed_files_lock:
+            failed = [
+                name for name in dict.fromkeys(file_names) if name in self._failed_files
+            ]
+            self._failed_files.difference_update(failed)
+        return failed
 
     def ingest(self, file_name: str, file_data: Path) -> list[Document]:
-        documents = IngestionHelper.transform_file_into_documents(file_name, file_data)
+        documents = self._transform_file(file_name, file_data)
         self.doc_q.put(("process", file_name, documents))
-        self._flush()
+        if self._flush([file_name]):
+            raise IngestFilesError([file_name])
         return documents
 
+    def _parse_files(
+        self, files: list[tuple[str, Path]]
+    ) -> Iterator[tuple[tuple[str, Path], tuple[list[Document], float] | Exception]]:
+        """Parse the files in the worker processes, yielding them as they are done.
+
+        At most `PARSE_QUEUE_FACTOR` files per worker are handed to the pool
+        and not yet consumed: when the caller stops consuming (because the
+        document queue is full), the parse workers stop too.
+        """
+        slots = threading.BoundedSemaphore(
+            self.parse_pool.workers * self.PARSE_QUEUE_FACTOR
+        )
+        stopped = threading.Event()
+
+        def bounded_files() -> Iterator[tuple[str, Path]]:
+            # Consumed by the task feeder thread of the pool
+            for file in files:
+                while not slots.acquire(timeout=1):
+                    if stopped.is_set():
+                        return
+                yield file
+
+        try:
+            for parsed in self.parse_pool.imap_unordered(
+                _timed_transform_file, bounded_files()
+            ):
+                yield parsed
+                slots.release()
+        finally:
+            stopped.set()
+
     def bulk_ingest(self, files: list[tuple[str, Path]]) -> list[Document]:
-        docs = []
-        for file_name, file_data in eta(files):
-            try:
-                documents = IngestionHelper.transform_file_into_documents(
-                    file_name, file_data
-                )
-                self.doc_q.put(("process", file_name, documents))
-                docs.extend(documents)
-            except Exception:
-                logger.exception(f"Skipping {file_data.name}")
-        self._flush()
-        return docs
+        queued: list[tuple[str, list[Document]]] = []
+        self.stats.reset()
+        for (file_name, _), parsed in eta(self._parse_files(files), total=len(files)):
+            if isinstance(parsed, Exception):
+                logger.error("Skipping file=%s: %r", file_name, parsed)
+                continue
+            documents, busy_s = parsed
+            self.stats.add("parse", 1, len(documents), busy_s)
+            # Blocks while the embedding workers are behind
+            self.doc_q.put(("process", file_name, documents))
+            queued.append((file_name, documents))
+        failed = self._flush([file_name for file_name, _ in queued])
+        self.stats.log()
+        return self._saved_documents(queued, failed)
+
+    def _save_files(
+        self, files: list[tuple[str, list[Document]]]
+    ) -> tuple[list[Document], list[str]]:
+        for file_name, documents in files:
+            self.doc_q.put(("process", file_name, documents))
+        failed = self._flush([file_name for file_name, _ in files])
+        return self._saved_documents(files, failed), failed
+
+    @staticmethod
+    def _saved_documents(
+        files: list[tuple[str, list[Document]]], failed: list[str]
+    ) -> list[Document]:
+        if failed:
+            logger.error("Failed to save the documents of files=%s", failed)
+        return list(
+            itertools.chain.from_iterable(
+                documents for file_name, documents in files if file_name not in failed
+            )
+        )
 
 
 def get_ingestion_component(
     storage_context: StorageContext,
     embed_model: EmbedType,
     transformations: list[TransformComponent],
+    parse_pool: ParseWorkerPool,
     settings: Settings,
+    **kwargs: Any,
 ) -> BaseIngestComponent:
-    """Get the ingestion component for the given configuration."""
+    """Get the ingestion component for the given configuration.
+
+    The keyword arguments (e.g. `index_id`) are passed to the component.
+    """
     ingest_mode = settings.embedding.ingest_mode
     if ingest_mode == "batch":
         return BatchIngestComponent(
             storage_context=storage_context,
             embed_model=embed_model,
             transformations=transformations,
+            parse_pool=parse_pool,
             count_workers=settings.embedding.count_workers,
+            **kwargs,
         )
     elif ingest_mode == "parallel":
         return ParallelizedIngestComponent(
             storage_context=storage_context,
             embed_model=embed_model,
             transformations=transformations,
+            parse_pool=parse_pool,
             count_workers=settings.embedding.count_workers,
+            **kwargs,
         )
     elif ingest_mode == "pipeline":
         return PipelineIngestComponent(
             storage_context=storage_context,
             embed_model=embed_model,
             transformations=transformations,
+            parse_pool=parse_pool,
             count_workers=settings.embedding.count_workers,
+            **kwargs,
         )
     else:
         return SimpleIngestComponent(
             storage_context=storage_context,
             embed_model=embed_model,
             transformations=transformations,
+            parse_pool=parse_pool,
+            **kwargs,
         )
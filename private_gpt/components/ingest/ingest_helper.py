@@ -1,3 +1,4 @@
+import hashlib
 import logging
 from pathlib import Path
 
@@ -67,6 +68,14 @@ class IngestionHelper:
     These methods are thread-safe (and multiprocessing-safe).
     """
 
+    @staticmethod
+    def file_hash(file_data: Path) -> str:
+        sha256 = hashlib.sha256()
+        with file_data.open("rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
     @staticmethod
     def transform_file_into_documents(
         file_name: str, file_data: Path
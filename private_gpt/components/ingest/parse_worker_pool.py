@@ -0,0 +1,186 @@
+import logging
+import multiprocessing
+import multiprocessing.pool
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from injector import inject, singleton
+
+from private_gpt.settings.settings import Settings
+from private_gpt.utils.metrics import register_metrics
+from private_gpt.utils.typing import K, T, V
+
+logger = logging.getLogger(__name__)
+
+
+class ParseTimeoutError(TimeoutError):
+    """A task ran longer than the configured `timeout_s` and was abandoned."""
+
+
+# Imported once by the fork server, and inherited by the processes it forks
+_PRELOADED_MODULES = ["private_gpt.components.ingest.ingest_helper"]
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    # Forking the threaded server (uvicorn, the database writer, the embedding
+    # model) can copy into the child a lock held by another thread. The fork
+    # server is a single threaded process, spawned once.
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(_PRELOADED_MODULES)
+    return context
+
+
+class _Generation:
+    """A process pool, and the number of its tasks still being waited for."""
+
+    def __init__(self, processes: int, max_tasks_per_worker: int) -> None:
+        self.pool = _process_context().Pool(
+            processes=processes, maxtasksperchild=max_tasks_per_worker or None
+        )
+        self.in_flight = 0
+        self.retired = False
+
+
+@singleton
+class ParseWorkerPool:
+    """Worker processes parsing the ingested files, shared by every ingest mode.
+
+    Parsing (PDF, DOCX, ...) is CPU heavy and runs third party code, so it never
+    runs on the calling (e.g. uvicorn) thread. The processes are created on the
+    first task, replaced after `max_tasks_per_worker` tasks to bound the memory
+    leaked by the parsers, and shut down by `close`.
+
+    The processes are not forked from the server but from a fork server, a
+    fresh interpreter importing the parsers once (a few seconds, paid by the
+    first ingestion) so that the processes it forks start at once. Where there
+    is no fork server (Windows), each process is spawned and pays this start-up,
+    i.e. again each time it is replaced.
+
+    At most `workers` tasks are submitted at once, so a task starts as soon as
+    it is submitted and `timeout_s` bounds its actual run time. A task running
+    longer is abandoned with a `ParseTimeoutError`: new tasks go to a fresh
+    process pool, and the old one, with the hung process, is terminated once
+    its other tasks are done.
+    """
+
+    @inject
+    def __init__(self, settings: Settings) -> None:
+        parse_settings = settings.embedding.parse_workers
+        self.workers = parse_settings.count or settings.embedding.count_workers
+        self.max_tasks_per_worker = parse_settings.max_tasks_per_worker
+        self.timeout_s = parse_settings.timeout_s
+        assert self.workers > 0, "parse_workers.count must be > 0"
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._generation: _Generation | None = None
+        self._threads: multiprocessing.pool.ThreadPool | None = None
+        self._tasks = 0
+        self._timeouts = 0
+        self._restarts = 0
+        register_metrics("parse_workers", self.metrics)
+
+    def _acquire_generation(self) -> _Generation:
+        with self._lock:
+            if self._generation is None:
+                logger.info("Starting count=%s parse worker processes", self.workers)
+                self._generation = _Generation(self.workers, self.max_tasks_per_worker)
+            self._generation.in_flight += 1
+            return self._generation
+
+    def _release_generation(self, generation: _Generation, timed_out: bool) -> None:
+        with self._lock:
+            generation.in_flight -= 1
+            if timed_out and not generation.retired:
+                generation.retired = True
+                self._restarts += 1
+                if self._generation is generation:
+                    self._generation = None
+            if generation.retired and generation.in_flight == 0:
+                # Kills the hung processes, the other tasks are done
+                generation.pool.terminate()
+
+    def apply(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run `fn(*args)` in a worker process and return its result."""
+        with self._slots:
+            generation = self._acquire_generation()
+            timed_out = False
+            try:
+                result = generation.pool.apply_async(fn, args)
+                return result.get(timeout=self.timeout_s or None)
+            except multiprocessing.TimeoutError:
+                timed_out = True
+                self._timeouts += 1
+                logger.error(
+                    "Abandoning the parse task fn=%s args=%s after timeout_s=%s",
+                    getattr(fn, "__qualname__", fn),
+                    args,
+                    self.timeout_s,
+                )
+                raise ParseTimeoutError(
+                    f"Parsing did not finish within {self.timeout_s}s"
+                ) from None
+            finally:
+                self._tasks += 1
+                self._release_generation(generation, timed_out)
+
+    def _thread_pool(self) -> multiprocessing.pool.ThreadPool:
+        # Threads waiting for the tasks of `starmap` and `imap_unordered`
+        with self._lock:
+            if self._threads is None:
+                self._threads = multiprocessing.pool.ThreadPool(self.workers)
+            return self._threads
+
+    def starmap(
+        self, fn: Callable[..., T], args_list: Iterable[tuple[Any, ...]]
+    ) -> list[T]:
+        """Run `fn(*args)` for each item in the worker processes, in order."""
+        return self._thread_pool().starmap(
+            lambda *args: self.apply(fn, *args), args_list
+        )
+
+    def imap_unordered(
+        self, fn: Callable[[K], V], items: Iterable[K]
+    ) -> Iterator[tuple[K, V | Exception]]:
+        """Run `fn(item)` for each item, yielding `(item, result)` as they complete.
+
+        The exception of a failing (or timed out) item is yielded as its result
+        instead of ending the iteration.
+        """
+
+        def run(item: K) -> tuple[K, V | Exception]:
+            try:
+                return item, self.apply(fn, item)
+            except Exception as e:
+                return item, e
+
+        return self._thread_pool().imap_unordered(run, items)
+
+    def close(self) -> None:
+        """Stop the worker processes, failing the tasks still running.
+
+        The processes are started again by the next task.
+        """
+        with self._lock:
+            generation, self._generation = self._generation, None
+            threads, self._threads = self._threads, None
+        if generation is not None:
+            # Terminated rather than joined: a hung parser must not block exiting
+            logger.info("Stopping the parse worker processes")
+            generation.pool.terminate()
+        if threads is not None:
+            # Not joined either, the threads are daemons
+            threads.close()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self._generation is not None,
+            "max_tasks_per_worker": self.max_tasks_per_worker,
+            "timeout_s": self.timeout_s,
+            "tasks": self._tasks,
+            "timeouts": self._timeouts,
+            "restarts": self._restarts,
+        }
@@ -0,0 +1,40 @@
+from typing import Any, Protocol, runtime_checkable
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+from llama_index.core.storage.docstore.utils import json_to_doc
+from llama_index.core.storage.kvstore.types import DEFAULT_COLLECTION
+
+
+@runtime_checkable
+class BulkReadKVStore(Protocol):
+    """A key-value store reading the values of many keys at once."""
+
+    def get_many(
+        self, keys: list[str], collection: str = DEFAULT_COLLECTION
+    ) -> dict[str, dict[str, Any]]:
+        """Values of the given keys. Missing keys are left out of the result."""
+        ...
+
+
+class BulkKVDocumentStore(KVDocumentStore):
+    """Document store reading many nodes at once when its kvstore can.
+
+    `get_nodes` of the base document store reads the nodes one by one, and
+    raises on the first missing one.
+    """
+
+    def get_many(self, node_ids: list[str]) -> dict[str, BaseNode]:
+        """The nodes of the given ids found in the store, by id.
+
+        Read in bulk from a `BulkReadKVStore`, one by one from the other stores.
+        """
+        if isinstance(self._kvstore, BulkReadKVStore):
+            found = self._kvstore.get_many(node_ids, collection=self._node_collection)
+            return {node_id: json_to_doc(json) for node_id, json in found.items()}
+        nodes: dict[str, BaseNode] = {}
+        for node_id in node_ids:
+            node = self.get_document(node_id, raise_error=False)
+            if node is not None:
+                nodes[node_id] = node
+        return nodes
@@ -1,10 +1,20 @@
 import logging
+import threading
+from collections import OrderedDict
 
 from injector import inject, singleton
+from llama_index.core.schema import BaseNode
 from llama_index.core.storage.docstore import BaseDocumentStore, SimpleDocumentStore
 from llama_index.core.storage.index_store import SimpleIndexStore
+from llama_index.core.storage.index_store.keyval_index_store import KVIndexStore
 from llama_index.core.storage.index_store.types import BaseIndexStore
 
+from private_gpt.components.node_store.bulk_docstore import BulkKVDocumentStore
+from private_gpt.components.node_store.sqlite_kvstore import (
+    NODESTORE_DB_FILE,
+    SqliteKVStore,
+    migrate_simple_stores,
+)
 from private_gpt.paths import local_data_path
 from private_gpt.settings.settings import Settings
 
@@ -18,6 +28,13 @@ class NodeStoreComponent:
 
     @inject
     def __init__(self, settings: Settings) -> None:
+        # Nodes read by `get_nodes`. Node ids are never reused for another
+        # content (re-ingested documents get new nodes), so entries need no
+        # invalidation
+        self._node_cache: OrderedDict[str, BaseNode] = OrderedDict()
+        self._node_cache_size = settings.nodestore.node_cache_size
+        self._node_cache_lock = threading.Lock()
+
         match settings.nodestore.database:
             case "simple":
                 try:
@@ -36,14 +53,29 @@ class NodeStoreComponent:
                     logger.debug("Local document store not found, creating a new one")
                     self.doc_store = SimpleDocumentStore()
 
+            case "sqlite":
+                kvstore = SqliteKVStore(local_data_path / NODESTORE_DB_FILE)
+                if kvstore.is_empty():
+                    # First start on this backend: import the simple store, if any
+                    migrated = migrate_simple_stores(kvstore, local_data_path)
+                    if migrated:
+                        logger.info(
+                            "Migrated count=%s entries of the simple node store to path=%s",
+                            migrated,
+                            kvstore.db_file,
+                        )
+                self.index_store = KVIndexStore(kvstore)
+                self.doc_store = BulkKVDocumentStore(kvstore)
+
             case "postgres":
                 try:
-                    from llama_index.storage.docstore.postgres import (  # type: ignore
-                        PostgresDocumentStore,
-                    )
                     from llama_index.storage.index_store.postgres import (  # type: ignore
                         PostgresIndexStore,
                     )
+
+                    from private_gpt.components.node_store.postgres_kvstore import (
+                        BulkPostgresKVStore,
+                    )
                 except ImportError:
                     raise ImportError(
                         "Postgres dependencies not found, install with `poetry install --extras storage-nodestore-postgres`"
@@ -56,8 +88,12 @@ class NodeStoreComponent:
                     **settings.postgres.model_dump(exclude_none=True)
                 )
 
-                self.doc_store = PostgresDocumentStore.from_params(
-                    **settings.postgres.model_dump(exclude_none=True)
+                # The table of the PostgresDocumentStore of llama-index
+                self.doc_store = BulkKVDocumentStore(
+                    BulkPostgresKVStore.from_params(
+                        **settings.postgres.model_dump(exclude_none=True),
+                        table_name="docstore",
+                    )
                 )
 
             case _:
@@ -66,3 +102,40 @@ class NodeStoreComponent:
                 raise ValueError(
                     f"Database {settings.nodestore.database} not supported"
                 )
+
+    def get_nodes(self, node_ids: list[str]) -> dict[str, BaseNode]:
+        """The nodes of the given ids found in the doc store, by id.
+
+        Recently read nodes come from an LRU cache, and the others are read in
+        bulk when the store supports it (`sqlite` and `postgres`), one by one
+        otherwise.
+        """
+        nodes: dict[str, BaseNode] = {}
+        with self._node_cache_lock:
+            for node_id in node_ids:
+                node = self._node_cache.get(node_id)
+                if node is not None:
+                    self._node_cache.move_to_end(node_id)
+                    nodes[node_id] = node
+        missing = list(dict.fromkeys(i for i in node_ids if i not in nodes))
+        if not missing:
+            return nodes
+
+        fetched = self._fetch_nodes(missing)
+        nodes.update(fetched)
+        if self._node_cache_size > 0:
+            with self._node_cache_lock:
+                self._node_cache.update(fetched)
+                while len(self._node_cache) > self._node_cache_size:
+                    self._node_cache.popitem(last=False)
+        return nodes
+
+    def _fetch_nodes(self, node_ids: list[str]) -> dict[str, BaseNode]:
+        if isinstance(self.doc_store, BulkKVDocumentStore):
+            return self.doc_store.get_many(node_ids)
+        nodes: dict[str, BaseNode] = {}
+        for node_id in node_ids:
+            node = self.doc_store.get_document(node_id, raise_error=False)
+            if node is not None:
+                nodes[node_id] = node
+        return nodes
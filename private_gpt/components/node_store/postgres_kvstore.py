@@ -0,0 +1,33 @@
+from typing import Any
+
+from llama_index.core.storage.kvstore.types import DEFAULT_COLLECTION
+from llama_index.storage.kvstore.postgres import PostgresKVStore  # type: ignore
+
+# Keeps the statements well below the bound parameters limit of the drivers
+GET_MANY_BATCH_SIZE = 500
+
+
+class BulkPostgresKVStore(PostgresKVStore):  # type: ignore
+    """Postgres key-value store, reading many keys in a single query."""
+
+    def get_many(
+        self, keys: list[str], collection: str = DEFAULT_COLLECTION
+    ) -> dict[str, dict[str, Any]]:
+        """Values of the given keys, in one query per `GET_MANY_BATCH_SIZE` keys.
+
+        Missing keys are left out of the result.
+        """
+        from sqlalchemy import select
+
+        self._initialize()
+        found: dict[str, dict[str, Any]] = {}
+        with self._session() as session:
+            for start in range(0, len(keys), GET_MANY_BATCH_SIZE):
+                batch = keys[start : start + GET_MANY_BATCH_SIZE]
+                rows = session.execute(
+                    select(self._table_class)
+                    .filter_by(namespace=collection)
+                    .where(self._table_class.key.in_(batch))
+                ).scalars()
+                found.update((row.key, row.value) for row in rows)
+        return found
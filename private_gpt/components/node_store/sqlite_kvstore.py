@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from llama_index.core.storage.docstore.types import (
+    DEFAULT_PERSIST_FNAME as DOCSTORE_FNAME,
+)
+from llama_index.core.storage.index_store.types import (
+    DEFAULT_PERSIST_FNAME as INDEXSTORE_FNAME,
+)
+from llama_index.core.storage.kvstore import SimpleKVStore
+from llama_index.core.storage.kvstore.types import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_COLLECTION,
+    BaseKVStore,
+)
+
+from private_gpt.database.pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+NODESTORE_DB_FILE = "nodestore.db"
+# Below the 999 bound variables of the SQLite builds before 3.32
+GET_MANY_BATCH_SIZE = 500
+
+StoredValue = dict[str, Any]
+
+
+class SqliteKVStore(BaseKVStore):
+    """Key-value store backed by a SQLite table, one row per (collection, key).
+
+    The simple stores rewrite their whole JSON file on every persist, which makes
+    ingesting or deleting N documents cost O(N^2) bytes of writes. Here every
+    put and delete only touches its own rows. Writes go through the single
+    writer thread of the database connection pool.
+    """
+
+    def __init__(self, db_file: Path, table_name: str = "kvstore") -> None:
+        self.db_file = db_file
+        self._pool = get_pool(db_file)
+        self._table = table_name
+        self._pool.write(
+            lambda conn: conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._table} (
+                    collection TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (collection, key)
+                ) WITHOUT ROWID
+                """
+            )
+        )
+
+    def put(
+        self, key: str, val: StoredValue, collection: str = DEFAULT_COLLECTION
+    ) -> None:
+        self.put_all([(key, val)], collection=collection)
+
+    async def aput(
+        self, key: str, val: StoredValue, collection: str = DEFAULT_COLLECTION
+    ) -> None:
+        await asyncio.to_thread(self.put, key, val, collection)
+
+    def put_all(
+        self,
+        kv_pairs: list[tuple[str, StoredValue]],
+        collection: str = DEFAULT_COLLECTION,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        # Written in a single transaction, whatever the batch size
+        rows = [(collection, key, json.dumps(val)) for key, val in kv_pairs]
+        if not rows:
+            return
+        self._pool.write(
+            lambda conn: conn.executemany(
+                f"INSERT OR REPLACE INTO {self._table} (collection, key, value) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+        )
+
+    async def aput_all(
+        self,
+        kv_pairs: list[tuple[str, StoredValue]],
+        collection: str = DEFAULT_COLLECTION,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        await asyncio.to_thread(self.put_all, kv_pairs, collection, batch_size)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> StoredValue | None:
+        row = (
+            self._pool.connection()
+            .execute(
+                f"SELECT value FROM {self._table} WHERE collection = ? AND key = ?",
+                (collection, key),
+            )
+            .fetchone()
+        )
+        return None if row is None else json.loads(row[0])
+
+    async def aget(
+        self, key: str, collection: str = DEFAULT_COLLECTION
+    ) -> StoredValue | None:
+        return await asyncio.to_thread(self.get, key, collection)
+
+    def get_many(
+        self, keys: list[str], collection: str = DEFAULT_COLLECTION
+    ) -> dict[str, StoredValue]:
+        """Values of the given keys, in one query per `GET_MANY_BATCH_SIZE` keys.
+
+        Missing keys are left out of the result.
+        """
+        found: dict[str, StoredValue] = {}
+        connection = self._pool.connection()
+        for start in range(0, len(keys), GET_MANY_BATCH_SIZE):
+            batch = keys[start : start + GET_MANY_BATCH_SIZE]
+            rows = connection.execute(
+                f"SELECT key, value FROM {self._table} "
+                f"WHERE collection = ? AND key IN ({', '.join('?' * len(batch))})",
+                (collection, *batch),
+            ).fetchall()
+            found.update((row[0], json.loads(row[1])) for row in rows)
+        return found
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> dict[str, StoredValue]:
+        rows = (
+            self._pool.connection()
+            .execute(
+                f"SELECT key, value FROM {self._table} WHERE collection = ?",
+                (collection,),
+            )
+            .fetchall()
+        )
+        return {row[0]: json.loads(row[1]) for row in rows}
+
+    async def aget_all(
+        self, collection: str = DEFAULT_COLLECTION
+    ) -> dict[str, StoredValue]:
+        return await asyncio.to_thread(self.get_all, collection)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self._pool.write(
+            lambda conn: conn.execute(
+                f"DELETE FROM {self._table} WHERE collection = ? AND key = ?",
+                (collection, key),
+            ).rowcount
+            > 0
+        )
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return await asyncio.to_thread(self.delete, key, collection)
+
+    def is_empty(self) -> bool:
+        row = (
+            self._pool.connection()
+            .execute(f"SELECT 1 FROM {self._table} LIMIT 1")
+            .fetchone()
+        )
+        return row is None
+
+
+def migrate_simple_stores(kvstore: SqliteKVStore, persist_dir: Path) -> int:
+    """Copy the JSON files of the simple document and index stores into `kvstore`.
+
+    The JSON files are left untouched. Returns the number of copied entries.
+    """
+    count = 0
+    for file_name in (DOCSTORE_FNAME, INDEXSTORE_FNAME):
+        path = persist_dir / file_name
+        if not path.exists():
+            continue
+        data = SimpleKVStore.from_persist_path(str(path)).to_dict()
+        for collection, entries in data.items():
+            kvstore.put_all(list(entries.items()), collection=collection)
+            count += len(entries)
+        logger.info("Migrated the simple node store file=%s", path)
+    return count
@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+ScoreFn = Callable[[list[tuple[str, str]]], list[float]]
+
+
+@dataclass
+class _PendingScore:
+    pairs: list[tuple[str, str]]
+    future: "Future[list[float]]" = field(default_factory=Future)
+
+
+class RerankBatcher:
+    """Gather (query, passage) pairs from concurrent requests into one forward pass.
+
+    The first pending request opens a window of `window_ms`; every request
+    arriving during that window (up to `max_batch_size` pairs) is scored in the
+    same call to `score_fn`. Each caller then receives only its own scores.
+    A single daemon thread drives the batches, so `score_fn` is never called
+    concurrently.
+    """
+
+    def __init__(
+        self, score_fn: ScoreFn, window_ms: float, max_batch_size: int
+    ) -> None:
+        assert window_ms >= 0, "window_ms must be >= 0"
+        assert max_batch_size > 0, "max_batch_size must be > 0"
+        self._score_fn = score_fn
+        self._window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: queue.Queue[_PendingScore] = queue.Queue()
+        self._carry_over: _PendingScore | None = None
+
+        self._batches = 0
+        self._requests = 0
+        self._pairs = 0
+        self._stats_lock = threading.Lock()
+
+        threading.Thread(target=self._run, name="rerank-batcher", daemon=True).start()
+
+    def score(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """Score `pairs`, blocking until the batch they were added to is done."""
+        if not pairs:
+            return []
+        pending = _PendingScore(pairs)
+        self._pending.put(pending)
+        return pending.future.result()
+
+    def _next_batch(self) -> list[_PendingScore]:
+        first = self._carry_over or self._pending.get()
+        self._carry_over = None
+        batch = [first]
+        size = len(first.pairs)
+        deadline = time.monotonic() + self._window
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                pending = self._pending.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if size + len(pending.pairs) > self.max_batch_size:
+                # Keep it for the next forward pass instead of overflowing this one
+                self._carry_over = pending
+                break
+            batch.append(pending)
+            size += len(pending.pairs)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            pairs = [pair for pending in batch for pair in pending.pairs]
+            try:
+                scores = self._score_fn(pairs)
+            except Exception as e:
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+
+            offset = 0
+            for pending in batch:
+                pending.future.set_result(scores[offset : offset + len(pending.pairs)])
+                offset += len(pending.pairs)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._pairs += len(pairs)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._stats_lock:
+            batches, requests, pairs = self._batches, self._requests, self._pairs
+        return {
+            "window_ms": self._window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": batches,
+            "queued_requests": self._pending.qsize(),
+            "avg_requests_per_batch": requests / batches if batches else 0.0,
+            "avg_pairs_per_batch": pairs / batches if batches else 0.0,
+            "batch_fill_ratio": (
+                pairs / (batches * self.max_batch_size) if batches else 0.0
+            ),
+        }
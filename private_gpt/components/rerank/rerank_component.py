@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from typing import Any
+
+from injector import inject, singleton
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from private_gpt.components.rerank.rerank_batcher import RerankBatcher
+from private_gpt.settings.settings import Settings
+from private_gpt.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RERANK_MAX_LENGTH = 512
+
+
+@singleton
+class RerankComponent:
+    """Process-wide cross-encoder used to rerank the retrieved nodes.
+
+    The model is loaded once, when the component is created, and shared by every
+    request. Inference is serialized with a lock: the cross-encoder already uses
+    every available core for a single forward pass, so running several passes
+    concurrently would only add contention.
+
+    When `rag.rerank.batch_window_ms` is set, the pairs of concurrent requests are
+    additionally gathered by a `RerankBatcher` and scored in a single pass.
+    """
+
+    model: Any | None
+    batcher: RerankBatcher | None
+
+    @inject
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.model = None
+        self.batcher = None
+        self._inference_lock = threading.Lock()
+        self._load_time = 0.0
+        self._calls = 0
+        self._scored_pairs = 0
+        self._scoring_time = 0.0
+        self._last_scoring_time = 0.0
+
+        if settings.rag.rerank.enabled:
+            self._load()
+            if settings.rag.rerank.batch_window_ms > 0:
+                self.batcher = RerankBatcher(
+                    self._predict,
+                    window_ms=settings.rag.rerank.batch_window_ms,
+                    max_batch_size=settings.rag.rerank.max_batch_size,
+                )
+        register_metrics("rerank", self.metrics)
+
+    def _load(self) -> None:
+        try:
+            from llama_index.core.utils import infer_torch_device
+            from sentence_transformers import CrossEncoder  # type: ignore
+        except ImportError as e:
+            raise ImportError(
+                "Rerank dependencies not found, install with `poetry install --extras rerank-sentence-transformers`"
+            ) from e
+
+        model_name = self.settings.rag.rerank.model
+        logger.info("Loading the rerank model=%s", model_name)
+        start = time.perf_counter()
+        self.model = CrossEncoder(
+            model_name,
+            max_length=DEFAULT_RERANK_MAX_LENGTH,
+            device=infer_torch_device(),
+        )
+        self._load_time = time.perf_counter() - start
+        logger.info("Loaded the rerank model=%s in %.2fs", model_name, self._load_time)
+
+    @property
+    def enabled(self) -> bool:
+        return self.model is not None
+
+    def score(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """Score (query, passage) pairs with the shared cross-encoder."""
+        if self.model is None:
+            raise ValueError("Rerank is disabled, enable it in `rag.rerank.enabled`")
+        if not pairs:
+            return []
+        if self.batcher is not None:
+            return self.batcher.score(pairs)
+        return self._predict(pairs)
+
+    def _predict(self, pairs: list[tuple[str, str]]) -> list[float]:
+        assert self.model is not None
+        with self._inference_lock:
+            start = time.perf_counter()
+            scores = self.model.predict(pairs)
+            elapsed = time.perf_counter() - start
+            self._calls += 1
+            self._scored_pairs += len(pairs)
+            self._scoring_time += elapsed
+            self._last_scoring_time = elapsed
+        return [float(score) for score in scores]
+
+    def rerank(
+        self, query: str, nodes: list[NodeWithScore], top_n: int
+    ) -> list[NodeWithScore]:
+        """Return the `top_n` nodes with the highest cross-encoder score."""
+        if not nodes:
+            return []
+        pairs = [
+            (query, node.node.get_content(metadata_mode=MetadataMode.EMBED))
+            for node in nodes
+        ]
+        for node, score in zip(nodes, self.score(pairs), strict=True):
+            node.score = score
+        return sorted(nodes, key=lambda n: -(n.score or 0.0))[:top_n]
+
+    def postprocessor(self, top_n: int | None = None) -> "SharedRerankPostprocessor":
+        """Build a lightweight node postprocessor backed by the shared model."""
+        return SharedRerankPostprocessor(
+            component=self,
+            top_n=top_n if top_n is not None else self.settings.rag.rerank.top_n,
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        metrics: dict[str, Any] = {
+            "enabled": self.enabled,
+            "model": self.settings.rag.rerank.model,
+            "load_time_s": self._load_time,
+            "calls": self._calls,
+            "scored_pairs": self._scored_pairs,
+            "scoring_time_s": self._scoring_time,
+            "last_scoring_time_s": self._last_scoring_time,
+            "avg_scoring_time_s": (
+                self._scoring_time / self._calls if self._calls else 0.0
+            ),
+        }
+        if self.batcher is not None:
+            metrics["batching"] = self.batcher.metrics()
+        return metrics
+
+
+class SharedRerankPostprocessor(BaseNodePostprocessor):
+    """Node postprocessor delegating the scoring to a `RerankComponent`.
+
+    Building one is cheap, as it does not hold the model weights.
+    """
+
+    component: RerankComponent = Field(
+        description="Component scoring the nodes.", exclude=True
+    )
+    top_n: int = Field(description="Number of nodes to return sorted by score.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SharedRerankPostprocessor"
+
+    def _postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        return self.component.rerank(query_bundle.query_str, nodes, self.top_n)
@@ -0,0 +1,163 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from injector import inject, singleton
+
+from private_gpt.paths import local_data_path
+from private_gpt.settings.settings import Settings
+from private_gpt.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """A sampled request, made of a list of timed spans.
+
+    Traces are only built for sampled requests, and are handed over to the
+    `TracingComponent` writer queue once `end` is called. Nothing is written on
+    the request path.
+    """
+
+    def __init__(
+        self, component: "TracingComponent", name: str, attributes: dict[str, Any]
+    ) -> None:
+        self._component = component
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.spans: list[dict[str, Any]] = []
+        self._start = time.time()
+        self._start_perf = time.perf_counter()
+        self._ended = False
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+        """Time the wrapped block. The yielded dict can be enriched with attributes."""
+        start = time.perf_counter()
+        error: str | None = None
+        try:
+            yield attributes
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            self.spans.append(
+                {
+                    "name": name,
+                    "offset_ms": (start - self._start_perf) * 1000,
+                    "duration_ms": (time.perf_counter() - start) * 1000,
+                    "attributes": attributes,
+                    **({"error": error} if error else {}),
+                }
+            )
+
+    def end(self, **attributes: Any) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        self.attributes.update(attributes)
+        self._component.submit(
+            {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "start": self._start,
+                "duration_ms": (time.perf_counter() - self._start_perf) * 1000,
+                "attributes": self.attributes,
+                "spans": self.spans,
+            }
+        )
+
+
+@singleton
+class TracingComponent:
+    """Sampled request tracing with an asynchronous, bounded file sink.
+
+    Sampled traces are pushed to a bounded in-memory queue, and a background
+    thread appends them as JSON lines to `tracing.path`. When the queue is full
+    the trace is dropped (and counted) instead of slowing down the request.
+    """
+
+    @inject
+    def __init__(self, settings: Settings) -> None:
+        tracing_settings = settings.tracing
+        self.enabled = tracing_settings.enabled and tracing_settings.sample_rate > 0
+        self.sample_rate = tracing_settings.sample_rate
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue(
+            maxsize=tracing_settings.queue_size
+        )
+        self._sampled = 0
+        self._dropped = 0
+        self._written = 0
+        self._writer: threading.Thread | None = None
+
+        if self.enabled:
+            path = Path(tracing_settings.path)
+            self.path = path if path.is_absolute() else local_data_path / path
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = threading.Thread(
+                target=self._write_traces, name="trace-writer", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+            logger.info(
+                "Tracing enabled with sample_rate=%s, writing to path=%s",
+                self.sample_rate,
+                self.path,
+            )
+        register_metrics("tracing", self.metrics)
+
+    def start_trace(self, name: str, **attributes: Any) -> Trace | None:
+        """Start a trace for the current request, or None if it is not sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        self._sampled += 1
+        return Trace(self, name, attributes)
+
+    def submit(self, record: dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+
+    def _write_traces(self) -> None:
+        with self.path.open("a", encoding="utf-8") as sink:
+            while True:
+                record = self._queue.get()
+                try:
+                    if record is None:
+                        break
+                    sink.write(json.dumps(record, default=str) + "\n")
+                    self._written += 1
+                    if self._queue.empty():
+                        sink.flush()
+                except Exception:
+                    logger.exception("Failed to write trace")
+                finally:
+                    self._queue.task_done()
+
+    def close(self) -> None:
+        """Flush the pending traces and stop the writer thread."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "sampled": self._sampled,
+            "written": self._written,
+            "dropped": self._dropped,
+            "queue_depth": self._queue.qsize(),
+        }
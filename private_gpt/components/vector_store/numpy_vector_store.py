@@ -0,0 +1,952 @@
+import json
+import logging
+import math
+import operator
+import shutil
+import threading
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+import numpy.typing as npt
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import (
+    metadata_dict_to_node,
+    node_to_metadata_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.bin"
+NODES_FILE = "nodes.jsonl"
+CONTENT_FILE = "content.jsonl"
+DELETED_FILE = "deleted.idx"
+META_FILE = "meta.json"
+# The other files are in the directory of the version named in meta.json
+DATA_DIR_PREFIX = "data-"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_lists.i32"
+CODES_FILE = "codes.bin"
+SCALES_FILE = "codes_scales.f32"
+
+Quantization = Literal["none", "int8", "binary"]
+# float32 or float16 rows, and row numbers
+Floats = npt.NDArray[np.floating[Any]]
+Rows = npt.NDArray[np.integer[Any]]
+Scorer = Callable[[slice | Rows], Floats]
+
+# Rows scored at once, bounding the temporary float32 copies of float16 rows
+BLOCK_ROWS = 65536
+# Quantized rows decoded at once to float32
+DECODE_ROWS = 1024
+# Longer string values (e.g. the sentence windows) are not kept for filtering
+MAX_METADATA_CHARS = 256
+# Deleted rows are compacted away once they outnumber the live ones
+MIN_COMPACT_ROWS = 1000
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 64
+
+_COMPARISONS: dict[FilterOperator, Callable[[Any, Any], bool]] = {
+    FilterOperator.EQ: operator.eq,
+    FilterOperator.NE: operator.ne,
+    FilterOperator.GT: operator.gt,
+    FilterOperator.GTE: operator.ge,
+    FilterOperator.LT: operator.lt,
+    FilterOperator.LTE: operator.le,
+    FilterOperator.IN: lambda value, expected: value in expected,
+    FilterOperator.NIN: lambda value, expected: value not in expected,
+    FilterOperator.TEXT_MATCH: lambda value, expected: expected in value,
+    FilterOperator.CONTAINS: lambda value, expected: expected in value,
+    FilterOperator.ANY: lambda value, expected: any(v in value for v in expected),
+    FilterOperator.ALL: lambda value, expected: all(v in value for v in expected),
+}
+
+
+def _normalize(vectors: Floats) -> Floats:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    normalized: Floats = vectors / np.where(norms == 0, 1, norms)
+    return normalized
+
+
+def _encode(
+    vectors: Floats, quantization: Quantization
+) -> tuple[npt.NDArray[np.integer[Any]], npt.NDArray[np.float32] | None]:
+    """Quantized codes of normalized vectors, and their int8 scales."""
+    if quantization == "int8":
+        # Symmetric, one scale per vector
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    # One sign bit per dimension
+    return np.packbits(vectors > 0, axis=1), None
+
+
+def _top_k(scores: Floats, k: int) -> Rows:
+    """Indices of the `k` highest scores, best first."""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _float_scorer(vectors: Floats, q: Floats) -> Scorer:
+    return lambda rows: vectors[rows].astype(np.float32, copy=False) @ q
+
+
+def _decoded_scorer(decode: Scorer, q: Floats) -> Scorer:
+    # Decoded by small blocks, whose float32 copy stays in the CPU cache
+    def score(rows: slice | Rows) -> Floats:
+        if isinstance(rows, slice):
+            blocks: Sequence[slice | Rows] = [
+                slice(start, min(start + DECODE_ROWS, rows.stop))
+                for start in range(rows.start, rows.stop, DECODE_ROWS)
+            ]
+        else:
+            blocks = [
+                rows[start : start + DECODE_ROWS]
+                for start in range(0, len(rows), DECODE_ROWS)
+            ]
+        if not blocks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([decode(block) @ q for block in blocks])
+
+    return score
+
+
+def _int8_scorer(
+    codes: npt.NDArray[np.integer[Any]], scales: npt.NDArray[np.float32], q: Floats
+) -> Scorer:
+    score = _decoded_scorer(lambda rows: codes[rows].astype(np.float32), q)
+    return lambda rows: score(rows) * scales[rows]
+
+
+def _binary_scorer(codes: npt.NDArray[np.uint8], q: Floats) -> Scorer:
+    # Asymmetric: the float query against the +-1 signs of the row, scaled
+    # like a cosine similarity
+    dim = len(q)
+    score = _decoded_scorer(
+        lambda rows: np.unpackbits(codes[rows], axis=1, count=dim).astype(np.float32),
+        2 * q / math.sqrt(dim),
+    )
+    offset = q.sum() / math.sqrt(dim)
+    return lambda rows: score(rows) - offset
+
+
+def _line_offsets(path: Path) -> tuple[list[int], int]:
+    """Start offsets of the complete lines of the file, and their total size."""
+    if not path.exists() or path.stat().st_size == 0:
+        return [], 0
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    ends = np.flatnonzero(data == ord("\n")) + 1
+    starts = np.concatenate([[0], ends[:-1]]) if len(ends) else ends
+    return starts.tolist(), int(ends[-1]) if len(ends) else 0
+
+
+def _filter_metadata(node: BaseNode) -> dict[str, Any]:
+    metadata = {
+        key: value
+        for key, value in node.metadata.items()
+        if not (isinstance(value, str) and len(value) > MAX_METADATA_CHARS)
+    }
+    # Same keys as the other vector stores, for the doc id filters
+    ref_doc_id = node.ref_doc_id or "None"
+    metadata.update(doc_id=ref_doc_id, document_id=ref_doc_id, ref_doc_id=ref_doc_id)
+    return metadata
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """Embedded vector store keeping the embeddings in a memory-mapped matrix.
+
+    Meant for CPU-only, single node deployments. The embeddings are normalized
+    and appended as raw rows to `vectors.bin` (float32 or float16), read through
+    a memory map, and the node id, document id and (short) metadata of each row
+    are appended to the `nodes.jsonl` sidecar. A query scores the rows by cosine
+    similarity in blocks and selects the top k with `argpartition`.
+
+    The serialized nodes are appended to `content.jsonl`, of which only the
+    offset of each line is kept in memory: a query only reads its top k nodes.
+
+    Deleted rows are marked in `deleted.idx` and compacted away once they
+    outnumber the live rows. All the files but `meta.json` are in the
+    `data-<version>` directory it names: a compaction writes the next version,
+    and switches to it by replacing `meta.json`. Document id filters are
+    answered from an index of the rows of each document, and equality filters
+    from an index built per metadata key on first use.
+
+    With `ivf_lists` set, a k-means coarse quantizer is trained once the store
+    holds `ivf_min_rows` rows (and again each time it doubles): a query then
+    only scores the rows of its `ivf_nprobe` closest lists. Queries filtered
+    down to fewer rows than `ivf_min_rows` are always exact.
+
+    With `quantization` set, the rows are also encoded to `codes.bin`, 4x
+    (int8, with a scale per row) or 32x (binary, one sign bit per dimension)
+    smaller than float32, and queries scan the codes instead of the vectors.
+    With `rescore`, the `oversampling * k` best candidates are then scored
+    again with their full precision vectors, which are only read for them.
+    The codes are rebuilt from the vectors when the setting changes.
+    """
+
+    stores_text: bool = True
+    path: Path
+    dtype: Literal["float32", "float16"] = "float32"
+    ivf_lists: int = 0
+    ivf_nprobe: int = 16
+    ivf_min_rows: int = 50_000
+    quantization: Quantization = "none"
+    rescore: bool = True
+    oversampling: float = 3.0
+
+    _lock: threading.RLock = PrivateAttr()
+    _dim: int | None = PrivateAttr()
+    _vectors: Floats | None = PrivateAttr()
+    _codes: npt.NDArray[np.integer[Any]] | None = PrivateAttr()
+    _scales: npt.NDArray[np.float32] = PrivateAttr()
+    _node_ids: list[str] = PrivateAttr()
+    _doc_ids: list[str] = PrivateAttr()
+    _metadata: list[dict[str, Any]] = PrivateAttr()
+    _offsets: list[int] = PrivateAttr()
+    _content_size: int = PrivateAttr()
+    _generation: int = PrivateAttr()
+    _version: int = PrivateAttr()
+    _deleted: npt.NDArray[np.bool_] = PrivateAttr()
+    _rows: dict[str, int] = PrivateAttr()
+    _doc_rows: dict[str, set[int]] = PrivateAttr()
+    _value_indexes: dict[str, dict[Any, list[int]]] = PrivateAttr()
+    _centroids: npt.NDArray[np.float32] | None = PrivateAttr()
+    _assignments: npt.NDArray[np.int32] | None = PrivateAttr()
+    _lists: tuple[Rows, Rows] | None = PrivateAttr()
+    _trained_rows: int = PrivateAttr()
+
+    def model_post_init(self, context: Any, /) -> None:
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._version = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._reset()
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def _data(self) -> Path:
+        return self.path / f"{DATA_DIR_PREFIX}{self._version}"
+
+    @property
+    def _row_size(self) -> int:
+        assert self._dim is not None
+        return self._dim * np.dtype(self.dtype).itemsize
+
+    @property
+    def _code_size(self) -> int:
+        assert self._dim is not None
+        if self.quantization == "int8":
+            return self._dim
+        return (self._dim + 7) // 8
+
+    @property
+    def count(self) -> int:
+        """Number of live (not deleted) vectors."""
+        # Not __len__: an empty store would be falsy, and llama-index replaces
+        # falsy vector stores by its default one
+        return len(self._rows)
+
+    def _reset(self) -> None:
+        self._dim = None
+        self._vectors = None
+        self._codes = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._node_ids = []
+        self._doc_ids = []
+        self._metadata = []
+        self._offsets = []
+        self._content_size = 0
+        self._deleted = np.zeros(0, dtype=bool)
+        self._rows = {}
+        self._doc_rows = {}
+        self._value_indexes = {}
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+        self._trained_rows = 0
+
+    def _load(self) -> None:
+        meta_path = self.path / META_FILE
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else None
+        if meta is None:
+            # Including the files of a store cleared while it was being written
+            self._version = 0
+            self._remove_data(keep=None)
+            return
+        self._version = int(meta["version"])
+        self._remove_data(keep=self._data)
+        self._dim = int(meta["dim"])
+        if meta["dtype"] != self.dtype:
+            logger.warning(
+                "Keeping the dtype=%s of the existing vector store path=%s",
+                meta["dtype"],
+                self.path,
+            )
+            self.dtype = meta["dtype"]
+        nodes_path = self._data / NODES_FILE
+        lines = nodes_path.read_text().splitlines() if nodes_path.exists() else []
+        vectors_path = self._data / VECTORS_FILE
+        vectors_size = vectors_path.stat().st_size if vectors_path.exists() else 0
+        content_path = self._data / CONTENT_FILE
+        offsets, content_size = _line_offsets(content_path)
+        count = min(len(lines), vectors_size // self._row_size, len(offsets))
+        if (
+            count < len(lines)
+            or count * self._row_size < vectors_size
+            or count < len(offsets)
+            or (content_path.exists() and content_path.stat().st_size > content_size)
+        ):
+            # A crash between the appends: drop the incomplete rows
+            logger.warning(
+                "Truncating the vector store path=%s to count=%s complete rows",
+                self.path,
+                count,
+            )
+            with vectors_path.open("r+b") as f:
+                f.truncate(count * self._row_size)
+            content_size = offsets[count] if count < len(offsets) else content_size
+            with content_path.open("ab") as f:
+                f.truncate(content_size)
+            nodes_path.write_text("".join(f"{line}\n" for line in lines[:count]))
+        self._offsets = offsets[:count]
+        self._content_size = content_size
+        self._deleted = np.zeros(count, dtype=bool)
+        for row, line in enumerate(lines[:count]):
+            node_id, doc_id, metadata = json.loads(line)
+            self._append_row(row, node_id, doc_id, metadata)
+        deleted_path = self._data / DELETED_FILE
+        if deleted_path.exists():
+            for row in map(int, deleted_path.read_text().split()):
+                if row < count:
+                    self._mark_deleted(row)
+        centroids_path = self._data / CENTROIDS_FILE
+        if centroids_path.exists():
+            self._centroids = np.load(centroids_path)
+            assignments = np.fromfile(
+                self._data / ASSIGNMENTS_FILE, dtype=np.int32
+            ).copy()
+            self._trained_rows = int(meta.get("trained_rows", count))
+            if len(assignments) < count:
+                # Rows added after the last persisted assignments
+                missing = self._assign(
+                    np.arange(len(assignments), count, dtype=np.int64)
+                )
+                assignments = np.concatenate([assignments, missing])
+                self._write_assignments(assignments)
+            self._assignments = assignments[:count]
+        self._load_codes(meta, count)
+        logger.info("Loaded count=%s vectors from path=%s", len(self._rows), self.path)
+
+    def _load_codes(self, meta: dict[str, Any], count: int) -> None:
+        codes_path = self._data / CODES_FILE
+        scales_path = self._data / SCALES_FILE
+        if self.quantization == "none":
+            codes_path.unlink(missing_ok=True)
+            scales_path.unlink(missing_ok=True)
+        else:
+            codes_rows = (
+                codes_path.stat().st_size // self._code_size
+                if codes_path.exists()
+                else 0
+            )
+            scales_rows = scales_path.stat().st_size // 4 if scales_path.exists() else 0
+            if (
+                meta.get("quantization") == self.quantization
+                and min(
+                    codes_rows, count if self.quantization == "binary" else scales_rows
+                )
+                >= count
+            ):
+                # Codes of rows whose node line was not written are dropped
+                with codes_path.open("r+b") as f:
+                    f.truncate(count * self._code_size)
+                if self.quantization == "int8":
+                    with scales_path.open("r+b") as f:
+                        f.truncate(count * 4)
+                    self._scales = np.fromfile(scales_path, dtype=np.float32)
+            else:
+                self._build_codes(count)
+        if meta.get("quantization", "none") != self.quantization:
+            self._update_meta(quantization=self.quantization)
+
+    def _remove_data(self, keep: Path | None) -> None:
+        # E.g. left by a compaction interrupted before, or just after, its switch
+        for data in self.path.glob(f"{DATA_DIR_PREFIX}*"):
+            if data != keep:
+                logger.info("Removing the stale vector store data path=%s", data)
+                shutil.rmtree(data, ignore_errors=True)
+
+    def _update_meta(self, **entries: Any) -> None:
+        meta_path = self.path / META_FILE
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        meta.update(entries)
+        # Replaced in one rename, which also switches the data version
+        tmp_meta = self.path / f"{META_FILE}.tmp"
+        tmp_meta.write_text(json.dumps(meta))
+        tmp_meta.replace(meta_path)
+
+    def _build_codes(self, count: int) -> None:
+        """Encode all the rows, e.g. when the quantization setting changed."""
+        logger.info(
+            "Encoding count=%s vectors of path=%s with quantization=%s",
+            count,
+            self.path,
+            self.quantization,
+        )
+        vectors = self._vector_rows()
+        scales: list[npt.NDArray[np.float32]] = []
+        tmp_codes = self._data / f"{CODES_FILE}.tmp"
+        with tmp_codes.open("wb") as f:
+            for start in range(0, count, BLOCK_ROWS):
+                block = np.asarray(
+                    vectors[start : min(start + BLOCK_ROWS, count)], dtype=np.float32
+                )
+                codes, block_scales = _encode(block, self.quantization)
+                f.write(codes.tobytes())
+                if block_scales is not None:
+                    scales.append(block_scales)
+        self._scales = (
+            np.concatenate(scales) if scales else np.zeros(0, dtype=np.float32)
+        )
+        if self.quantization == "int8":
+            tmp_scales = self._data / f"{SCALES_FILE}.tmp"
+            self._scales.tofile(tmp_scales)
+            tmp_scales.replace(self._data / SCALES_FILE)
+        else:
+            (self._data / SCALES_FILE).unlink(missing_ok=True)
+        tmp_codes.replace(self._data / CODES_FILE)
+        self._codes = None
+
+    def _append_row(
+        self, row: int, node_id: str, doc_id: str, metadata: dict[str, Any]
+    ) -> None:
+        previous = self._rows.get(node_id)
+        if previous is not None:
+            self._mark_deleted(previous)
+        self._node_ids.append(node_id)
+        self._doc_ids.append(doc_id)
+        self._metadata.append(metadata)
+        self._rows[node_id] = row
+        self._doc_rows.setdefault(doc_id, set()).add(row)
+
+    def _mark_deleted(self, row: int) -> None:
+        if self._deleted[row]:
+            return
+        self._deleted[row] = True
+        node_id, doc_id = self._node_ids[row], self._doc_ids[row]
+        if self._rows.get(node_id) == row:
+            del self._rows[node_id]
+        doc_rows = self._doc_rows.get(doc_id)
+        if doc_rows is not None:
+            doc_rows.discard(row)
+            if not doc_rows:
+                del self._doc_rows[doc_id]
+
+    def _vector_rows(self) -> Floats:
+        count = len(self._node_ids)
+        if self._dim is None or count == 0:
+            return np.zeros((0, self._dim or 0), dtype=self.dtype)
+        # The memory map is reopened when rows were appended since it was mapped
+        if self._vectors is None or len(self._vectors) != count:
+            self._vectors = np.memmap(
+                self._data / VECTORS_FILE,
+                dtype=self.dtype,
+                mode="r",
+                shape=(count, self._dim),
+            )
+        return self._vectors
+
+    def _code_rows(self) -> npt.NDArray[np.integer[Any]] | None:
+        count = len(self._node_ids)
+        if self.quantization == "none" or self._dim is None or count == 0:
+            return None
+        if self._codes is None or len(self._codes) != count:
+            self._codes = np.memmap(
+                self._data / CODES_FILE,
+                dtype=np.int8 if self.quantization == "int8" else np.uint8,
+                mode="r",
+                shape=(count, self._code_size),
+            )
+        return self._codes
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> list[str]:
+        if not nodes:
+            return []
+        embeddings = _normalize(
+            np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        )
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(embeddings.shape[1])
+                self._data.mkdir(parents=True, exist_ok=True)
+                self._update_meta(
+                    version=self._version,
+                    dim=self._dim,
+                    dtype=self.dtype,
+                    quantization=self.quantization,
+                )
+            elif embeddings.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {embeddings.shape[1]} does not match the "
+                    f"vector store dimension {self._dim} at {self.path}"
+                )
+            first_row = len(self._node_ids)
+            rows = [
+                (node.node_id, node.ref_doc_id or "None", _filter_metadata(node))
+                for node in nodes
+            ]
+            contents = [
+                (
+                    json.dumps(
+                        node_to_metadata_dict(
+                            node, remove_text=False, flat_metadata=False
+                        )
+                    )
+                    + "\n"
+                ).encode()
+                for node in nodes
+            ]
+            # Vectors and contents first: a row is only valid once its node line
+            # is written
+            with (self._data / VECTORS_FILE).open("ab") as f:
+                f.write(embeddings.astype(self.dtype).tobytes())
+            if self.quantization != "none":
+                codes, scales = _encode(embeddings, self.quantization)
+                with (self._data / CODES_FILE).open("ab") as f:
+                    f.write(codes.tobytes())
+                if scales is not None:
+                    with (self._data / SCALES_FILE).open("ab") as f:
+                        f.write(scales.tobytes())
+                    self._scales = np.concatenate([self._scales, scales])
+            with (self._data / CONTENT_FILE).open("ab") as f:
+                f.write(b"".join(contents))
+            for content in contents:
+                self._offsets.append(self._content_size)
+                self._content_size += len(content)
+            with (self._data / NODES_FILE).open("a") as f:
+                f.write("".join(f"{json.dumps(row)}\n" for row in rows))
+            self._deleted = np.concatenate(
+                [self._deleted, np.zeros(len(nodes), dtype=bool)]
+            )
+            for offset, (node_id, doc_id, metadata) in enumerate(rows):
+                self._append_row(first_row + offset, node_id, doc_id, metadata)
+            self._value_indexes.clear()
+            if self._centroids is not None:
+                new_rows = np.arange(first_row, len(self._node_ids), dtype=np.int64)
+                assignments = self._assign(new_rows)
+                with (self._data / ASSIGNMENTS_FILE).open("ab") as f:
+                    f.write(assignments.tobytes())
+                assert self._assignments is not None
+                self._assignments = np.concatenate([self._assignments, assignments])
+                self._lists = None
+            self._maybe_train()
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            self._delete_rows(list(self._doc_rows.get(ref_doc_id, ())))
+
+    def delete_nodes(
+        self,
+        node_ids: list[str] | None = None,
+        filters: MetadataFilters | None = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        with self._lock:
+            live = ~self._deleted
+            if node_ids is not None:
+                mask = np.zeros(len(self._node_ids), dtype=bool)
+                mask[[self._rows[n] for n in node_ids if n in self._rows]] = True
+                live &= mask
+            if filters is not None:
+                live &= self._match(filters)
+            self._delete_rows(np.flatnonzero(live).tolist())
+
+    def _delete_rows(self, rows: list[int]) -> None:
+        if not rows:
+            return
+        for row in rows:
+            self._mark_deleted(row)
+        with (self._data / DELETED_FILE).open("a") as f:
+            f.write("".join(f"{row}\n" for row in rows))
+        self._value_indexes.clear()
+        deleted = int(self._deleted.sum())
+        if deleted >= MIN_COMPACT_ROWS and deleted > len(self._rows):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the files without the deleted rows, as the next data version.
+
+        Only the rename of `meta.json` naming the new version switches to it,
+        so a crash leaves either the old or the new version complete.
+        """
+        keep = np.flatnonzero(~self._deleted)
+        logger.info(
+            "Compacting the vector store path=%s from count=%s to count=%s rows",
+            self.path,
+            len(self._deleted),
+            len(keep),
+        )
+        old_data = self._data
+        version = self._version + 1
+        data = self.path / f"{DATA_DIR_PREFIX}{version}"
+        shutil.rmtree(data, ignore_errors=True)
+        data.mkdir()
+        vectors = self._vector_rows()
+        with (data / VECTORS_FILE).open("wb") as f:
+            for start in range(0, len(keep), BLOCK_ROWS):
+                f.write(vectors[keep[start : start + BLOCK_ROWS]].tobytes())
+        codes = self._code_rows()
+        if codes is not None:
+            with (data / CODES_FILE).open("wb") as f:
+                for start in range(0, len(keep), BLOCK_ROWS):
+                    f.write(codes[keep[start : start + BLOCK_ROWS]].tobytes())
+            if self.quantization == "int8":
+                self._scales[keep].tofile(data / SCALES_FILE)
+        lines = [
+            json.dumps([self._node_ids[r], self._doc_ids[r], self._metadata[r]])
+            for r in keep
+        ]
+        (data / NODES_FILE).write_text("".join(f"{line}\n" for line in lines))
+        with (
+            (old_data / CONTENT_FILE).open("rb") as src,
+            (data / CONTENT_FILE).open("wb") as f,
+        ):
+            for row in keep:
+                src.seek(self._offsets[row])
+                f.write(src.readline())
+        if self._assignments is not None and self._centroids is not None:
+            self._assignments[keep].tofile(data / ASSIGNMENTS_FILE)
+            np.save(data / CENTROIDS_FILE, self._centroids)
+        self._update_meta(version=version)
+        self._vectors = None
+        self._codes = None
+        self._generation += 1
+        shutil.rmtree(old_data, ignore_errors=True)
+        self._reset()
+        self._load()
+
+    def set_metadata(self, doc_ids: list[str], metadata: dict[str, Any]) -> None:
+        """Set metadata entries on the rows of the documents, e.g. their teams.
+
+        The sidecar is rewritten as a whole: meant for rare updates.
+        """
+        with self._lock:
+            rows = [row for doc_id in doc_ids for row in self._doc_rows.get(doc_id, ())]
+            if not rows:
+                return
+            for row in rows:
+                self._metadata[row] = {**self._metadata[row], **metadata}
+            lines = [
+                json.dumps([node_id, doc_id, row_metadata])
+                for node_id, doc_id, row_metadata in zip(
+                    self._node_ids, self._doc_ids, self._metadata, strict=True
+                )
+            ]
+            tmp_nodes = self._data / f"{NODES_FILE}.tmp"
+            tmp_nodes.write_text("".join(f"{line}\n" for line in lines))
+            tmp_nodes.replace(self._data / NODES_FILE)
+            self._value_indexes.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            # Empty as soon as meta.json is gone, whatever data is left
+            (self.path / META_FILE).unlink(missing_ok=True)
+            self._remove_data(keep=None)
+            self._generation += 1
+            self._version = 0
+            self._reset()
+
+    # Filters
+
+    def _value_index(self, key: str) -> dict[Any, list[int]]:
+        """Rows of each value of `key`; list values are indexed per element."""
+        index = self._value_indexes.get(key)
+        if index is None:
+            index = {}
+            for row, metadata in enumerate(self._metadata):
+                if self._deleted[row] or key not in metadata:
+                    continue
+                value = metadata[key]
+                for element in value if isinstance(value, list) else (value,):
+                    try:
+                        index.setdefault(element, []).append(row)
+                    except TypeError:
+                        continue  # Unhashable values are not indexed
+            self._value_indexes[key] = index
+        return index
+
+    def _match_filter(self, metadata_filter: MetadataFilter) -> npt.NDArray[np.bool_]:
+        mask = np.zeros(len(self._node_ids), dtype=bool)
+        key, value, op = (
+            metadata_filter.key,
+            metadata_filter.value,
+            metadata_filter.operator,
+        )
+        if (op in (FilterOperator.EQ, FilterOperator.CONTAINS)) != isinstance(
+            value, list
+        ) and op in (
+            FilterOperator.EQ,
+            FilterOperator.CONTAINS,
+            FilterOperator.IN,
+            FilterOperator.ANY,
+        ):
+            # EQ / IN match scalar values, CONTAINS / ANY the elements of list
+            # values: the value index holds both
+            index = self._value_index(key)
+            for expected in value if isinstance(value, list) else (value,):
+                rows = index.get(expected)
+                if rows:
+                    mask[rows] = True
+        elif op == FilterOperator.IS_EMPTY:
+            for row, metadata in enumerate(self._metadata):
+                mask[row] = metadata.get(key) in (None, "", [])
+        else:
+            compare = _COMPARISONS[op]
+            for row, metadata in enumerate(self._metadata):
+                if key in metadata:
+                    try:
+                        mask[row] = compare(metadata[key], value)
+                    except TypeError:
+                        continue
+        return mask
+
+    def _match(self, filters: MetadataFilters) -> npt.NDArray[np.bool_]:
+        masks = [
+            self._match(f) if isinstance(f, MetadataFilters) else self._match_filter(f)
+            for f in filters.filters
+        ]
+        if not masks:
+            return np.ones(len(self._node_ids), dtype=bool)
+        combine = (
+            np.logical_or if filters.condition == FilterCondition.OR else np.logical_and
+        )
+        mask: npt.NDArray[np.bool_] = combine.reduce(masks)
+        return mask
+
+    # Search
+
+    def _candidate_rows(self, query: VectorStoreQuery) -> Rows | None:
+        """Rows matching the filters of the query, or None for all the rows."""
+        mask: npt.NDArray[np.bool_] | None = None
+        if query.doc_ids is not None:
+            mask = np.zeros(len(self._node_ids), dtype=bool)
+            for doc_id in query.doc_ids:
+                rows = self._doc_rows.get(doc_id)
+                if rows:
+                    mask[list(rows)] = True
+        if query.node_ids is not None:
+            node_mask = np.zeros(len(self._node_ids), dtype=bool)
+            node_mask[[self._rows[n] for n in query.node_ids if n in self._rows]] = True
+            mask = node_mask if mask is None else mask & node_mask
+        if query.filters is not None:
+            filter_mask = self._match(query.filters)
+            mask = filter_mask if mask is None else mask & filter_mask
+        return None if mask is None else np.flatnonzero(mask & ~self._deleted)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.query_embedding is None:
+            raise ValueError("The numpy vector store requires a query embedding")
+        q = _normalize(np.asarray(query.query_embedding, dtype=np.float32))
+        while True:
+            with self._lock:
+                if self._dim is None or not self._rows:
+                    return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+                rows = self._candidate_rows(query)
+                if self._centroids is not None and (
+                    rows is None or len(rows) >= self.ivf_min_rows
+                ):
+                    probed = self._probe(q)
+                    rows = (
+                        probed
+                        if rows is None
+                        else probed[np.isin(probed, rows, assume_unique=True)]
+                    )
+                # Snapshot under the lock, the scoring runs without it
+                vectors = self._vector_rows()
+                codes = self._code_rows()
+                scales = self._scales
+                deleted = self._deleted.copy()
+                generation = self._generation
+            k = query.similarity_top_k
+            if codes is None:
+                found_rows, scores = self._search(
+                    _float_scorer(vectors, q), len(vectors), deleted, rows, k
+                )
+            else:
+                scorer = (
+                    _int8_scorer(codes, scales, q)
+                    if self.quantization == "int8"
+                    else _binary_scorer(codes.view(np.uint8), q)
+                )
+                candidates = math.ceil(k * self.oversampling) if self.rescore else k
+                found_rows, scores = self._search(
+                    scorer, len(codes), deleted, rows, candidates
+                )
+                if self.rescore and len(found_rows):
+                    # Full precision scores of the best candidates only
+                    scores = _float_scorer(vectors, q)(found_rows)
+                    top = _top_k(scores, k)
+                    found_rows, scores = found_rows[top], scores[top]
+            with self._lock:
+                # Unless a compaction renumbered the rows in the meantime
+                if self._generation == generation:
+                    nodes = self._read_nodes(found_rows)
+                    break
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=scores.tolist(),
+            ids=[node.node_id for node in nodes],
+        )
+
+    def _read_nodes(self, rows: Rows) -> list[BaseNode]:
+        nodes: list[BaseNode] = []
+        with (self._data / CONTENT_FILE).open("rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                nodes.append(metadata_dict_to_node(json.loads(f.readline())))
+        return nodes
+
+    @staticmethod
+    def _search(
+        score: Scorer,
+        count: int,
+        deleted: npt.NDArray[np.bool_],
+        rows: Rows | None,
+        k: int,
+    ) -> tuple[Rows, Floats]:
+        total = count if rows is None else len(rows)
+        best_rows: list[Rows] = []
+        best_scores: list[Floats] = []
+        for start in range(0, total, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, total)
+            block_rows: Rows
+            if rows is None:
+                block_rows = np.arange(start, end)
+                scores = score(slice(start, end))
+            else:
+                block_rows = rows[start:end]
+                scores = score(block_rows)
+            live = ~deleted[block_rows]
+            block_rows, scores = block_rows[live], scores[live]
+            top = _top_k(scores, k)
+            best_rows.append(block_rows[top])
+            best_scores.append(scores[top])
+        if not best_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        all_rows = np.concatenate(best_rows)
+        all_scores = np.concatenate(best_scores)
+        top = _top_k(all_scores, k)
+        return all_rows[top], all_scores[top]
+
+    # IVF coarse quantizer
+
+    def _assign(self, rows: Rows) -> npt.NDArray[np.int32]:
+        """Closest centroid of each row."""
+        assert self._centroids is not None
+        vectors = self._vector_rows()
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), BLOCK_ROWS):
+            block = vectors[rows[start : start + BLOCK_ROWS]].astype(np.float32)
+            assignments[start : start + len(block)] = np.argmax(
+                block @ self._centroids.T, axis=1
+            )
+        return assignments
+
+    def _write_assignments(self, assignments: npt.NDArray[np.int32]) -> None:
+        tmp_path = self._data / f"{ASSIGNMENTS_FILE}.tmp"
+        assignments.astype(np.int32).tofile(tmp_path)
+        tmp_path.replace(self._data / ASSIGNMENTS_FILE)
+
+    def _maybe_train(self) -> None:
+        live = len(self._rows)
+        if self.ivf_lists <= 0 or live < self.ivf_min_rows:
+            return
+        if self._centroids is not None and live < 2 * self._trained_rows:
+            return
+        self.train_ivf()
+
+    def train_ivf(self) -> None:
+        """Train the coarse quantizer (spherical k-means) on the live rows."""
+        with self._lock:
+            live_rows = np.flatnonzero(~self._deleted)
+            n_lists = min(self.ivf_lists, len(live_rows))
+            if n_lists == 0:
+                return
+            logger.info(
+                "Training the IVF quantizer of path=%s with lists=%s on count=%s rows",
+                self.path,
+                n_lists,
+                len(live_rows),
+            )
+            rng = np.random.default_rng(0)
+            sample_size = min(len(live_rows), n_lists * KMEANS_SAMPLES_PER_LIST)
+            sample = np.sort(rng.choice(live_rows, size=sample_size, replace=False))
+            x = np.asarray(self._vector_rows()[sample], dtype=np.float32)
+            centroids = x[rng.choice(len(x), size=n_lists, replace=False)]
+            for _ in range(KMEANS_ITERATIONS):
+                labels = np.argmax(x @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, x)
+                counts = np.bincount(labels, minlength=n_lists)
+                # Empty lists keep their previous centroid
+                filled = counts > 0
+                centroids[filled] = _normalize(sums[filled])
+            self._centroids = centroids
+            all_rows = np.arange(len(self._node_ids), dtype=np.int64)
+            self._assignments = self._assign(all_rows)
+            self._write_assignments(self._assignments)
+            np.save(self._data / CENTROIDS_FILE, centroids)
+            self._trained_rows = len(live_rows)
+            self._update_meta(trained_rows=self._trained_rows)
+            self._lists = None
+
+    def _probe(self, q: Floats) -> Rows:
+        """Rows of the `ivf_nprobe` lists closest to the query, sorted."""
+        assert self._centroids is not None
+        assert self._assignments is not None
+        if self._lists is None:
+            order: Rows = np.argsort(self._assignments, kind="stable")
+            offsets: Rows = np.searchsorted(
+                self._assignments[order], np.arange(len(self._centroids) + 1)
+            )
+            self._lists = order, offsets
+        order, offsets = self._lists
+        lists = _top_k(self._centroids @ q, self.ivf_nprobe)
+        return np.sort(
+            np.concatenate([order[offsets[i] : offsets[i + 1]] for i in lists])
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "size": len(self._rows),
+            "rows": len(self._node_ids),
+            "dim": self._dim,
+            "dtype": self.dtype,
+            "quantization": self.quantization,
+            "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+        }
@@ -0,0 +1,105 @@
+import logging
+from typing import Any, Literal, cast
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.vector_stores.types import (
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+from llama_index.vector_stores.qdrant import QdrantVectorStore  # type: ignore
+from qdrant_client.http import models  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def quantization_config(
+    quantization: Literal["int8", "binary"],
+) -> models.ScalarQuantization | models.BinaryQuantization:
+    # The quantized vectors stay in RAM, the original ones are read on rescoring
+    if quantization == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    return models.BinaryQuantization(
+        binary=models.BinaryQuantizationConfig(always_ram=True)
+    )
+
+
+class QuantizedQdrantVectorStore(QdrantVectorStore):  # type: ignore
+    """Qdrant vector store with quantized vectors, and their original on disk.
+
+    New collections are created quantized, existing ones are updated to the
+    quantization (Qdrant then quantizes them in the background). Dense
+    queries search the quantized vectors, and re-score the best
+    `oversampling * k` candidates with the original ones when `rescore` is set.
+    """
+
+    _search_params: models.SearchParams = PrivateAttr()
+
+    def __init__(
+        self,
+        *args: Any,
+        quantization: Literal["int8", "binary"],
+        embed_dim: int,
+        rescore: bool = True,
+        oversampling: float = 3.0,
+        **kwargs: Any,
+    ) -> None:
+        for name in ("dense_config", "quantization_config"):
+            if name in kwargs:
+                raise TypeError(
+                    f"{name} is set from the quantization and embed_dim arguments"
+                )
+        kwargs["dense_config"] = models.VectorParams(
+            size=embed_dim, distance=models.Distance.COSINE, on_disk=True
+        )
+        kwargs["quantization_config"] = quantization_config(quantization)
+        super().__init__(*args, **kwargs)
+        self._search_params = models.SearchParams(
+            quantization=models.QuantizationSearchParams(
+                rescore=rescore, oversampling=oversampling if rescore else None
+            )
+        )
+        if self._collection_exists(self.collection_name):
+            self._update_collection()
+
+    def _update_collection(self) -> None:
+        config = self._client.get_collection(self.collection_name).config
+        if config.quantization_config == self._quantization_config:
+            return
+        logger.info(
+            "Quantizing the qdrant collection=%s with config=%s",
+            self.collection_name,
+            self._quantization_config,
+        )
+        self._client.update_collection(
+            self.collection_name,
+            vectors_config={"": models.VectorParamsDiff(on_disk=True)},
+            quantization_config=self._quantization_config,
+        )
+
+    def query(
+        self,
+        query: VectorStoreQuery,
+        **kwargs: Any,
+    ) -> VectorStoreQueryResult:
+        if (
+            self.enable_hybrid
+            or query.mode != VectorStoreQueryMode.DEFAULT
+            or query.query_embedding is None
+        ):
+            return super().query(query, **kwargs)
+        query_filter = kwargs.get("qdrant_filters")
+        if query_filter is None:
+            query_filter = cast(models.Filter, self._build_query_filter(query))
+        response = self._client.search(
+            collection_name=self.collection_name,
+            query_vector=query.query_embedding,
+            limit=query.similarity_top_k,
+            query_filter=query_filter,
+            search_params=self._search_params,
+        )
+        return self.parse_to_query_result(response)
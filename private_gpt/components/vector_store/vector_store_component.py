@@ -1,42 +1,163 @@
 import logging
+import re
+import threading
 import typing
+from pathlib import Path
 
 from injector import inject, singleton
 from llama_index.core.indices.vector_store import VectorIndexRetriever, VectorStoreIndex
 from llama_index.core.vector_stores.types import (
     BasePydanticVectorStore,
     FilterCondition,
+    FilterOperator,
     MetadataFilter,
     MetadataFilters,
 )
 
-from private_gpt.open_ai.extensions.context_filter import ContextFilter
+from private_gpt.open_ai.extensions.context_filter import (
+    COLLECTION_NAME_PATTERN,
+    ContextFilter,
+)
 from private_gpt.paths import local_data_path
 from private_gpt.settings.settings import Settings
+from private_gpt.utils.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
 
+# Metadata key of the teams a document is shared with, see `set_document_teams`
+TEAMS_METADATA_KEY = "teams"
+
+# Vector stores filtering natively on the document ids of the query
+_DOC_IDS_DATABASES = ("qdrant", "numpy")
+# Vector stores whose team tags can be updated in place
+_TEAM_FILTER_DATABASES = ("qdrant", "numpy")
+# Vector stores holding more than the default collection
+_COLLECTION_DATABASES = ("qdrant", "chroma", "milvus", "numpy")
+# Vector stores translating an `IN` metadata filter to a single native filter
+_IN_FILTER_DATABASES = ("postgres", "milvus", "chroma")
+# Vector stores quantizing the embeddings, see `vectorstore.quantization`
+_QUANTIZATION_DATABASES = ("qdrant", "milvus", "numpy")
+
+
 def _doc_id_metadata_filter(
     context_filter: ContextFilter | None,
+    database: str | None = None,
 ) -> MetadataFilters:
     filters = MetadataFilters(filters=[], condition=FilterCondition.OR)
 
     if context_filter is not None and context_filter.docs_ids is not None:
-        for doc_id in context_filter.docs_ids:
-            filters.filters.append(MetadataFilter(key="doc_id", value=doc_id))
+        if database in _IN_FILTER_DATABASES and len(context_filter.docs_ids) > 1:
+            # A single `doc_id IN (...)` instead of one OR'ed filter per id
+            filters.filters.append(
+                MetadataFilter(
+                    key="doc_id",
+                    value=list(context_filter.docs_ids),
+                    operator=FilterOperator.IN,
+                )
+            )
+        else:
+            for doc_id in context_filter.docs_ids:
+                filters.filters.append(MetadataFilter(key="doc_id", value=doc_id))
 
     return filters
 
 
+def _milvus_quantization(settings: Settings) -> dict[str, typing.Any]:
+    """Index and search configs of a quantized Milvus collection."""
+    vectorstore = settings.vectorstore
+    refine = {"refine": vectorstore.quantization_rescore, "refine_type": "FP32"}
+    search_config: dict[str, typing.Any] = {}
+    if vectorstore.quantization_rescore:
+        search_config["refine_k"] = vectorstore.quantization_oversampling
+    if vectorstore.quantization == "int8":
+        # Requires Milvus 2.5
+        index_config = {"index_type": "HNSW_SQ", "sq_type": "SQ8", **refine}
+    else:
+        # RaBitQ 1-bit quantization, requires Milvus 2.6
+        index_config = {"index_type": "IVF_RABITQ", "nlist": 1024, **refine}
+        search_config["nprobe"] = 64
+    return {"index_config": index_config, "search_config": search_config}
+
+
+def _teams_metadata_filter(teams: list[str]) -> MetadataFilter:
+    # Matches the chunks tagged with any of the teams
+    return MetadataFilter(
+        key=TEAMS_METADATA_KEY, value=list(teams), operator=FilterOperator.IN
+    )
+
+
 @singleton
 class VectorStoreComponent:
     settings: Settings
+    # The vector store of the default collection
     vector_store: BasePydanticVectorStore
 
     @inject
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
+        # Handles of the collections opened so far, created on first use
+        self._vector_stores: dict[str, BasePydanticVectorStore] = {}
+        self._vector_stores_lock = threading.Lock()
+        # Client shared by the collections of qdrant and chroma
+        self._client: typing.Any = None
+        self.vector_store = self.get_vector_store()
+        if (
+            settings.vectorstore.team_filter
+            and settings.vectorstore.database not in _TEAM_FILTER_DATABASES
+        ):
+            logger.warning(
+                "vectorstore.team_filter is not supported by database=%s, the chat "
+                "is filtered on the document ids instead",
+                settings.vectorstore.database,
+            )
+        if (
+            settings.vectorstore.quantization != "none"
+            and settings.vectorstore.database not in _QUANTIZATION_DATABASES
+        ):
+            logger.warning(
+                "vectorstore.quantization is not supported by database=%s, the "
+                "embeddings are stored in full precision",
+                settings.vectorstore.database,
+            )
+
+    def collection_name(self, collection: str | None = None) -> str:
+        """Name of the collection, `vectorstore.default_collection` if None.
+
+        :raises ValueError: if the name is not a valid collection name, or the
+            vector store does not support collections
+        """
+        if collection is None:
+            return self.settings.vectorstore.default_collection
+        if re.match(COLLECTION_NAME_PATTERN, collection) is None:
+            raise ValueError(f"Invalid collection name {collection!r}")
+        database = self.settings.vectorstore.database
+        if (
+            collection != self.settings.vectorstore.default_collection
+            and database not in _COLLECTION_DATABASES
+        ):
+            raise ValueError(
+                f"Vectorstore database {database} only supports the default "
+                "collection"
+            )
+        return collection
+
+    def get_vector_store(
+        self, collection: str | None = None
+    ) -> BasePydanticVectorStore:
+        """The vector store of the collection, opened on first use."""
+        name = self.collection_name(collection)
+        with self._vector_stores_lock:
+            vector_store = self._vector_stores.get(name)
+            if vector_store is None:
+                vector_store = self._create_vector_store(name)
+                self._vector_stores[name] = vector_store
+                logger.info("Opened the vector store collection=%s", name)
+            return vector_store
+
+    def _create_vector_store(self, collection: str) -> BasePydanticVectorStore:
+        settings = self.settings
+        is_default = collection == settings.vectorstore.default_collection
         match settings.vectorstore.database:
             case "postgres":
                 try:
@@ -53,7 +174,7 @@ class VectorStoreComponent:
                         "Postgres settings not found. Please provide settings."
                     )
 
-                self.vector_store = typing.cast(
+                return typing.cast(
                     BasePydanticVectorStore,
                     PGVectorStore.from_params(
                         **settings.postgres.model_dump(exclude_none=True),
@@ -77,19 +198,19 @@ class VectorStoreComponent:
                         "ChromaDB dependencies not found, install with `poetry install --extras vector-stores-chroma`"
                     ) from e
 
-                chroma_settings = ChromaSettings(anonymized_telemetry=False)
-                chroma_client = chromadb.PersistentClient(
-                    path=str((local_data_path / "chroma_db").absolute()),
-                    settings=chroma_settings,
-                )
-                chroma_collection = chroma_client.get_or_create_collection(
-                    "make_this_parameterizable_per_api_call"
-                )  # TODO
+                if self._client is None:
+                    chroma_settings = ChromaSettings(anonymized_telemetry=False)
+                    self._client = chromadb.PersistentClient(
+                        path=str((local_data_path / "chroma_db").absolute()),
+                        settings=chroma_settings,
+                    )
+                chroma_collection = self._client.get_or_create_collection(collection)
 
-                self.vector_store = typing.cast(
+                return typing.cast(
                     BasePydanticVectorStore,
                     BatchedChromaVectorStore(
-                        chroma_client=chroma_client, chroma_collection=chroma_collection
+                        chroma_client=self._client,
+                        chroma_collection=chroma_collection,
                     ),
                 )
 
@@ -104,22 +225,49 @@ class VectorStoreComponent:
                         "Qdrant dependencies not found, install with `poetry install --extras vector-stores-qdrant`"
                     ) from e
 
-                if settings.qdrant is None:
-                    logger.info(
-                        "Qdrant config not found. Using default settings."
-                        "Trying to connect to Qdrant at localhost:6333."
+                if self._client is None:
+                    if settings.qdrant is None:
+                        logger.info(
+                            "Qdrant config not found. Using default settings."
+                            "Trying to connect to Qdrant at localhost:6333."
+                        )
+                        self._client = QdrantClient()
+                    else:
+                        self._client = QdrantClient(
+                            **settings.qdrant.model_dump(exclude_none=True)
+                        )
+                quantization = settings.vectorstore.quantization
+                if (
+                    quantization != "none"
+                    and is_default
+                    and settings.qdrant is not None
+                    and settings.qdrant.path is not None
+                ):
+                    logger.warning(
+                        "The local qdrant at path=%s keeps its vectors in full "
+                        "precision in RAM, vectorstore.quantization requires a "
+                        "Qdrant server (or the numpy vector store)",
+                        settings.qdrant.path,
                     )
-                    client = QdrantClient()
-                else:
-                    client = QdrantClient(
-                        **settings.qdrant.model_dump(exclude_none=True)
+                if quantization != "none":
+                    from private_gpt.components.vector_store.quantized_qdrant import (
+                        QuantizedQdrantVectorStore,
                     )
-                self.vector_store = typing.cast(
+
+                    return typing.cast(
+                        BasePydanticVectorStore,
+                        QuantizedQdrantVectorStore(
+                            client=self._client,
+                            collection_name=collection,
+                            quantization=quantization,
+                            embed_dim=settings.embedding.embed_dim,
+                            rescore=settings.vectorstore.quantization_rescore,
+                            oversampling=settings.vectorstore.quantization_oversampling,
+                        ),
+                    )
+                return typing.cast(
                     BasePydanticVectorStore,
-                    QdrantVectorStore(
-                        client=client,
-                        collection_name="make_this_parameterizable_per_api_call",
-                    ),  # TODO
+                    QdrantVectorStore(client=self._client, collection_name=collection),
                 )
 
             case "milvus":
@@ -132,33 +280,48 @@ class VectorStoreComponent:
                         "Milvus dependencies not found, install with `poetry install --extras vector-stores-milvus`"
                     ) from e
 
+                # Only applied when the collection (and its index) is created
+                milvus_kwargs = (
+                    _milvus_quantization(settings)
+                    if settings.vectorstore.quantization != "none"
+                    else {}
+                )
+
                 if settings.milvus is None:
-                    logger.info(
-                        "Milvus config not found. Using default settings.\n"
-                        "Trying to connect to Milvus at local_data/private_gpt/milvus/milvus_local.db "
-                        "with collection 'make_this_parameterizable_per_api_call'."
-                    )
+                    if is_default:
+                        logger.info(
+                            "Milvus config not found. Using default settings.\n"
+                            "Trying to connect to Milvus at local_data/private_gpt/milvus/milvus_local.db "
+                            "with collection '%s'.",
+                            collection,
+                        )
 
-                    self.vector_store = typing.cast(
+                    return typing.cast(
                         BasePydanticVectorStore,
                         MilvusVectorStore(
                             dim=settings.embedding.embed_dim,
-                            collection_name="make_this_parameterizable_per_api_call",
-                            overwrite=True,
+                            collection_name=collection,
+                            # Collections opened on demand must keep their data
+                            overwrite=is_default,
+                            **milvus_kwargs,
                         ),
                     )
 
-                else:
-                    self.vector_store = typing.cast(
-                        BasePydanticVectorStore,
-                        MilvusVectorStore(
-                            dim=settings.embedding.embed_dim,
-                            uri=settings.milvus.uri,
-                            token=settings.milvus.token,
-                            collection_name=settings.milvus.collection_name,
-                            overwrite=settings.milvus.overwrite,
+                return typing.cast(
+                    BasePydanticVectorStore,
+                    MilvusVectorStore(
+                        dim=settings.embedding.embed_dim,
+                        uri=settings.milvus.uri,
+                        token=settings.milvus.token,
+                        collection_name=(
+                            settings.milvus.collection_name
+                            if is_default
+                            else collection
                         ),
-                    )
+                        overwrite=settings.milvus.overwrite and is_default,
+                        **milvus_kwargs,
+                    ),
+                )
 
             case "clickhouse":
                 try:
@@ -184,9 +347,38 @@ class VectorStoreComponent:
                     username=settings.clickhouse.username,
                     password=settings.clickhouse.password,
                 )
-                self.vector_store = ClickHouseVectorStore(
-                    clickhouse_client=clickhouse_client
+                return ClickHouseVectorStore(clickhouse_client=clickhouse_client)
+            case "numpy":
+                from private_gpt.components.vector_store.numpy_vector_store import (
+                    NumpyVectorStore,
                 )
+
+                numpy_settings = settings.numpy
+                numpy_path = Path(numpy_settings.path)
+                if not numpy_path.is_absolute():
+                    numpy_path = local_data_path / numpy_path
+                if not is_default:
+                    # Next to the files of the default collection
+                    numpy_path = numpy_path / "collections" / collection
+                numpy_store = NumpyVectorStore(
+                    path=numpy_path,
+                    dtype=numpy_settings.dtype,
+                    ivf_lists=numpy_settings.ivf_lists,
+                    ivf_nprobe=numpy_settings.ivf_nprobe,
+                    ivf_min_rows=numpy_settings.ivf_min_rows,
+                    quantization=settings.vectorstore.quantization,
+                    rescore=settings.vectorstore.quantization_rescore,
+                    oversampling=settings.vectorstore.quantization_oversampling,
+                )
+                register_metrics(
+                    (
+                        "numpy_vector_store"
+                        if is_default
+                        else f"numpy_vector_store.{collection}"
+                    ),
+                    numpy_store.metrics,
+                )
+                return numpy_store
             case _:
                 # Should be unreachable
                 # The settings validator should have caught this
@@ -194,24 +386,92 @@ class VectorStoreComponent:
                     f"Vectorstore database {settings.vectorstore.database} not supported"
                 )
 
+    @property
+    def team_filter_enabled(self) -> bool:
+        """Whether the chunks are tagged with the teams of their document."""
+        return (
+            self.settings.vectorstore.team_filter
+            and self.settings.vectorstore.database in _TEAM_FILTER_DATABASES
+        )
+
+    def set_document_teams(
+        self, doc_ids: list[str], teams: list[str], collection: str | None = None
+    ) -> None:
+        """Tag the chunks of the documents with the teams they are shared with.
+
+        Does nothing unless `vectorstore.team_filter` is enabled.
+        """
+        if not self.team_filter_enabled or not doc_ids:
+            return
+        vector_store = self.get_vector_store(collection)
+        match self.settings.vectorstore.database:
+            case "qdrant":
+                from qdrant_client.http import models  # type: ignore
+
+                client = vector_store.client
+                collection_name = vector_store.collection_name  # type: ignore[attr-defined]
+                if not client.collection_exists(collection_name):
+                    return
+                # Keyword index, so that team filters do not scan the payloads
+                client.create_payload_index(
+                    collection_name,
+                    field_name=TEAMS_METADATA_KEY,
+                    field_schema=models.PayloadSchemaType.KEYWORD,
+                )
+                client.set_payload(
+                    collection_name,
+                    payload={TEAMS_METADATA_KEY: list(teams)},
+                    points=models.Filter(
+                        must=[
+                            models.FieldCondition(
+                                key="doc_id", match=models.MatchAny(any=doc_ids)
+                            )
+                        ]
+                    ),
+                )
+            case "numpy":
+                vector_store.set_metadata(  # type: ignore[attr-defined]
+                    doc_ids, {TEAMS_METADATA_KEY: list(teams)}
+                )
+        logger.debug("Tagged count=%s documents with teams=%s", len(doc_ids), teams)
+
     def get_retriever(
         self,
         index: VectorStoreIndex,
         context_filter: ContextFilter | None = None,
         similarity_top_k: int = 2,
     ) -> VectorIndexRetriever:
-        # This way we support qdrant (using doc_ids) and the rest (using filters)
+        database = self.settings.vectorstore.database
+        filters: MetadataFilters | None = None
+        if context_filter is not None and context_filter.teams is not None:
+            if not self.team_filter_enabled:
+                raise ValueError(
+                    "Filtering on teams requires `vectorstore.team_filter` and a "
+                    f"qdrant or numpy vector store, got {database}"
+                )
+            filters = MetadataFilters(
+                filters=[_teams_metadata_filter(context_filter.teams)]
+            )
+        elif database not in _DOC_IDS_DATABASES:
+            filters = _doc_id_metadata_filter(context_filter, database)
+        # This way we support qdrant and numpy (using doc_ids) and the rest
+        # (using filters)
         return VectorIndexRetriever(
             index=index,
             similarity_top_k=similarity_top_k,
             doc_ids=context_filter.docs_ids if context_filter else None,
-            filters=(
-                _doc_id_metadata_filter(context_filter)
-                if self.settings.vectorstore.database != "qdrant"
-                else None
-            ),
+            filters=filters,
         )
 
     def close(self) -> None:
-        if hasattr(self.vector_store.client, "close"):
-            self.vector_store.client.close()
+        with self._vector_stores_lock:
+            vector_stores = list(self._vector_stores.values())
+        closed: list[typing.Any] = []
+        for vector_store in vector_stores:
+            client = vector_store.client
+            # The collections of qdrant and chroma share their client
+            if any(client is other for other in closed):
+                continue
+            closed.append(client)
+            if hasattr(client, "close"):
+                client.close()
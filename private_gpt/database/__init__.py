@@ -0,0 +1,331 @@
+import sqlite3
+import logging
+import json
+import threading
+from passlib.context import CryptContext
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Any, TypeVar
+from private_gpt.constants import PROJECT_ROOT_PATH
+from private_gpt.database.acl import DocumentAclIndex
+from private_gpt.database.migrations import migrate
+from private_gpt.database.pool import get_pool
+from private_gpt.utils.metrics import register_metrics
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+# --- Configuration ---
+DB_FOLDER = PROJECT_ROOT_PATH / "userdb"
+DB_FILE = DB_FOLDER / "private_gpt.db"
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# --- Database Initialization ---
+def get_db_connection() -> sqlite3.Connection:
+    """Returns the calling thread's pooled connection to the SQLite database.
+
+    Use it for reads only: writes must go through `run_write` so they are
+    serialized on the pool's writer thread.
+    """
+    return get_pool(DB_FILE).connection()
+
+def run_write(fn: Callable[[sqlite3.Connection], T]) -> T:
+    """Runs `fn(conn)` in a single transaction on the database writer thread."""
+    return get_pool(DB_FILE).write(fn)
+
+def init_db() -> None:
+    """Initializes the database and creates tables if they don't exist."""
+    DB_FOLDER.mkdir(parents=True, exist_ok=True)
+    register_metrics("database", get_pool(DB_FILE).metrics)
+
+    def _init(conn: sqlite3.Connection) -> None:
+        cursor = conn.cursor()
+        try:
+            # Users Table
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users';")
+            if cursor.fetchone() is None:
+                cursor.execute("""
+                    CREATE TABLE users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        username TEXT UNIQUE NOT NULL,
+                        hashed_password TEXT NOT NULL,
+                        role TEXT NOT NULL CHECK(role IN ('admin', 'user')),
+                        name TEXT,
+                        email TEXT,
+                        team TEXT, -- This will store teams as a JSON list
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                hashed_pass = hash_password('admin')
+                # --- FIX: Store default team as a JSON list ---
+                default_team_json = json.dumps(['Default'])
+                cursor.execute(
+                    "INSERT INTO users (username, hashed_password, role, name, email, team) VALUES (?, ?, ?, ?, ?, ?)",
+                    ('admin', hashed_pass, 'admin', 'Admin', '', default_team_json)
+                )
+                logger.info("Table 'users' created and default admin added.")
+            else:
+                cursor.execute("PRAGMA table_info(users)")
+                columns = [column['name'] for column in cursor.fetchall()]
+                if 'team' not in columns:
+                    cursor.execute("ALTER TABLE users ADD COLUMN team TEXT;")
+                    logger.info("Column 'team' added to 'users' table.")
+
+            # ... (rest of init_db is unchanged) ...
+            
+            # Chat History Table
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chat_history';")
+            if cursor.fetchone() is None:
+                cursor.execute("""
+                    CREATE TABLE chat_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        session_id TEXT NOT NULL,
+                        role TEXT NOT NULL,
+                        message TEXT NOT NULL,
+                        session_name TEXT,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY (user_id) REFERENCES users (id)
+                    );
+                """)
+                logger.info("Table 'chat_history' created.")
+            
+            # Document Teams Table
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='document_teams';")
+            if cursor.fetchone() is None:
+                cursor.execute("""
+                    CREATE TABLE document_teams (
+                        doc_id TEXT NOT NULL,
+                        team TEXT NOT NULL,
+                        PRIMARY KEY (doc_id, team)
+                    );
+                """)
+                logger.info("Table 'document_teams' created.")
+
+            # Indexes and tables added after the initial schema
+            migrate(conn)
+        except sqlite3.Error as e:
+            logger.error(f"Database error during initialization: {e}")
+            raise
+
+    run_write(_init)
+
+# --- Password Utilities ---
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+# --- User Management Functions ---
+def get_user(username: str) -> dict[str, Any] | None:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        user_row = cursor.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        
+        if user_row:
+            # --- FIX: Deserialize 'team' from JSON string to list ---
+            user_dict = dict(user_row)
+            try:
+                user_dict['teams'] = json.loads(user_row['team']) if user_row['team'] else []
+            except json.JSONDecodeError:
+                user_dict['teams'] = [user_row['team']] # Fallback for old non-JSON data
+            # Also keep 'team' for compatibility if needed, but 'teams' is preferred
+            user_dict['team'] = user_dict['teams'] 
+            return user_dict
+        return None
+
+def create_user(username: str, password: str, role: str, teams: list[str]) -> None:
+    """ --- FIX: Changed 'team: str' to 'teams: list[str]' --- """
+    hashed_pass = hash_password(password)
+    # --- FIX: Serialize teams list into JSON string ---
+    teams_json = json.dumps(teams)
+    try:
+        run_write(lambda conn: conn.execute(
+            "INSERT INTO users (username, hashed_password, role, name, email, team) VALUES (?, ?, ?, ?, ?, ?)",
+            (username, hashed_pass, role, '', '', teams_json)
+        ))
+        logger.info(f"User '{username}' created with role '{role}' and teams '{teams_json}'.")
+    except sqlite3.IntegrityError:
+        logger.warning(f"User '{username}' already exists.")
+
+def update_user_details(username: str, name: str, email: str) -> None:
+    run_write(lambda conn: conn.execute(
+        "UPDATE users SET name = ?, email = ? WHERE username = ?", (name, email, username)
+    ))
+
+# --- FIX: Added new function to update role and teams for admin ---
+def admin_update_user(username: str, new_role: str, new_teams: list[str]) -> None:
+    """Updates a user's role and teams (Admin only)."""
+    teams_json = json.dumps(new_teams)
+    run_write(lambda conn: conn.execute(
+        "UPDATE users SET role = ?, team = ? WHERE username = ?",
+        (new_role, teams_json, username)
+    ))
+    logger.info(f"Admin updated user '{username}'. New role: '{new_role}', New teams: '{teams_json}'.")
+
+
+def update_user_password(username: str, new_password: str) -> None:
+    new_hashed_password = hash_password(new_password)
+    run_write(lambda conn: conn.execute(
+        "UPDATE users SET hashed_password = ? WHERE username = ?",
+        (new_hashed_password, username),
+    ))
+
+def get_all_users() -> list[dict[str, Any]]:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        users_rows = cursor.execute("SELECT id, username, role, created_at, team FROM users ORDER BY created_at DESC").fetchall()
+        
+        users_list = []
+        for user_row in users_rows:
+            # --- FIX: Deserialize 'team' for each user ---
+            user_dict = {key: user_row[key] for key in user_row.keys()}
+            try:
+                # 'team' column now stores a JSON list, 'teams' is the deserialized list
+                user_dict['teams'] = json.loads(user_row['team']) if user_row['team'] else []
+            except json.JSONDecodeError:
+                 # Fallback for old data that wasn't a JSON list
+                user_dict['teams'] = [user_row['team']] if user_row['team'] else []
+            users_list.append(user_dict)
+            
+        return users_list
+
+def delete_user(username: str) -> None:
+    if username == 'admin':
+        raise ValueError("The default 'admin' user cannot be deleted.")
+
+    def _delete(conn: sqlite3.Connection) -> bool:
+        cursor = conn.cursor()
+        user_row = cursor.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        if not user_row:
+            return False
+        user_id = user_row['id']
+        cursor.execute("DELETE FROM chat_history WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM chat_sessions WHERE user_id = ?", (user_id,))
+        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        return True
+
+    try:
+        deleted = run_write(_delete)
+    except sqlite3.Error as e:
+        logger.error(f"Database error during user deletion: {e}")
+        raise
+    if not deleted:
+        logger.warning(f"Attempted to delete non-existent user: {username}")
+        return
+    logger.info(f"Successfully deleted user '{username}' and their chat history.")
+
+# --- Chat History Functions ---
+def run_write_async(fn: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+    """Queues `fn(conn)` on the database writer thread.
+
+    Returns a `concurrent.futures.Future` of its result.
+    """
+    return get_pool(DB_FILE).submit(fn)
+
+def _session_name(role: str, message: str, is_new_chat: bool) -> str | None:
+    if not is_new_chat:
+        return None
+    return " ".join(message.split()[:5]) if role == 'user' and message.strip() else "Untitled Chat"
+
+def insert_chat_messages(
+    conn: sqlite3.Connection, messages: Iterable[tuple[int, str, str, str, bool]]
+) -> None:
+    """Inserts (user_id, session_id, role, message, is_new_chat) rows.
+
+    The sessions of the messages are created, or their last activity updated.
+    """
+    rows = [
+        (user_id, session_id, role, message, _session_name(role, message, is_new_chat))
+        for user_id, session_id, role, message, is_new_chat in messages
+    ]
+    conn.executemany(
+        "INSERT INTO chat_history (user_id, session_id, role, message, session_name) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.executemany(
+        """
+        INSERT INTO chat_sessions (user_id, session_id, name) VALUES (?, ?, ?)
+        ON CONFLICT (user_id, session_id) DO UPDATE SET
+            name = COALESCE(chat_sessions.name, excluded.name),
+            last_activity = CURRENT_TIMESTAMP
+        """,
+        [(user_id, session_id, session_name) for user_id, session_id, _, _, session_name in rows]
+    )
+
+def save_chat_message(user_id: int, session_id: str, role: str, message: str, is_new_chat: bool) -> None:
+    run_write(lambda conn: insert_chat_messages(conn, [(user_id, session_id, role, message, is_new_chat)]))
+
+def get_all_chat_sessions(user_id: int) -> list[dict[str, Any]]:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        sessions = cursor.execute("""
+            SELECT session_id, name FROM chat_sessions
+            WHERE user_id = ? ORDER BY created_at DESC, rowid DESC
+        """, (user_id,)).fetchall()
+        return [{"session_id": row["session_id"], "name": row["name"]} for row in sessions]
+
+def get_chat_history_by_session(user_id: int, session_id: str) -> dict[str, Any]:
+    with get_db_connection() as conn:
+        try:
+            cursor = conn.cursor()
+            messages = cursor.execute(
+                "SELECT role, message FROM chat_history WHERE user_id = ? AND session_id = ? ORDER BY id ASC",
+                (user_id, session_id)
+            ).fetchall()
+            history = [{"role": row["role"], "content": row["message"]} for row in messages]
+            return {"session_id": session_id, "messages": history}
+        except Exception as e:
+            logger.error(f"Error fetching chat history for session {session_id}: {e}")
+            return {"session_id": session_id, "messages": []}
+
+# --- Document Team Functions ---
+_document_acl = DocumentAclIndex()
+_document_acl_load_lock = threading.Lock()
+
+def get_document_acl() -> DocumentAclIndex:
+    """Returns the in-memory document ACL index, loading it on first use."""
+    if not _document_acl.loaded:
+        with _document_acl_load_lock:
+            if not _document_acl.loaded:
+                with get_db_connection() as conn:
+                    rows = conn.execute("SELECT doc_id, team FROM document_teams").fetchall()
+                _document_acl.load((row['doc_id'], row['team']) for row in rows)
+                logger.info(f"Loaded document ACL index with {len(rows)} document/team entries.")
+    return _document_acl
+
+def add_document_teams(doc_id: str, teams: list[str]) -> None:
+    """Adds team associations for a given document ID."""
+    acl = get_document_acl()
+
+    def _replace_teams(conn: sqlite3.Connection) -> None:
+        # First, remove existing teams for the doc_id to handle updates
+        conn.execute("DELETE FROM document_teams WHERE doc_id = ?", (doc_id,))
+        # Then, insert the new teams
+        teams_data = [(doc_id, team) for team in teams]
+        conn.executemany("INSERT INTO document_teams (doc_id, team) VALUES (?, ?)", teams_data)
+
+    run_write(_replace_teams)
+    acl.set_document_teams(doc_id, teams)
+
+def delete_document_teams(doc_ids: Iterable[str]) -> None:
+    """Removes all team associations of the given document IDs."""
+    doc_ids = list(doc_ids)
+    if not doc_ids:
+        return
+    acl = get_document_acl()
+    run_write(lambda conn: conn.executemany(
+        "DELETE FROM document_teams WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids]
+    ))
+    acl.remove_documents(doc_ids)
+
+def get_document_teams(doc_id: str) -> list[str]:
+    """Retrieves all teams associated with a given document ID."""
+    return get_document_acl().teams_for(doc_id)
+
+def get_allowed_doc_ids(teams: Iterable[str]) -> set[str]:
+    """Retrieves the IDs of all documents visible to any of the given teams."""
+    return get_document_acl().allowed_doc_ids(teams)
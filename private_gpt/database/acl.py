@@ -0,0 +1,74 @@
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+
+
+class DocumentAclIndex:
+    """In-memory, two-way index of the `document_teams` table.
+
+    It maps every document to its teams and every team to its documents, so
+    access checks are set lookups instead of one query per document. The index is
+    loaded once from the database and then kept up to date in place by the
+    functions writing to `document_teams`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._doc_teams: dict[str, frozenset[str]] = {}
+        self._team_docs: defaultdict[str, set[str]] = defaultdict(set)
+        self.loaded = False
+
+    def load(self, rows: Iterable[tuple[str, str]]) -> None:
+        """Replace the index content with (doc_id, team) rows."""
+        doc_teams: defaultdict[str, set[str]] = defaultdict(set)
+        for doc_id, team in rows:
+            doc_teams[doc_id].add(team)
+        with self._lock:
+            self._doc_teams = {}
+            self._team_docs = defaultdict(set)
+            for doc_id, teams in doc_teams.items():
+                self._set(doc_id, teams)
+            self.loaded = True
+
+    def set_document_teams(self, doc_id: str, teams: Iterable[str]) -> None:
+        with self._lock:
+            self._remove(doc_id)
+            self._set(doc_id, teams)
+
+    def remove_documents(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def teams_for(self, doc_id: str) -> list[str]:
+        with self._lock:
+            return sorted(self._doc_teams.get(doc_id, ()))
+
+    def doc_ids(self) -> list[str]:
+        """Return the ids of the documents shared with at least one team."""
+        with self._lock:
+            return list(self._doc_teams)
+
+    def allowed_doc_ids(self, teams: Iterable[str]) -> set[str]:
+        """Return the ids of the documents visible to any of the given teams."""
+        with self._lock:
+            allowed: set[str] = set()
+            for team in teams:
+                allowed |= self._team_docs.get(team, set())
+            return allowed
+
+    def _set(self, doc_id: str, teams: Iterable[str]) -> None:
+        teams = frozenset(teams)
+        if not teams:
+            return
+        self._doc_teams[doc_id] = teams
+        for team in teams:
+            self._team_docs[team].add(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        for team in self._doc_teams.pop(doc_id, ()):
+            team_docs = self._team_docs.get(team)
+            if team_docs is not None:
+                team_docs.discard(doc_id)
+                if not team_docs:
+                    del self._team_docs[team]
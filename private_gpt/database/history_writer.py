@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import logging
+from functools import partial
+from typing import Any, NamedTuple
+
+from private_gpt.database import (
+    insert_chat_messages,
+    run_write_async,
+    save_chat_message,
+)
+from private_gpt.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 256
+
+
+class ChatHistoryRecord(NamedTuple):
+    user_id: int
+    session_id: str
+    role: str
+    message: str
+    is_new_chat: bool
+
+
+class ChatHistoryWriter:
+    """Write chat messages in the background, off the request path.
+
+    Messages are pushed to an asyncio queue without waiting, and a task running
+    on the application event loop drains it: everything queued since the last
+    write is committed as one transaction on the database writer thread, so the
+    event loop never waits on SQLite. `stop` flushes the pending messages.
+
+    Until `start` is called (e.g. when the app runs without its lifespan), or
+    when called from another event loop or thread, `save` writes synchronously.
+    """
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE) -> None:
+        self.max_batch_size = max_batch_size
+        self._queue: asyncio.Queue[ChatHistoryRecord] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._written = 0
+        self._batches = 0
+        self._failed = 0
+        register_metrics("chat_history_writer", self.metrics)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="chat-history-writer")
+
+    async def stop(self) -> None:
+        """Flush the queued messages and stop the background task."""
+        if self._task is None or self._queue is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        self._queue = None
+        self._loop = None
+        logger.info("Chat history writer stopped, %s messages written", self._written)
+
+    def save(
+        self,
+        user_id: int,
+        session_id: str,
+        role: str,
+        message: str,
+        is_new_chat: bool,
+    ) -> None:
+        """Queue a chat message, same arguments as `save_chat_message`."""
+        if self._queue is None or not self._in_writer_loop():
+            save_chat_message(user_id, session_id, role, message, is_new_chat)
+            return
+        self._queue.put_nowait(
+            ChatHistoryRecord(user_id, session_id, role, message, is_new_chat)
+        )
+
+    def _in_writer_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await asyncio.wrap_future(
+                    run_write_async(partial(insert_chat_messages, messages=batch))
+                )
+                self._written += len(batch)
+                self._batches += 1
+            except Exception:
+                self._failed += len(batch)
+                logger.exception("Failed to write %s chat messages", len(batch))
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "written": self._written,
+            "batches": self._batches,
+            "failed": self._failed,
+            "avg_batch_size": self._written / self._batches if self._batches else 0.0,
+        }
+
+
+chat_history_writer = ChatHistoryWriter()
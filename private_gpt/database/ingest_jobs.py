@@ -0,0 +1,95 @@
+"""Persistence of the ingestion jobs, in the `ingest_jobs` table.
+
+The staged files of a job and the teams given access to its documents are
+stored as JSON arrays, with the collection the documents are ingested in. A job
+goes from `queued` to `running`, then to `succeeded` or `failed`.
+"""
+
+import json
+import sqlite3
+from typing import Any
+
+from private_gpt.database import get_db_connection, run_write
+
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+def _as_dict(row: sqlite3.Row) -> dict[str, Any]:
+    job = dict(row)
+    job["files"] = json.loads(job["files"])
+    job["teams"] = json.loads(job["teams"]) if job["teams"] is not None else None
+    job["doc_ids"] = json.loads(job["doc_ids"])
+    return job
+
+
+def create_job(
+    job_id: str,
+    files: list[tuple[str, str]],
+    teams: list[str] | None,
+    collection: str | None = None,
+) -> None:
+    """Record a queued job of (file name, staged path) pairs."""
+    run_write(
+        lambda conn: conn.execute(
+            "INSERT INTO ingest_jobs (id, status, files, teams, collection) "
+            "VALUES (?, 'queued', ?, ?, ?)",
+            (
+                job_id,
+                json.dumps(files),
+                json.dumps(teams) if teams else None,
+                collection,
+            ),
+        )
+    )
+
+
+def get_job(job_id: str) -> dict[str, Any] | None:
+    with get_db_connection() as conn:
+        row = conn.execute(
+            "SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return _as_dict(row) if row is not None else None
+
+
+def get_unfinished_jobs() -> list[dict[str, Any]]:
+    """Jobs queued or running, oldest first."""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT * FROM ingest_jobs WHERE status IN (?, ?) ORDER BY created_at",
+            UNFINISHED_STATUSES,
+        ).fetchall()
+    return [_as_dict(row) for row in rows]
+
+
+def claim_job(job_id: str) -> bool:
+    """Mark a queued job as running. False if it is not queued (anymore)."""
+    return run_write(
+        lambda conn: conn.execute(
+            "UPDATE ingest_jobs SET status = 'running', "
+            "started_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'queued'",
+            (job_id,),
+        ).rowcount
+        == 1
+    )
+
+
+def update_job_progress(
+    job_id: str, processed_files: int, current_file: str | None, doc_ids: list[str]
+) -> None:
+    run_write(
+        lambda conn: conn.execute(
+            "UPDATE ingest_jobs SET processed_files = ?, current_file = ?, "
+            "doc_ids = ? WHERE id = ?",
+            (processed_files, current_file, json.dumps(doc_ids), job_id),
+        )
+    )
+
+
+def mark_job_finished(job_id: str, status: str, error: str | None) -> None:
+    run_write(
+        lambda conn: conn.execute(
+            "UPDATE ingest_jobs SET status = ?, error = ?, current_file = NULL, "
+            "finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (status, error, job_id),
+        )
+    )
@@ -0,0 +1,128 @@
+"""Versioned schema migrations of the users database.
+
+The schema version is stored in SQLite's `user_version` header field. Every
+entry of `MIGRATIONS` upgrades the schema by one version, and `migrate` applies
+the pending ones in order, in the caller's transaction. Migrations are only ever
+appended: never edit or reorder one that has been released.
+"""
+
+import logging
+import sqlite3
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def _add_lookup_indexes(conn: sqlite3.Connection) -> None:
+    # Messages of a session, in insertion order
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_history_user_session "
+        "ON chat_history (user_id, session_id, id)"
+    )
+    # Documents visible to a team
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_document_teams_team "
+        "ON document_teams (team, doc_id)"
+    )
+
+
+def _add_chat_sessions(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            user_id INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, session_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_created "
+        "ON chat_sessions (user_id, created_at)"
+    )
+    # Backfill: a session is named after its first message
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO chat_sessions
+            (user_id, session_id, name, created_at, last_activity)
+        WITH sessions AS (
+            SELECT user_id, session_id, MIN(id) AS first_id,
+                   MIN(timestamp) AS created_at, MAX(timestamp) AS last_activity
+            FROM chat_history
+            GROUP BY user_id, session_id
+        )
+        SELECT s.user_id, s.session_id, h.session_name,
+               s.created_at, s.last_activity
+        FROM sessions s JOIN chat_history h ON h.id = s.first_id
+        ORDER BY s.first_id
+        """
+    )
+
+
+def _add_ingest_jobs(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            files TEXT NOT NULL,
+            teams TEXT,
+            processed_files INTEGER NOT NULL DEFAULT 0,
+            current_file TEXT,
+            doc_ids TEXT NOT NULL DEFAULT '[]',
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """
+    )
+    # Jobs to resume on startup
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status "
+        "ON ingest_jobs (status, created_at)"
+    )
+
+
+def _add_ingest_job_collection(conn: sqlite3.Connection) -> None:
+    # NULL for the default collection
+    conn.execute("ALTER TABLE ingest_jobs ADD COLUMN collection TEXT")
+
+
+MIGRATIONS: list[Migration] = [
+    _add_lookup_indexes,
+    _add_chat_sessions,
+    _add_ingest_jobs,
+    _add_ingest_job_collection,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply the pending migrations and return the resulting schema version."""
+    version = get_schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than the supported "
+            f"version {SCHEMA_VERSION}, upgrade PrivateGPT to use it"
+        )
+    if version < SCHEMA_VERSION and not conn.in_transaction:
+        # DDL statements do not open a transaction implicitly
+        conn.execute("BEGIN")
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info("Migrating the database schema to version=%s", target)
+        migration(conn)
+        # PRAGMA does not accept bound parameters
+        conn.execute(f"PRAGMA user_version = {target}")
+    return get_schema_version(conn)
@@ -0,0 +1,174 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import weakref
+from collections.abc import Callable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Tuned for a small, read-mostly database shared by a few writers.
+PRAGMAS = (
+    # Readers never block the writer (and the other way around)
+    "PRAGMA journal_mode=WAL",
+    # Durable across application crashes, fsync only at checkpoints in WAL mode
+    "PRAGMA synchronous=NORMAL",
+    # Page cache size, in KiB when negative
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+CACHED_STATEMENTS = 256
+
+
+class _ThreadConnection:
+    """Read connection of a thread, stored in its thread-local storage.
+
+    The storage is freed when the thread exits, which closes the connection.
+    """
+
+    __slots__ = ("__weakref__", "conn")
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+
+class ConnectionPool:
+    """SQLite access layer with per-thread readers and a single writer thread.
+
+    Every thread reading the database gets its own connection, kept for the
+    lifetime of the thread, so prepared statements are reused across calls
+    instead of reconnecting each time. It is closed when the thread exits
+    (e.g. an idle worker thread of the server).
+
+    All writes are funneled through one dedicated thread, which owns the only
+    write connection: SQLite allows one writer at a time anyway, and
+    serializing writes in-process avoids `database is locked` retries.
+    """
+
+    def __init__(self, db_file: Path) -> None:
+        self.db_file = db_file
+        self._local = threading.local()
+        self._connections: set[sqlite3.Connection] = set()
+        self._connections_lock = threading.Lock()
+        self._writes: queue.Queue[
+            tuple[Callable[[sqlite3.Connection], Any], Future[Any]] | None
+        ] = queue.Queue()
+        self._write_count = 0
+        self._closed = False
+        self._writer = threading.Thread(
+            target=self._run_writer, name="sqlite-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_file,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._connections_lock:
+            self._connections.add(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._connections_lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the read connection owned by the calling thread."""
+        holder: _ThreadConnection | None = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = _ThreadConnection(self._connect())
+            weakref.finalize(holder, self._release, holder.conn)
+            self._local.holder = holder
+        return holder.conn
+
+    def write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Run `fn` in a transaction on the writer thread and return its result.
+
+        The transaction is committed when `fn` returns, and rolled back if it
+        raises. Calls made from the writer thread itself run inline.
+        """
+        if threading.current_thread() is self._writer:
+            return fn(self.connection())
+        return self.submit(fn).result()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        """Queue `fn` like `write`, without waiting for it to run."""
+        if self._closed:
+            raise RuntimeError(f"The connection pool of {self.db_file} is closed")
+        future: Future[T] = Future()
+        self._writes.put((fn, future))
+        return future
+
+    def _run_writer(self) -> None:
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            fn, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn = self.connection()
+            try:
+                result = fn(conn)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                future.set_exception(e)
+            else:
+                self._write_count += 1
+                future.set_result(result)
+
+    @property
+    def write_queue_depth(self) -> int:
+        return self._writes.qsize()
+
+    @property
+    def write_count(self) -> int:
+        return self._write_count
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "db_file": str(self.db_file),
+            "connections": len(self._connections),
+            "write_queue_depth": self.write_queue_depth,
+            "writes": self.write_count,
+        }
+
+    def close(self) -> None:
+        """Stop the writer thread once pending writes are done and close connections."""
+        self._closed = True
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join(timeout=10)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+_pools: dict[Path, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file: Path) -> ConnectionPool:
+    """Return the process-wide pool for `db_file`, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None:
+            pool = ConnectionPool(db_file)
+            _pools[db_file] = pool
+            atexit.register(pool.close)
+        return pool
@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 from injector import Injector
 from fastapi import Depends, FastAPI, Request, Response, Form
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
@@ -11,14 +12,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from private_gpt.constants import PROJECT_ROOT_PATH
+from private_gpt.components.ingest.parse_worker_pool import ParseWorkerPool
 from private_gpt.server.chat.chat_router import chat_router
 from private_gpt.server.chunks.chunks_router import chunks_router
 from private_gpt.server.completions.completions_router import completions_router
 from private_gpt.server.embeddings.embeddings_router import embeddings_router
 from private_gpt.server.health.health_router import health_router
+from private_gpt.server.ingest.ingest_job_service import IngestJobService
 from private_gpt.server.ingest.ingest_router import ingest_router
+from private_gpt.server.ingest.ingest_service import IngestService
+from private_gpt.server.metrics.metrics_router import metrics_router
 from private_gpt.settings.settings import Settings
 from private_gpt.database import init_db, get_user, verify_password
+from private_gpt.database.history_writer import chat_history_writer
 
 
 logger = logging.getLogger(__name__)
@@ -57,7 +63,20 @@ def create_app(root_injector: Injector) -> FastAPI:
     async def bind_injector_to_request(request: Request) -> None:
         request.state.injector = root_injector
 
-    app = FastAPI(dependencies=[Depends(bind_injector_to_request)])
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await chat_history_writer.start()
+        # Resume the ingest jobs queued before the last shutdown
+        ingest_jobs = root_injector.get(IngestJobService)
+        ingest_jobs.start()
+        yield
+        ingest_jobs.stop()
+        root_injector.get(IngestService).close()
+        root_injector.get(ParseWorkerPool).close()
+        # Flush the chat messages still queued before exiting
+        await chat_history_writer.stop()
+
+    app = FastAPI(dependencies=[Depends(bind_injector_to_request)], lifespan=lifespan)
     
     app.add_middleware(AuthenticationMiddleware)
     app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY", "a_very_secret_key"), max_age=SESSION_MAX_AGE)
@@ -115,6 +134,7 @@ def create_app(root_injector: Injector) -> FastAPI:
     app.include_router(chunks_router)
     app.include_router(ingest_router)
     app.include_router(health_router)
+    app.include_router(metrics_router)
     
     settings = root_injector.get(Settings)
     if settings.server.cors.enabled:
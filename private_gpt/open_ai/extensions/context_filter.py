@@ -1,7 +1,27 @@
 from pydantic import BaseModel, Field
 
+# Names of the vector store collections, also used in paths and index ids
+COLLECTION_NAME_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
 
 class ContextFilter(BaseModel):
     docs_ids: list[str] | None = Field(
         examples=[["c202d5e6-7b69-4869-81cc-dd574ee8ee11"]]
     )
+    teams: list[str] | None = Field(
+        None,
+        description=(
+            "Only use the documents shared with any of these teams. Requires "
+            "`vectorstore.team_filter`."
+        ),
+        examples=[["Default"]],
+    )
+    collection: str | None = Field(
+        None,
+        description=(
+            "Only search the documents ingested in this collection. Defaults to "
+            "`vectorstore.default_collection`."
+        ),
+        pattern=COLLECTION_NAME_PATTERN,
+        examples=["team-a"],
+    )
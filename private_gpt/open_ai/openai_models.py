@@ -1,6 +1,6 @@
 import time
 import uuid
-from collections.abc import Iterator
+from collections.abc import AsyncIterator, Iterator
 from typing import Literal
 
 from llama_index.core.llms import ChatResponse, CompletionResponse
@@ -110,13 +110,47 @@ def to_openai_response(
 
 
 def to_openai_sse_stream(
+    response_generator: (
+        Iterator[str | CompletionResponse | ChatResponse]
+        | AsyncIterator[str | CompletionResponse | ChatResponse]
+    ),
+    sources: list[Chunk] | None = None,
+) -> Iterator[str] | AsyncIterator[str]:
+    """Format a token stream as OpenAI server-sent events.
+
+    Async token streams give an async event stream, so they can be served by
+    the event loop without holding a worker thread.
+    """
+    if isinstance(response_generator, AsyncIterator):
+        return _to_openai_async_sse_stream(response_generator, sources)
+    return _to_openai_sync_sse_stream(response_generator, sources)
+
+
+def _to_openai_sse_event(
+    response: str | CompletionResponse | ChatResponse, sources: list[Chunk] | None
+) -> str:
+    if isinstance(response, CompletionResponse | ChatResponse):
+        return f"data: {OpenAICompletion.json_from_delta(text=response.delta)}\n\n"
+    return (
+        f"data: {OpenAICompletion.json_from_delta(text=response, sources=sources)}\n\n"
+    )
+
+
+def _to_openai_sync_sse_stream(
     response_generator: Iterator[str | CompletionResponse | ChatResponse],
     sources: list[Chunk] | None = None,
 ) -> Iterator[str]:
     for response in response_generator:
-        if isinstance(response, CompletionResponse | ChatResponse):
-            yield f"data: {OpenAICompletion.json_from_delta(text=response.delta)}\n\n"
-        else:
-            yield f"data: {OpenAICompletion.json_from_delta(text=response, sources=sources)}\n\n"
+        yield _to_openai_sse_event(response, sources)
+    yield f"data: {OpenAICompletion.json_from_delta(text='', finish_reason='stop')}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+async def _to_openai_async_sse_stream(
+    response_generator: AsyncIterator[str | CompletionResponse | ChatResponse],
+    sources: list[Chunk] | None = None,
+) -> AsyncIterator[str]:
+    async for response in response_generator:
+        yield _to_openai_sse_event(response, sources)
     yield f"data: {OpenAICompletion.json_from_delta(text='', finish_reason='stop')}\n\n"
     yield "data: [DONE]\n\n"
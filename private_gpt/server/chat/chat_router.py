@@ -62,7 +62,7 @@ class ChatBody(BaseModel):
         }
     },
 )
-def chat_completion(
+async def chat_completion(
     request: Request, body: ChatBody
 ) -> OpenAICompletion | StreamingResponse:
     """Given a list of messages comprising a conversation, return a response.
@@ -92,7 +92,7 @@ def chat_completion(
         ChatMessage(content=m.content, role=MessageRole(m.role)) for m in body.messages
     ]
     if body.stream:
-        completion_gen = service.stream_chat(
+        completion_gen = await service.astream_chat(
             messages=all_messages,
             use_context=body.use_context,
             context_filter=body.context_filter,
@@ -105,7 +105,7 @@ def chat_completion(
             media_type="text/event-stream",
         )
     else:
-        completion = service.chat(
+        completion = await service.achat(
             messages=all_messages,
             use_context=body.use_context,
             context_filter=body.context_filter,
@@ -1,5 +1,11 @@
+import asyncio
+import threading
+import time
+from collections.abc import AsyncIterator
+from contextlib import AbstractContextManager, nullcontext
 from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from functools import partial
+from typing import TYPE_CHECKING, Any
 
 from injector import inject, singleton
 from llama_index.core.chat_engine import ContextChatEngine, SimpleChatEngine
@@ -8,34 +14,33 @@ from llama_index.core.chat_engine.types import (
 )
 from llama_index.core.indices import VectorStoreIndex
 from llama_index.core.indices.postprocessor import MetadataReplacementPostProcessor
-from llama_index.core.llms import ChatMessage, MessageRole
-from llama_index.core.postprocessor import (
-    SentenceTransformerRerank,
-    SimilarityPostprocessor,
-)
+from llama_index.core.llms import ChatMessage, CustomLLM, MessageRole
+from llama_index.core.postprocessor import SimilarityPostprocessor
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
 from llama_index.core.storage import StorageContext
 from llama_index.core.types import TokenGen
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from private_gpt.components.embedding.embedding_component import EmbeddingComponent
 from private_gpt.components.llm.llm_component import LLMComponent
 from private_gpt.components.node_store.node_store_component import NodeStoreComponent
+from private_gpt.components.rerank.rerank_component import RerankComponent
+from private_gpt.components.tracing.tracing_component import (
+    Trace,
+    TracingComponent,
+)
 from private_gpt.components.vector_store.vector_store_component import (
     VectorStoreComponent,
 )
 from private_gpt.open_ai.extensions.context_filter import ContextFilter
 from private_gpt.server.chunks.chunks_service import Chunk
 from private_gpt.settings.settings import Settings
-
-# Make MLflow import optional
-try:
-    import mlflow
-    MLFLOW_AVAILABLE = True
-except ImportError:
-    MLFLOW_AVAILABLE = False
+from private_gpt.utils.async_utils import iterate_in_executor, run_in_executor
 
 if TYPE_CHECKING:
     from llama_index.core.postprocessor.types import BaseNodePostprocessor
+    from llama_index.core.retrievers import VectorIndexRetriever
 
 
 class Completion(BaseModel):
@@ -48,6 +53,13 @@ class CompletionGen(BaseModel):
     sources: list[Chunk] | None = None
 
 
+class AsyncCompletionGen(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    response: AsyncIterator[str]
+    sources: list[Chunk] | None = None
+
+
 @dataclass
 class ChatEngineInput:
     system_message: ChatMessage | None = None
@@ -82,6 +94,49 @@ class ChatEngineInput:
         )
 
 
+@dataclass
+class _ChatRequest:
+    """Chat engine and inputs of a request, see `ChatService._prepare_chat`."""
+
+    chat_engine: BaseChatEngine
+    message: str
+    chat_history: list[ChatMessage] | None
+    trace: Trace | None
+
+    def span(self, name: str) -> AbstractContextManager[dict[str, Any]]:
+        # Untraced requests fill the attributes of a throwaway span
+        if self.trace is None:
+            return nullcontext({})
+        return self.trace.span(name)
+
+
+class OffloadedRetriever(BaseRetriever):
+    """Run a retriever and its node postprocessors in a worker thread when async.
+
+    Query embedding, vector search and reranking are blocking calls for most of
+    the supported backends, so the async chat engines use this wrapper to keep
+    them off the event loop.
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        node_postprocessors: list["BaseNodePostprocessor"],
+    ) -> None:
+        super().__init__()
+        self._retriever = retriever
+        self._node_postprocessors = node_postprocessors
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        nodes: list[NodeWithScore] = self._retriever.retrieve(query_bundle)
+        for postprocessor in self._node_postprocessors:
+            nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        return nodes
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        return await asyncio.to_thread(self._retrieve, query_bundle)
+
+
 @singleton
 class ChatService:
     settings: Settings
@@ -94,11 +149,15 @@ class ChatService:
         vector_store_component: VectorStoreComponent,
         embedding_component: EmbeddingComponent,
         node_store_component: NodeStoreComponent,
+        rerank_component: RerankComponent,
+        tracing_component: TracingComponent,
     ) -> None:
         self.settings = settings
         self.llm_component = llm_component
         self.embedding_component = embedding_component
         self.vector_store_component = vector_store_component
+        self.rerank_component = rerank_component
+        self.tracing_component = tracing_component
         self.storage_context = StorageContext.from_defaults(
             vector_store=vector_store_component.vector_store,
             docstore=node_store_component.doc_store,
@@ -111,42 +170,100 @@ class ChatService:
             embed_model=embedding_component.embedding_model,
             show_progress=True,
         )
+        # The indexes of the other collections, created on first use
+        self._indexes: dict[str, VectorStoreIndex] = {
+            vector_store_component.collection_name(): self.index
+        }
+        # Retrievers and postprocessors are stateless, so they are built once and
+        # shared by every request. Chat engines hold the conversation memory and
+        # are still created per request, which is cheap once these are cached.
+        self._retrievers: dict[tuple[str, int], VectorIndexRetriever] = {}
+        self._node_postprocessors: dict[
+            tuple[Any, ...], list[BaseNodePostprocessor]
+        ] = {}
+        self._cache_lock = threading.Lock()
+
+    def _get_index(self, collection: str | None) -> VectorStoreIndex:
+        name = self.vector_store_component.collection_name(collection)
+        with self._cache_lock:
+            index = self._indexes.get(name)
+            if index is None:
+                index = VectorStoreIndex.from_vector_store(
+                    self.vector_store_component.get_vector_store(name),
+                    llm=self.llm_component.llm,
+                    embed_model=self.embedding_component.embedding_model,
+                    show_progress=True,
+                )
+                self._indexes[name] = index
+            return index
+
+    def _get_retriever(
+        self, context_filter: ContextFilter | None, similarity_top_k: int
+    ) -> "VectorIndexRetriever":
+        collection = context_filter.collection if context_filter else None
+        index = self._get_index(collection)
+        if context_filter is not None and (
+            context_filter.docs_ids is not None or context_filter.teams is not None
+        ):
+            # Filtered retrievers are specific to the request
+            return self.vector_store_component.get_retriever(
+                index=index,
+                context_filter=context_filter,
+                similarity_top_k=similarity_top_k,
+            )
+        key = (
+            self.vector_store_component.collection_name(collection),
+            similarity_top_k,
+        )
+        with self._cache_lock:
+            retriever = self._retrievers.get(key)
+            if retriever is None:
+                retriever = self.vector_store_component.get_retriever(
+                    index=index, similarity_top_k=similarity_top_k
+                )
+                self._retrievers[key] = retriever
+            return retriever
 
-        # Only setup MLflow if it's available
-        if MLFLOW_AVAILABLE:
-            mlflow.set_tracking_uri("file:./mlruns")
-            mlflow.set_experiment("private-gpt-rag")
-            mlflow.llama_index.autolog()
+    def _get_node_postprocessors(self) -> list["BaseNodePostprocessor"]:
+        rag = self.settings.rag
+        key = (rag.similarity_value, rag.rerank.enabled, rag.rerank.top_n)
+        with self._cache_lock:
+            node_postprocessors = self._node_postprocessors.get(key)
+            if node_postprocessors is None:
+                node_postprocessors = [
+                    MetadataReplacementPostProcessor(target_metadata_key="window"),
+                ]
+                if rag.similarity_value:
+                    node_postprocessors.append(
+                        SimilarityPostprocessor(similarity_cutoff=rag.similarity_value)
+                    )
+                if rag.rerank.enabled:
+                    node_postprocessors.append(
+                        self.rerank_component.postprocessor(rag.rerank.top_n)
+                    )
+                self._node_postprocessors[key] = node_postprocessors
+            return node_postprocessors
 
     def _chat_engine(
         self,
         system_prompt: str | None = None,
         use_context: bool = False,
         context_filter: ContextFilter | None = None,
+        offload_retrieval: bool = False,
     ) -> BaseChatEngine:
-        settings = self.settings
         if use_context:
-            vector_index_retriever = self.vector_store_component.get_retriever(
-                index=self.index,
-                context_filter=context_filter,
-                similarity_top_k=self.settings.rag.similarity_top_k,
+            vector_index_retriever = self._get_retriever(
+                context_filter, self.settings.rag.similarity_top_k
             )
-            node_postprocessors: list[BaseNodePostprocessor] = [
-                MetadataReplacementPostProcessor(target_metadata_key="window"),
-            ]
-            if settings.rag.similarity_value:
-                node_postprocessors.append(
-                    SimilarityPostprocessor(
-                        similarity_cutoff=settings.rag.similarity_value
-                    )
-                )
-
-            if settings.rag.rerank.enabled:
-                rerank_postprocessor = SentenceTransformerRerank(
-                    model=settings.rag.rerank.model, top_n=settings.rag.rerank.top_n
+            node_postprocessors = self._get_node_postprocessors()
+            if offload_retrieval:
+                return ContextChatEngine.from_defaults(
+                    system_prompt=system_prompt,
+                    retriever=OffloadedRetriever(
+                        vector_index_retriever, node_postprocessors
+                    ),
+                    llm=self.llm_component.llm,  # Takes no effect at the moment
                 )
-                node_postprocessors.append(rerank_postprocessor)
-
             return ContextChatEngine.from_defaults(
                 system_prompt=system_prompt,
                 retriever=vector_index_retriever,
@@ -159,39 +276,65 @@ class ChatService:
                 llm=self.llm_component.llm,
             )
 
-    def stream_chat(
+    def _prepare_chat(
         self,
+        trace_name: str,
         messages: list[ChatMessage],
-        use_context: bool = False,
-        context_filter: ContextFilter | None = None,
-    ) -> CompletionGen:
-        chat_engine_input = ChatEngineInput.from_messages(messages)
-        last_message = (
-            chat_engine_input.last_message.content
-            if chat_engine_input.last_message
-            else None
+        use_context: bool,
+        context_filter: ContextFilter | None,
+        offload_retrieval: bool = False,
+    ) -> _ChatRequest:
+        """Split the messages, start the trace and build the chat engine."""
+        trace = self.tracing_component.start_trace(
+            trace_name, use_context=use_context, messages=len(messages)
         )
+        chat_engine_input = ChatEngineInput.from_messages(messages)
+        last_message = chat_engine_input.last_message
         system_prompt = (
             chat_engine_input.system_message.content
             if chat_engine_input.system_message
             else None
         )
-        chat_history = (
-            chat_engine_input.chat_history if chat_engine_input.chat_history else None
-        )
-
         chat_engine = self._chat_engine(
             system_prompt=system_prompt,
             use_context=use_context,
             context_filter=context_filter,
+            offload_retrieval=offload_retrieval,
         )
-        streaming_response = chat_engine.stream_chat(
-            message=last_message if last_message is not None else "",
-            chat_history=chat_history,
+        return _ChatRequest(
+            chat_engine=chat_engine,
+            message=(
+                last_message.content
+                if last_message is not None and last_message.content is not None
+                else ""
+            ),
+            chat_history=chat_engine_input.chat_history or None,
+            trace=trace,
+        )
+
+    def stream_chat(
+        self,
+        messages: list[ChatMessage],
+        use_context: bool = False,
+        context_filter: ContextFilter | None = None,
+    ) -> CompletionGen:
+        request = self._prepare_chat(
+            "chat.stream", messages, use_context, context_filter
         )
+        with request.span("retrieve") as span:
+            streaming_response = request.chat_engine.stream_chat(
+                message=request.message, chat_history=request.chat_history
+            )
+            span["sources"] = len(streaming_response.source_nodes)
         sources = [Chunk.from_node(node) for node in streaming_response.source_nodes]
+        response_gen = streaming_response.response_gen
         completion_gen = CompletionGen(
-            response=streaming_response.response_gen, sources=sources
+            response=(
+                response_gen
+                if request.trace is None
+                else self._traced_token_gen(request.trace, response_gen)
+            ),
+            sources=sources,
         )
         return completion_gen
 
@@ -201,41 +344,139 @@ class ChatService:
         use_context: bool = False,
         context_filter: ContextFilter | None = None,
     ) -> Completion:
-        chat_engine_input = ChatEngineInput.from_messages(messages)
-        last_message = (
-            chat_engine_input.last_message.content
-            if chat_engine_input.last_message
-            else None
-        )
-        system_prompt = (
-            chat_engine_input.system_message.content
-            if chat_engine_input.system_message
-            else None
+        request = self._prepare_chat("chat", messages, use_context, context_filter)
+        with request.span("chat") as span:
+            wrapped_response = request.chat_engine.chat(
+                message=request.message, chat_history=request.chat_history
+            )
+            span["sources"] = len(wrapped_response.source_nodes)
+        if request.trace is not None:
+            request.trace.end()
+        sources = [Chunk.from_node(node) for node in wrapped_response.source_nodes]
+        completion = Completion(response=wrapped_response.response, sources=sources)
+        return completion
+
+    @property
+    def _llm_is_async(self) -> bool:
+        # CustomLLM implementations (llamacpp, mock...) only fake async support:
+        # their async methods run the blocking generation on the event loop
+        return not isinstance(self.llm_component.llm, CustomLLM)
+
+    async def astream_chat(
+        self,
+        messages: list[ChatMessage],
+        use_context: bool = False,
+        context_filter: ContextFilter | None = None,
+    ) -> AsyncCompletionGen:
+        """Async version of `stream_chat`, streaming tokens without holding a thread.
+
+        Retrieval runs in a worker thread, then the tokens are streamed with the
+        LLM async API. For LLMs without native async support, the blocking
+        `stream_chat` is bridged from a worker thread instead.
+        """
+        if not self._llm_is_async:
+            completion_gen = await run_in_executor(
+                None,
+                partial(
+                    self.stream_chat,
+                    messages=messages,
+                    use_context=use_context,
+                    context_filter=context_filter,
+                ),
+            )
+            return AsyncCompletionGen(
+                response=iterate_in_executor(None, completion_gen.response),
+                sources=completion_gen.sources,
+            )
+
+        request = self._prepare_chat(
+            "chat.astream",
+            messages,
+            use_context,
+            context_filter,
+            offload_retrieval=True,
         )
-        chat_history = (
-            chat_engine_input.chat_history if chat_engine_input.chat_history else None
+        with request.span("retrieve") as span:
+            streaming_response = await request.chat_engine.astream_chat(
+                message=request.message, chat_history=request.chat_history
+            )
+            span["sources"] = len(streaming_response.source_nodes)
+        sources = [Chunk.from_node(node) for node in streaming_response.source_nodes]
+        response_gen = streaming_response.async_response_gen()
+        return AsyncCompletionGen(
+            response=(
+                response_gen
+                if request.trace is None
+                else self._atraced_token_gen(request.trace, response_gen)
+            ),
+            sources=sources,
         )
 
-        chat_engine = self._chat_engine(
-            system_prompt=system_prompt,
-            use_context=use_context,
-            context_filter=context_filter,
-        )
-        wrapped_response = chat_engine.chat(
-            message=last_message if last_message is not None else "",
-            chat_history=chat_history,
+    async def achat(
+        self,
+        messages: list[ChatMessage],
+        use_context: bool = False,
+        context_filter: ContextFilter | None = None,
+    ) -> Completion:
+        """Async version of `chat`."""
+        if not self._llm_is_async:
+            return await run_in_executor(
+                None,
+                partial(
+                    self.chat,
+                    messages=messages,
+                    use_context=use_context,
+                    context_filter=context_filter,
+                ),
+            )
+
+        request = self._prepare_chat(
+            "achat", messages, use_context, context_filter, offload_retrieval=True
         )
+        with request.span("chat") as span:
+            wrapped_response = await request.chat_engine.achat(
+                message=request.message, chat_history=request.chat_history
+            )
+            span["sources"] = len(wrapped_response.source_nodes)
+        if request.trace is not None:
+            request.trace.end()
         sources = [Chunk.from_node(node) for node in wrapped_response.source_nodes]
-        completion = Completion(response=wrapped_response.response, sources=sources)
+        return Completion(response=wrapped_response.response, sources=sources)
 
-        # Only log to MLflow if it's available
-        if MLFLOW_AVAILABLE:
-            with mlflow.start_run():
-                mlflow.llama_index.log_model(
-                    self.index,
-                    name="rag-index",
-                    engine_type="chat",
-                    input_example=messages[-1].content if messages else "What is this about?"
-                )
+    @staticmethod
+    async def _atraced_token_gen(
+        trace: Trace, token_gen: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """Async version of `_traced_token_gen`."""
+        start = time.perf_counter()
+        try:
+            with trace.span("generate") as span:
+                tokens = 0
+                async for token in token_gen:
+                    if tokens == 0:
+                        span["time_to_first_token_ms"] = (
+                            time.perf_counter() - start
+                        ) * 1000
+                    tokens += 1
+                    yield token
+                span["tokens"] = tokens
+        finally:
+            trace.end()
 
-        return completion
+    @staticmethod
+    def _traced_token_gen(trace: Trace, token_gen: TokenGen) -> TokenGen:
+        """Record the generation span of a streamed response once it is consumed."""
+        start = time.perf_counter()
+        try:
+            with trace.span("generate") as span:
+                tokens = 0
+                for token in token_gen:
+                    if tokens == 0:
+                        span["time_to_first_token_ms"] = (
+                            time.perf_counter() - start
+                        ) * 1000
+                    tokens += 1
+                    yield token
+                span["tokens"] = tokens
+        finally:
+            trace.end()
@@ -24,7 +24,7 @@ class ChunksResponse(BaseModel):
 
 
 @chunks_router.post("/chunks", tags=["Context Chunks"])
-def chunks_retrieval(request: Request, body: ChunksBody) -> ChunksResponse:
+async def chunks_retrieval(request: Request, body: ChunksBody) -> ChunksResponse:
     """Given a `text`, returns the most relevant chunks from the ingested documents.
 
     The returned information can be used to generate prompts that can be
@@ -45,7 +45,7 @@ def chunks_retrieval(request: Request, body: ChunksBody) -> ChunksResponse:
     remove `context_filter` altogether.
     """
     service = request.state.injector.get(ChunksService)
-    results = service.retrieve_relevant(
+    results = await service.aretrieve_relevant(
         body.text, body.context_filter, body.limit, body.prev_next_chunks
     )
     return ChunksResponse(
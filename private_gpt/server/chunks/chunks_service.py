@@ -1,3 +1,5 @@
+import asyncio
+import threading
 from typing import TYPE_CHECKING, Literal
 
 from injector import inject, singleton
@@ -66,32 +68,78 @@ class ChunksService:
         self.vector_store_component = vector_store_component
         self.llm_component = llm_component
         self.embedding_component = embedding_component
+        self.node_store_component = node_store_component
         self.storage_context = StorageContext.from_defaults(
             vector_store=vector_store_component.vector_store,
             docstore=node_store_component.doc_store,
             index_store=node_store_component.index_store,
         )
+        self.index = VectorStoreIndex.from_vector_store(
+            vector_store_component.vector_store,
+            storage_context=self.storage_context,
+            llm=llm_component.llm,
+            embed_model=embedding_component.embedding_model,
+            show_progress=True,
+        )
+        # The indexes of the other collections, created on first use
+        self._indexes: dict[str, VectorStoreIndex] = {
+            vector_store_component.collection_name(): self.index
+        }
+        self._indexes_lock = threading.Lock()
+
+    def _get_index(self, collection: str | None) -> VectorStoreIndex:
+        name = self.vector_store_component.collection_name(collection)
+        with self._indexes_lock:
+            index = self._indexes.get(name)
+            if index is None:
+                index = VectorStoreIndex.from_vector_store(
+                    self.vector_store_component.get_vector_store(name),
+                    llm=self.llm_component.llm,
+                    embed_model=self.embedding_component.embedding_model,
+                    show_progress=True,
+                )
+                self._indexes[name] = index
+            return index
+
+    def _get_sibling_nodes_texts(
+        self, nodes: list[NodeWithScore], related_number: int
+    ) -> list[tuple[list[str], list[str]]]:
+        """Texts of the `related_number` previous and next chunks of every node.
+
+        The siblings of all the nodes are walked one hop at a time, each hop
+        reading all their ids at once, so the doc store is read `related_number`
+        times whatever the number of nodes.
+        """
+        siblings: list[tuple[list[str], list[str]]] = [([], []) for _ in nodes]
+        # Texts to extend, next sibling to read, and direction of the walk
+        frontier: list[tuple[list[str], RelatedNodeInfo | None, bool]] = []
+        for node, (previous_texts, next_texts) in zip(nodes, siblings, strict=True):
+            frontier.append((previous_texts, node.node.prev_node, False))
+            frontier.append((next_texts, node.node.next_node, True))
 
-    def _get_sibling_nodes_text(
-        self, node_with_score: NodeWithScore, related_number: int, forward: bool = True
-    ) -> list[str]:
-        explored_nodes_texts = []
-        current_node = node_with_score.node
         for _ in range(related_number):
-            explored_node_info: RelatedNodeInfo | None = (
-                current_node.next_node if forward else current_node.prev_node
-            )
-            if explored_node_info is None:
+            frontier = [item for item in frontier if item[1] is not None]
+            if not frontier:
                 break
-
-            explored_node = self.storage_context.docstore.get_node(
-                explored_node_info.node_id
+            explored_nodes = self.node_store_component.get_nodes(
+                [info.node_id for _, info, _ in frontier if info is not None]
             )
+            next_frontier: list[tuple[list[str], RelatedNodeInfo | None, bool]] = []
+            for texts, info, forward in frontier:
+                explored_node = explored_nodes.get(info.node_id) if info else None
+                if explored_node is None:
+                    continue
+                texts.append(explored_node.get_content())
+                next_frontier.append(
+                    (
+                        texts,
+                        explored_node.next_node if forward else explored_node.prev_node,
+                        forward,
+                    )
+                )
+            frontier = next_frontier
 
-            explored_nodes_texts.append(explored_node.get_content())
-            current_node = explored_node
-
-        return explored_nodes_texts
+        return siblings
 
     def retrieve_relevant(
         self,
@@ -100,13 +148,7 @@ class ChunksService:
         limit: int = 10,
         prev_next_chunks: int = 0,
     ) -> list[Chunk]:
-        index = VectorStoreIndex.from_vector_store(
-            self.vector_store_component.vector_store,
-            storage_context=self.storage_context,
-            llm=self.llm_component.llm,
-            embed_model=self.embedding_component.embedding_model,
-            show_progress=True,
-        )
+        index = self._get_index(context_filter.collection if context_filter else None)
         vector_index_retriever = self.vector_store_component.get_retriever(
             index=index, context_filter=context_filter, similarity_top_k=limit
         )
@@ -114,12 +156,27 @@ class ChunksService:
         nodes.sort(key=lambda n: n.score or 0.0, reverse=True)
 
         retrieved_nodes = []
-        for node in nodes:
+        siblings = self._get_sibling_nodes_texts(nodes, prev_next_chunks)
+        for node, (previous_texts, next_texts) in zip(nodes, siblings, strict=True):
             chunk = Chunk.from_node(node)
-            chunk.previous_texts = self._get_sibling_nodes_text(
-                node, prev_next_chunks, False
-            )
-            chunk.next_texts = self._get_sibling_nodes_text(node, prev_next_chunks)
+            chunk.previous_texts = previous_texts
+            chunk.next_texts = next_texts
             retrieved_nodes.append(chunk)
 
         return retrieved_nodes
+
+    async def aretrieve_relevant(
+        self,
+        text: str,
+        context_filter: ContextFilter | None = None,
+        limit: int = 10,
+        prev_next_chunks: int = 0,
+    ) -> list[Chunk]:
+        """Async version of `retrieve_relevant`.
+
+        The query embedding, the vector search and the docstore lookups of the
+        sibling chunks are blocking, so they run in a worker thread.
+        """
+        return await asyncio.to_thread(
+            self.retrieve_relevant, text, context_filter, limit, prev_next_chunks
+        )
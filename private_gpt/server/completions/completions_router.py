@@ -50,7 +50,7 @@ class CompletionsBody(BaseModel):
         }
     },
 )
-def prompt_completion(
+async def prompt_completion(
     request: Request, body: CompletionsBody
 ) -> OpenAICompletion | StreamingResponse:
     """We recommend most users use our Chat completions API.
@@ -89,4 +89,4 @@ def prompt_completion(
         include_sources=body.include_sources,
         context_filter=body.context_filter,
     )
-    return chat_completion(request, chat_body)
+    return await chat_completion(request, chat_body)
@@ -0,0 +1,243 @@
+import logging
+import queue
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from injector import inject, singleton
+
+from private_gpt.database.ingest_jobs import (
+    claim_job,
+    create_job,
+    get_job,
+    get_unfinished_jobs,
+    mark_job_finished,
+    update_job_progress,
+)
+from private_gpt.paths import local_data_path
+from private_gpt.server.ingest.ingest_service import IngestService
+from private_gpt.server.ingest.model import IngestJob
+from private_gpt.server.ingest.upload import spool_upload
+from private_gpt.settings.settings import Settings
+from private_gpt.utils.eta import ETA
+from private_gpt.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@singleton
+class IngestJobService:
+    """Ingest files in background worker threads, tracking progress per job.
+
+    Submitted files are staged under `local_data/ingest_jobs/<job id>` and the
+    job is recorded in the database, so submitting returns as soon as the files
+    are on disk. Workers ingest the files of a job by batches, like a bulk
+    ingestion, recording the progress after each batch.
+    Queued jobs survive a restart; jobs interrupted while running are failed.
+    """
+
+    @inject
+    def __init__(self, ingest_service: IngestService, settings: Settings) -> None:
+        self.ingest_service = ingest_service
+        self.jobs_path = local_data_path / "ingest_jobs"
+        self.count_workers = settings.data.ingest_job_workers
+        self.batch_size = settings.data.ingest_job_batch_size
+        self._queue: queue.Queue[str | None] = queue.Queue()
+        self._workers: list[threading.Thread] = []
+        self._workers_lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Progress estimation of the running jobs
+        self._etas: dict[str, ETA] = {}
+        register_metrics("ingest_jobs", self.metrics)
+
+    def start(self) -> None:
+        """Resume the unfinished jobs and start the workers, once.
+
+        After a `stop()`, waits for the stopped workers to finish their current
+        job, so that they take neither the jobs nor the stop sentinels of the
+        new workers.
+        """
+        with self._workers_lock:
+            if self._workers and not self._stopping.is_set():
+                return
+            for worker in self._workers:
+                worker.join()
+            # The jobs left in the old queue are queued again by the resume
+            self._queue = queue.Queue()
+            self._workers = []
+            self._stopping = threading.Event()
+            self._resume_jobs()
+            for i in range(self.count_workers):
+                worker = threading.Thread(
+                    target=self._run,
+                    args=(self._queue, self._stopping),
+                    name=f"ingest-job-{i}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self) -> None:
+        """Stop the workers once their current job is done. Queued jobs are kept."""
+        with self._workers_lock:
+            if self._stopping.is_set():
+                return
+            self._stopping.set()
+            for _ in self._workers:
+                self._queue.put(None)
+
+    def submit(
+        self,
+        files: list[tuple[str, BinaryIO]],
+        teams: list[str] | None = None,
+        collection: str | None = None,
+    ) -> IngestJob:
+        """Stage the files and queue a job ingesting them.
+
+        :raises UploadTooLargeError: if a file exceeds `data.max_upload_size_mb`
+        """
+        job_id = str(uuid.uuid4())
+        job_path = self.jobs_path / job_id
+        job_path.mkdir(parents=True)
+        try:
+            staged = [
+                (
+                    file_name,
+                    str(
+                        spool_upload(
+                            file_data,
+                            job_path,
+                            file_name,
+                            self.ingest_service.max_upload_size,
+                        )
+                    ),
+                )
+                for file_name, file_data in files
+            ]
+            create_job(job_id, staged, teams, collection)
+        except Exception:
+            shutil.rmtree(job_path, ignore_errors=True)
+            raise
+        logger.info("Queued ingest job=%s of count=%s files", job_id, len(staged))
+        self.start()
+        self._queue.put(job_id)
+        job = self.get(job_id)
+        assert job is not None
+        return job
+
+    def get(self, job_id: str) -> IngestJob | None:
+        job = get_job(job_id)
+        if job is None:
+            return None
+        eta = self._etas.get(job_id)
+        return IngestJob(
+            object="ingest.job",
+            job_id=job["id"],
+            status=job["status"],
+            file_names=[file_name for file_name, _ in job["files"]],
+            processed_files=job["processed_files"],
+            current_file=job["current_file"],
+            eta=eta.human_time() if eta is not None else None,
+            doc_ids=job["doc_ids"],
+            error=job["error"],
+            created_at=job["created_at"],
+            started_at=job["started_at"],
+            finished_at=job["finished_at"],
+        )
+
+    def _resume_jobs(self) -> None:
+        for job in get_unfinished_jobs():
+            if job["status"] == "queued":
+                logger.info("Resuming the queued ingest job=%s", job["id"])
+                self._queue.put(job["id"])
+            else:
+                # Partially ingested: the user has to decide what to do
+                mark_job_finished(job["id"], "failed", "Interrupted by a restart")
+                shutil.rmtree(self.jobs_path / job["id"], ignore_errors=True)
+
+    def _run(self, jobs: queue.Queue[str | None], stopping: threading.Event) -> None:
+        while True:
+            job_id = jobs.get()
+            # Jobs left in the queue stay queued in the database
+            if job_id is None or stopping.is_set():
+                break
+            try:
+                self._process(job_id)
+            except Exception:
+                logger.exception("Failed to run the ingest job=%s", job_id)
+                mark_job_finished(job_id, "failed", "Internal error")
+
+    def _process(self, job_id: str) -> None:
+        # A job can be queued twice, when resumed while it is being submitted
+        job = get_job(job_id)
+        if job is None or not claim_job(job_id):
+            return
+        files = [(file_name, Path(file_path)) for file_name, file_path in job["files"]]
+        eta = self._etas[job_id] = ETA(len(files))
+        doc_ids: list[str] = []
+        errors: list[str] = []
+        try:
+            for start in range(0, len(files), self.batch_size):
+                batch = files[start : start + self.batch_size]
+                update_job_progress(
+                    job_id, start, ", ".join(name for name, _ in batch), doc_ids
+                )
+                batch_doc_ids = self._ingest_batch(batch, job["collection"], errors)
+                doc_ids.extend(batch_doc_ids)
+                if job["teams"] and batch_doc_ids:
+                    self.ingest_service.set_document_teams(
+                        batch_doc_ids, job["teams"], job["collection"]
+                    )
+                processed = start + len(batch)
+                eta.update(processed)
+                update_job_progress(job_id, processed, None, doc_ids)
+        finally:
+            self._etas.pop(job_id, None)
+            shutil.rmtree(self.jobs_path / job_id, ignore_errors=True)
+        mark_job_finished(
+            job_id, "failed" if errors else "succeeded", "\n".join(errors) or None
+        )
+        logger.info(
+            "Finished ingest job=%s files=%s errors=%s", job_id, len(files), len(errors)
+        )
+
+    def _ingest_batch(
+        self, batch: list[tuple[str, Path]], collection: str | None, errors: list[str]
+    ) -> list[str]:
+        """Ingest the files together, or one by one if that fails.
+
+        Ingesting the files of a failed batch one by one finds the failing files,
+        so that the other files of the job are still ingested.
+        """
+        if len(batch) > 1:
+            try:
+                ingested = self.ingest_service.bulk_ingest(batch, collection)
+            except Exception:
+                logger.warning(
+                    "Failed to ingest a batch of count=%s files, retrying one by one",
+                    len(batch),
+                    exc_info=True,
+                )
+            else:
+                return [doc.doc_id for doc in ingested]
+        doc_ids: list[str] = []
+        for file_name, file_path in batch:
+            try:
+                ingested = self.ingest_service.ingest_file(
+                    file_name, file_path, collection
+                )
+            except Exception as e:
+                logger.exception("Failed to ingest file=%s", file_name)
+                errors.append(f"{file_name}: {e}")
+            else:
+                doc_ids.extend(doc.doc_id for doc in ingested)
+        return doc_ids
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "workers": sum(worker.is_alive() for worker in self._workers),
+            "queued": self._queue.qsize(),
+            "running": len(self._etas),
+        }
@@ -1,14 +1,24 @@
 from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile
 from pydantic import BaseModel, Field
 
+from private_gpt.open_ai.extensions.context_filter import COLLECTION_NAME_PATTERN
+from private_gpt.server.ingest.ingest_job_service import IngestJobService
 from private_gpt.server.ingest.ingest_service import IngestService
-from private_gpt.server.ingest.model import IngestedDoc
+from private_gpt.server.ingest.model import IngestedDoc, IngestJob
+from private_gpt.server.ingest.upload import UploadTooLargeError
 from private_gpt.server.utils.auth import authenticated
 
 ingest_router = APIRouter(prefix="/v1", dependencies=[Depends(authenticated)])
 
+_COLLECTION_DESCRIPTION = (
+    "The collection of the documents. Defaults to `vectorstore.default_collection`."
+)
+CollectionQuery = Query(
+    None, pattern=COLLECTION_NAME_PATTERN, description=_COLLECTION_DESCRIPTION
+)
+
 
 class IngestTextBody(BaseModel):
     file_name: str = Field(examples=["Avatar: The Last Airbender"])
@@ -20,6 +30,16 @@ class IngestTextBody(BaseModel):
             "Chinese martial arts."
         ]
     )
+    collection: str | None = Field(
+        None, pattern=COLLECTION_NAME_PATTERN, description=_COLLECTION_DESCRIPTION
+    )
+
+
+class IngestDeleteBody(BaseModel):
+    doc_ids: list[str] = Field(examples=[["c202d5e6-7b69-4869-81cc-dd574ee8ee11"]])
+    collection: str | None = Field(
+        None, pattern=COLLECTION_NAME_PATTERN, description=_COLLECTION_DESCRIPTION
+    )
 
 
 class IngestResponse(BaseModel):
@@ -38,7 +58,9 @@ def ingest(request: Request, file: UploadFile) -> IngestResponse:
 
 
 @ingest_router.post("/ingest/file", tags=["Ingestion"])
-def ingest_file(request: Request, file: UploadFile) -> IngestResponse:
+def ingest_file(
+    request: Request, file: UploadFile, collection: str | None = CollectionQuery
+) -> IngestResponse:
     """Ingests and processes a file, storing its chunks to be used as context.
 
     The context obtained from files is later used in
@@ -53,11 +75,21 @@ def ingest_file(request: Request, file: UploadFile) -> IngestResponse:
     extracted Metadata (which is later used to improve context retrieval). Those IDs
     can be used to filter the context used to create responses in
     `/chat/completions`, `/completions`, and `/chunks` APIs.
+
+    The documents are saved in the `collection`, searched by the requests
+    selecting it in their `context_filter`.
+
+    Files larger than `data.max_upload_size_mb` are rejected with a 413 status.
     """
     service = request.state.injector.get(IngestService)
     if file.filename is None:
         raise HTTPException(400, "No file name provided")
-    ingested_documents = service.ingest_bin_data(file.filename, file.file)
+    try:
+        ingested_documents = service.ingest_bin_data(
+            file.filename, file.file, collection
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e)) from e
     return IngestResponse(object="list", model="private-gpt", data=ingested_documents)
 
 
@@ -77,28 +109,86 @@ def ingest_text(request: Request, body: IngestTextBody) -> IngestResponse:
     service = request.state.injector.get(IngestService)
     if len(body.file_name) == 0:
         raise HTTPException(400, "No file name provided")
-    ingested_documents = service.ingest_text(body.file_name, body.text)
+    ingested_documents = service.ingest_text(body.file_name, body.text, body.collection)
     return IngestResponse(object="list", model="private-gpt", data=ingested_documents)
 
 
+@ingest_router.post("/ingest/jobs", tags=["Ingestion"], status_code=202)
+def create_ingest_job(
+    request: Request,
+    files: list[UploadFile],
+    collection: str | None = CollectionQuery,
+) -> IngestJob:
+    """Queues the ingestion of files, and returns without waiting for it.
+
+    The files are ingested in the background, like with `/ingest/file`. Use the
+    returned `job_id` with `GET /ingest/jobs/{job_id}` to follow the progress
+    and get the IDs of the ingested Documents once the job is finished.
+
+    Files larger than `data.max_upload_size_mb` are rejected with a 413 status.
+    """
+    service: IngestJobService = request.state.injector.get(IngestJobService)
+    if any(file.filename is None for file in files):
+        raise HTTPException(400, "No file name provided")
+    try:
+        return service.submit(
+            [(str(file.filename), file.file) for file in files],
+            collection=collection,
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e)) from e
+
+
+@ingest_router.get("/ingest/jobs/{job_id}", tags=["Ingestion"])
+def get_ingest_job(request: Request, job_id: str) -> IngestJob:
+    """Get the status and progress of an ingestion job."""
+    service: IngestJobService = request.state.injector.get(IngestJobService)
+    job = service.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Ingest job {job_id} not found")
+    return job
+
+
 @ingest_router.get("/ingest/list", tags=["Ingestion"])
-def list_ingested(request: Request) -> IngestResponse:
+def list_ingested(
+    request: Request, collection: str | None = CollectionQuery
+) -> IngestResponse:
     """Lists already ingested Documents including their Document ID and metadata.
 
-    Those IDs can be used to filter the context used to create responses
-    in `/chat/completions`, `/completions`, and `/chunks` APIs.
+    Only the Documents of the `collection` are listed. Those IDs can be used to
+    filter the context used to create responses in `/chat/completions`,
+    `/completions`, and `/chunks` APIs.
     """
     service = request.state.injector.get(IngestService)
-    ingested_documents = service.list_ingested()
+    ingested_documents = service.list_ingested(collection)
     return IngestResponse(object="list", model="private-gpt", data=ingested_documents)
 
 
 @ingest_router.delete("/ingest/{doc_id}", tags=["Ingestion"])
-def delete_ingested(request: Request, doc_id: str) -> None:
+def delete_ingested(
+    request: Request, doc_id: str, collection: str | None = CollectionQuery
+) -> None:
     """Delete the specified ingested Document.
 
     The `doc_id` can be obtained from the `GET /ingest/list` endpoint.
     The document will be effectively deleted from your storage context.
+    Returns a 404 error if the document is not in the collection.
+    """
+    service = request.state.injector.get(IngestService)
+    try:
+        service.delete(doc_id, collection)
+    except ValueError as e:
+        raise HTTPException(404, str(e)) from e
+
+
+@ingest_router.delete("/ingest", tags=["Ingestion"])
+def delete_ingested_many(request: Request, body: IngestDeleteBody) -> None:
+    """Delete the specified ingested Documents.
+
+    The `doc_ids` can be obtained from the `GET /ingest/list` endpoint.
+    The documents will be effectively deleted from your storage context, all at
+    once: prefer this endpoint to deleting many documents one by one. Unknown IDs
+    are ignored, as well as the IDs of the documents of other collections.
     """
     service = request.state.injector.get(IngestService)
-    service.delete(doc_id)
+    service.delete_many(body.doc_ids, body.collection)
@@ -1,5 +1,7 @@
 import logging
 import tempfile
+import threading
+from collections import defaultdict
 from pathlib import Path
 from typing import TYPE_CHECKING, AnyStr, BinaryIO
 
@@ -8,13 +10,28 @@ from llama_index.core.node_parser import SentenceWindowNodeParser
 from llama_index.core.storage import StorageContext
 
 from private_gpt.components.embedding.embedding_component import EmbeddingComponent
-from private_gpt.components.ingest.ingest_component import get_ingestion_component
+from private_gpt.components.ingest.ingest_component import (
+    COLLECTION_INDEX_PREFIX,
+    BaseIngestComponent,
+    IngestFilesError,
+    UpsertResult,
+    collection_index_id,
+    get_ingestion_component,
+)
+from private_gpt.components.ingest.parse_worker_pool import ParseWorkerPool
 from private_gpt.components.llm.llm_component import LLMComponent
 from private_gpt.components.node_store.node_store_component import NodeStoreComponent
 from private_gpt.components.vector_store.vector_store_component import (
     VectorStoreComponent,
 )
+from private_gpt.database import (
+    add_document_teams,
+    delete_document_teams,
+    get_document_acl,
+    get_document_teams,
+)
 from private_gpt.server.ingest.model import IngestedDoc
+from private_gpt.server.ingest.upload import spool_upload, upload_directory
 from private_gpt.settings.settings import settings
 
 if TYPE_CHECKING:
@@ -32,23 +49,98 @@ class IngestService:
         vector_store_component: VectorStoreComponent,
         embedding_component: EmbeddingComponent,
         node_store_component: NodeStoreComponent,
+        parse_pool: ParseWorkerPool,
     ) -> None:
         self.llm_service = llm_component
+        self.vector_store_component = vector_store_component
+        self.node_store_component = node_store_component
+        self.embedding_component = embedding_component
+        self.parse_pool = parse_pool
         self.storage_context = StorageContext.from_defaults(
             vector_store=vector_store_component.vector_store,
             docstore=node_store_component.doc_store,
             index_store=node_store_component.index_store,
         )
-        node_parser = SentenceWindowNodeParser.from_defaults()
+        # One ingest component (and index) per collection, created on first use
+        self._ingest_components: dict[str, BaseIngestComponent] = {}
+        self._ingest_components_lock = threading.Lock()
+        self.ingest_component = self.get_ingest_component()
+        self.upsert_enabled = settings().embedding.ingest_upsert
+        self.max_upload_size = settings().data.max_upload_size_mb * 1024 * 1024
+
+    def get_ingest_component(
+        self, collection: str | None = None
+    ) -> BaseIngestComponent:
+        """The ingest component saving the documents in the collection.
+
+        :raises ValueError: if the vector store does not support the collection
+        """
+        name = self.vector_store_component.collection_name(collection)
+        with self._ingest_components_lock:
+            ingest_component = self._ingest_components.get(name)
+            if ingest_component is not None:
+                return ingest_component
+            is_default = name == self.vector_store_component.collection_name()
+            storage_context = StorageContext.from_defaults(
+                vector_store=self.vector_store_component.get_vector_store(name),
+                docstore=self.node_store_component.doc_store,
+                index_store=self.node_store_component.index_store,
+            )
+            node_parser = SentenceWindowNodeParser.from_defaults()
+            ingest_component = get_ingestion_component(
+                storage_context,
+                embed_model=self.embedding_component.embedding_model,
+                transformations=[
+                    node_parser,
+                    self.embedding_component.embedding_transformation,
+                ],
+                parse_pool=self.parse_pool,
+                settings=settings(),
+                index_id=collection_index_id(name),
+                # The index of the stores created before the collections
+                adopt_unnamed_index=is_default,
+                upsert_key_prefix="" if is_default else f"{name}/",
+            )
+            self._ingest_components[name] = ingest_component
+            return ingest_component
+
+    def find_ingest_component(
+        self, collection: str | None = None
+    ) -> BaseIngestComponent | None:
+        """The ingest component of the collection, None if it was never ingested.
+
+        Unlike `get_ingest_component`, does not create the collection, so that
+        reading an unknown collection leaves no empty index behind.
+
+        :raises ValueError: if the vector store does not support the collection
+        """
+        name = self.vector_store_component.collection_name(collection)
+        with self._ingest_components_lock:
+            ingest_component = self._ingest_components.get(name)
+        if ingest_component is not None:
+            return ingest_component
+        if name not in self.collections():
+            return None
+        return self.get_ingest_component(name)
+
+    def close(self) -> None:
+        """Release the threads of the ingest components, e.g. on shutdown."""
+        with self._ingest_components_lock:
+            ingest_components = list(self._ingest_components.values())
+        for ingest_component in ingest_components:
+            ingest_component.close()
 
-        self.ingest_component = get_ingestion_component(
-            self.storage_context,
-            embed_model=embedding_component.embedding_model,
-            transformations=[node_parser, embedding_component.embedding_model],
-            settings=settings(),
+    def collections(self) -> list[str]:
+        """Names of the collections with an index, i.e. ingested once."""
+        return sorted(
+            index_struct.index_id.removeprefix(COLLECTION_INDEX_PREFIX)
+            for index_struct in self.storage_context.index_store.index_structs()
+            if index_struct.index_id.startswith(COLLECTION_INDEX_PREFIX)
         )
 
-    def _ingest_data(self, file_name: str, file_data: AnyStr) -> list[IngestedDoc]:
+    def _ingest_data(
+        self, file_name: str, file_data: AnyStr, collection: str | None = None
+    ) -> list[IngestedDoc]:
         logger.debug("Got file data of size=%s to ingest", len(file_data))
         # llama-index mainly supports reading from files, so
         # we have to create a tmp file to read for it to work
@@ -60,36 +152,147 @@ class IngestService:
                     path_to_tmp.write_bytes(file_data)
                 else:
                     path_to_tmp.write_text(str(file_data))
-                return self.ingest_file(file_name, path_to_tmp)
+                return self.ingest_file(file_name, path_to_tmp, collection)
             finally:
                 tmp.close()
                 path_to_tmp.unlink()
 
-    def ingest_file(self, file_name: str, file_data: Path) -> list[IngestedDoc]:
-        logger.info("Ingesting file_name=%s", file_name)
-        documents = self.ingest_component.ingest(file_name, file_data)
+    def ingest_file(
+        self, file_name: str, file_data: Path, collection: str | None = None
+    ) -> list[IngestedDoc]:
+        if self.upsert_enabled:
+            result = self.upsert([(file_name, file_data)], collection)
+            if result.failed_files:
+                raise IngestFilesError(result.failed_files)
+            return self._upserted_docs(result)
+        logger.info("Ingesting file_name=%s collection=%s", file_name, collection)
+        documents = self.get_ingest_component(collection).ingest(file_name, file_data)
         logger.info("Finished ingestion file_name=%s", file_name)
         return [IngestedDoc.from_document(document) for document in documents]
 
-    def ingest_text(self, file_name: str, text: str) -> list[IngestedDoc]:
+    def ingest_text(
+        self, file_name: str, text: str, collection: str | None = None
+    ) -> list[IngestedDoc]:
         logger.debug("Ingesting text data with file_name=%s", file_name)
-        return self._ingest_data(file_name, text)
+        return self._ingest_data(file_name, text, collection)
 
     def ingest_bin_data(
-        self, file_name: str, raw_file_data: BinaryIO
+        self, file_name: str, raw_file_data: BinaryIO, collection: str | None = None
     ) -> list[IngestedDoc]:
+        """Ingest a binary stream, written to a temporary file by chunks.
+
+        :raises UploadTooLargeError: if the data exceeds `data.max_upload_size_mb`
+        """
         logger.debug("Ingesting binary data with file_name=%s", file_name)
-        file_data = raw_file_data.read()
-        return self._ingest_data(file_name, file_data)
+        with upload_directory() as directory:
+            path = spool_upload(
+                raw_file_data, directory, file_name, self.max_upload_size
+            )
+            return self.ingest_file(file_name, path, collection)
 
-    def bulk_ingest(self, files: list[tuple[str, Path]]) -> list[IngestedDoc]:
+    def bulk_ingest(
+        self, files: list[tuple[str, Path]], collection: str | None = None
+    ) -> list[IngestedDoc]:
+        if self.upsert_enabled:
+            result = self.upsert(files, collection)
+            if result.failed_files:
+                raise IngestFilesError(result.failed_files)
+            return self._upserted_docs(result)
         logger.info("Ingesting file_names=%s", [f[0] for f in files])
-        documents = self.ingest_component.bulk_ingest(files)
+        documents = self.get_ingest_component(collection).bulk_ingest(files)
         logger.info("Finished ingestion file_name=%s", [f[0] for f in files])
         return [IngestedDoc.from_document(document) for document in documents]
 
-    def list_ingested(self) -> list[IngestedDoc]:
+    def upsert(
+        self, files: list[tuple[str, Path]], collection: str | None = None
+    ) -> UpsertResult:
+        """Ingest the files, replacing their previous version if any.
+
+        Unchanged files and documents are skipped, changed documents replace the
+        previous ones, and the documents no longer in their file are deleted.
+        The files that failed to be saved are listed in `failed_files`.
+        """
+        logger.info("Upserting file_names=%s", [f[0] for f in files])
+        result = self.get_ingest_component(collection).upsert(files)
+        delete_document_teams(result.deleted_doc_ids)
+        # The new chunks of updated documents are not tagged yet
+        self._tag_current_teams(
+            [document.doc_id for document in result.documents], collection
+        )
+        logger.info(
+            "Finished upsert of count=%s files skipped=%s updated=%s added=%s deleted=%s",
+            len(files),
+            result.skipped,
+            result.updated,
+            result.added,
+            len(result.deleted_doc_ids),
+        )
+        if result.failed_files:
+            logger.error("Failed to upsert the files=%s", result.failed_files)
+        return result
+
+    def set_document_teams(
+        self, doc_ids: list[str], teams: list[str], collection: str | None = None
+    ) -> None:
+        """Share the documents with the teams, replacing their previous teams."""
+        for doc_id in doc_ids:
+            add_document_teams(doc_id, teams)
+        self.vector_store_component.set_document_teams(doc_ids, teams, collection)
+
+    def _tag_current_teams(
+        self, doc_ids: list[str], collection: str | None = None
+    ) -> None:
+        if not self.vector_store_component.team_filter_enabled:
+            return
+        docs_by_teams: defaultdict[tuple[str, ...], list[str]] = defaultdict(list)
+        for doc_id in doc_ids:
+            teams = get_document_teams(doc_id)
+            if teams:
+                docs_by_teams[tuple(teams)].append(doc_id)
+        for team_key, team_doc_ids in docs_by_teams.items():
+            self.vector_store_component.set_document_teams(
+                team_doc_ids, list(team_key), collection
+            )
+
+    def tag_all_teams(self) -> int:
+        """Tag the chunks of every shared document with its teams.
+
+        Needed once when enabling `vectorstore.team_filter` on an existing
+        store. Returns the number of tagged documents.
+        """
+        doc_ids = get_document_acl().doc_ids()
+        collections = set(self.collections())
+        collections.add(self.vector_store_component.collection_name())
+        # Tagging the documents of another collection does nothing
+        for collection in sorted(collections):
+            self._tag_current_teams(doc_ids, collection)
+        logger.info("Tagged count=%s documents with their teams", len(doc_ids))
+        return len(doc_ids)
+
+    def _upserted_docs(self, result: UpsertResult) -> list[IngestedDoc]:
+        ingested_docs = [
+            IngestedDoc.from_document(document) for document in result.documents
+        ]
+        docstore = self.storage_context.docstore
+        for doc_id in result.unchanged_doc_ids:
+            ref_doc_info = docstore.get_ref_doc_info(doc_id)
+            if ref_doc_info is None:
+                # Documents without any text have no node, hence no ref doc
+                continue
+            ingested_docs.append(
+                IngestedDoc(
+                    object="ingest.document",
+                    doc_id=doc_id,
+                    doc_metadata=IngestedDoc.curate_metadata(ref_doc_info.metadata),
+                )
+            )
+        return ingested_docs
+
+    def list_ingested(self, collection: str | None = None) -> list[IngestedDoc]:
         ingested_docs: list[IngestedDoc] = []
+        ingest_component = self.find_ingest_component(collection)
+        if ingest_component is None:
+            return ingested_docs
         try:
             docstore = self.storage_context.docstore
             ref_docs: dict[str, RefDocInfo] | None = docstore.get_all_ref_doc_info()
@@ -98,6 +301,8 @@ class IngestService:
                 return ingested_docs
 
             for doc_id, ref_doc_info in ref_docs.items():
+                if not ingest_component.is_indexed(ref_doc_info):
+                    continue
                 doc_metadata = None
                 if ref_doc_info is not None and ref_doc_info.metadata is not None:
                     doc_metadata = IngestedDoc.curate_metadata(ref_doc_info.metadata)
@@ -114,12 +319,41 @@ class IngestService:
         logger.debug("Found count=%s ingested documents", len(ingested_docs))
         return ingested_docs
 
-    def delete(self, doc_id: str) -> None:
-        """Delete an ingested document.
+    def delete(self, doc_id: str, collection: str | None = None) -> None:
+        """Delete an ingested document of the collection.
 
-        :raises ValueError: if the document does not exist
+        :raises ValueError: if the document is not in the collection
         """
+        ingest_component = self.find_ingest_component(collection)
+        ref_doc_info = self.storage_context.docstore.get_ref_doc_info(doc_id)
+        if (
+            ingest_component is None
+            or ref_doc_info is None
+            or not ingest_component.is_indexed(ref_doc_info)
+        ):
+            raise ValueError(f"Document {doc_id} not found")
         logger.info(
             "Deleting the ingested document=%s in the doc and index store", doc_id
         )
-        self.ingest_component.delete(doc_id)
+        self.delete_many([doc_id], collection)
+
+    def delete_many(self, doc_ids: list[str], collection: str | None = None) -> None:
+        """Delete ingested documents, saving the stores once for all of them.
+
+        Unknown document ids, and the documents of other collections, are ignored.
+        """
+        logger.info(
+            "Deleting count=%s ingested documents in the doc and index store",
+            len(doc_ids),
+        )
+        ingest_component = self.find_ingest_component(collection)
+        if ingest_component is None:
+            return
+        docstore = self.storage_context.docstore
+        collection_doc_ids = []
+        for doc_id in doc_ids:
+            ref_doc_info = docstore.get_ref_doc_info(doc_id)
+            if ref_doc_info is None or ingest_component.is_indexed(ref_doc_info):
+                collection_doc_ids.append(doc_id)
+        ingest_component.delete_many(collection_doc_ids)
+        delete_document_teams(collection_doc_ids)
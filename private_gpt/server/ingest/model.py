@@ -30,3 +30,29 @@ class IngestedDoc(BaseModel):
             doc_id=document.doc_id,
             doc_metadata=IngestedDoc.curate_metadata(document.metadata),
         )
+
+
+class IngestJob(BaseModel):
+    object: Literal["ingest.job"]
+    job_id: str = Field(examples=["5b2cbd4e-4c47-4f4e-9b63-0a9a0a6f1c55"])
+    status: Literal["queued", "running", "succeeded", "failed"]
+    file_names: list[str] = Field(examples=[["Sales Report Q3 2023.pdf"]])
+    processed_files: int = Field(description="Number of files already ingested.")
+    current_file: str | None = Field(
+        None,
+        description=(
+            "Files being ingested, comma separated, while the job is running."
+        ),
+    )
+    eta: str | None = Field(
+        None,
+        description="Estimated remaining time, while the job is running.",
+        examples=["2m 10s @ 12/min"],
+    )
+    doc_ids: list[str] = Field(description="IDs of the Documents ingested so far.")
+    error: str | None = Field(
+        None, description="Errors of the files that could not be ingested."
+    )
+    created_at: str | None = None
+    started_at: str | None = None
+    finished_at: str | None = None
@@ -0,0 +1,45 @@
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, file_name: str, max_size: int) -> None:
+        super().__init__(
+            f"File {file_name} exceeds the maximum upload size of {max_size} bytes"
+        )
+        self.file_name = file_name
+        self.max_size = max_size
+
+
+@contextmanager
+def upload_directory() -> Iterator[Path]:
+    """Temporary directory of one request, deleted with its content on exit."""
+    with tempfile.TemporaryDirectory(prefix="private-gpt-upload-") as directory:
+        yield Path(directory)
+
+
+def spool_upload(
+    source: BinaryIO, directory: Path, file_name: str, max_size: int = 0
+) -> Path:
+    """Copy an uploaded file to its own folder in `directory`, chunk by chunk.
+
+    The file keeps its name, which the readers use to detect its format, and
+    never has to fit in memory. Uploads with the same name do not collide.
+
+    :raises UploadTooLargeError: if `max_size` is set and the file is larger
+    """
+    # The name comes from the client: only keep its last component
+    path = Path(tempfile.mkdtemp(dir=directory)) / Path(file_name).name
+    size = 0
+    with path.open("wb") as destination:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise UploadTooLargeError(file_name, max_size)
+            destination.write(chunk)
+    return path
@@ -0,0 +1,24 @@
+from typing import Any, Literal
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+
+from private_gpt.server.utils.auth import authenticated
+from private_gpt.utils.metrics import collect_metrics
+
+metrics_router = APIRouter(prefix="/v1", dependencies=[Depends(authenticated)])
+
+
+class MetricsResponse(BaseModel):
+    object: Literal["metrics"]
+    data: dict[str, dict[str, Any]]
+
+
+@metrics_router.get("/metrics", tags=["Health"])
+def metrics() -> MetricsResponse:
+    """Return the runtime metrics published by the server components.
+
+    Each key identifies a component (for example `rerank`), and its value holds
+    the counters and timings reported by that component since startup.
+    """
+    return MetricsResponse(object="metrics", data=collect_metrics())
@@ -18,7 +18,9 @@ from private_gpt.components.node_store.node_store_component import NodeStoreComp
 from private_gpt.components.vector_store.vector_store_component import (
     VectorStoreComponent,
 )
+from private_gpt.database import get_allowed_doc_ids
 from private_gpt.open_ai.extensions.context_filter import ContextFilter
+from private_gpt.server.ingest.ingest_service import IngestService
 from private_gpt.settings.settings import Settings
 
 DEFAULT_SUMMARIZE_PROMPT = (
@@ -41,8 +43,10 @@ class SummarizeService:
         node_store_component: NodeStoreComponent,
         vector_store_component: VectorStoreComponent,
         embedding_component: EmbeddingComponent,
+        ingest_service: IngestService,
     ) -> None:
         self.settings = settings
+        self.ingest_service = ingest_service
         self.llm_component = llm_component
         self.node_store_component = node_store_component
         self.vector_store_component = vector_store_component
@@ -53,10 +57,27 @@ class SummarizeService:
             index_store=node_store_component.index_store,
         )
 
-    @staticmethod
     def _filter_ref_docs(
-        ref_docs: dict[str, RefDocInfo], context_filter: ContextFilter | None
+        self, ref_docs: dict[str, RefDocInfo], context_filter: ContextFilter | None
     ) -> list[RefDocInfo]:
+        # The documents of the other collections share the docstore
+        ingest_component = self.ingest_service.find_ingest_component(
+            context_filter.collection if context_filter else None
+        )
+        if ingest_component is None:
+            return []
+        ref_docs = {
+            doc_id: ref_doc
+            for doc_id, ref_doc in ref_docs.items()
+            if ingest_component.is_indexed(ref_doc)
+        }
+        if context_filter is not None and context_filter.teams is not None:
+            allowed_doc_ids = get_allowed_doc_ids(context_filter.teams)
+            ref_docs = {
+                doc_id: ref_doc
+                for doc_id, ref_doc in ref_docs.items()
+                if doc_id in allowed_doc_ids
+            }
         if context_filter is None or not context_filter.docs_ids:
             return list(ref_docs.values())
 
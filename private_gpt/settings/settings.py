@@ -103,6 +103,29 @@ class DataSettings(BaseModel):
         description="Path to local storage."
         "It will be treated as an absolute path if it starts with /"
     )
+    max_upload_size_mb: int = Field(
+        0,
+        description=(
+            "Maximum size of an uploaded file, in MB. Uploads are written to disk "
+            "by chunks as they are received, larger ones are rejected. 0 means no limit."
+        ),
+    )
+    ingest_job_workers: int = Field(
+        1,
+        description=(
+            "Number of worker threads running the ingestion jobs submitted to "
+            "`/v1/ingest/jobs` and by the UI uploads. The jobs share the ingest "
+            "component, so more workers mostly overlap parsing and embedding."
+        ),
+    )
+    ingest_job_batch_size: int = Field(
+        10,
+        description=(
+            "Number of files of a job ingested together, so that they are parsed "
+            "in parallel and embedded in shared batches. The progress of the job "
+            "is recorded after each batch."
+        ),
+    )
 
 
 class LLMSettings(BaseModel):
@@ -153,11 +176,79 @@ class LLMSettings(BaseModel):
 
 
 class VectorstoreSettings(BaseModel):
-    database: Literal["chroma", "qdrant", "postgres", "clickhouse", "milvus"]
+    database: Literal["chroma", "qdrant", "postgres", "clickhouse", "milvus", "numpy"]
+    team_filter: bool = Field(
+        False,
+        description=(
+            "Store the teams of each document in the vector store, and filter the "
+            "chat of the users on their teams instead of on the (possibly long) "
+            "list of the documents they can see. Only supported by `qdrant` and "
+            "`numpy`. Run `python scripts/utils.py tag-teams` once after enabling "
+            "it on an existing store."
+        ),
+    )
+    default_collection: str = Field(
+        "make_this_parameterizable_per_api_call",
+        description=(
+            "The collection used when a request does not select one. Requests "
+            "can select another collection (e.g. one per team or workspace) with "
+            "their `collection` parameter, so that their searches only scan the "
+            "vectors of that collection. Collections are created on first use. "
+            "Only `qdrant`, `chroma`, `milvus` and `numpy` support more than the "
+            "default collection."
+        ),
+        pattern=r"^[A-Za-z0-9_-]{1,64}$",
+    )
+    quantization: Literal["none", "int8", "binary"] = Field(
+        "none",
+        description=(
+            "Quantize the stored embeddings to shrink the vector index:\n"
+            "If `int8` - scalar quantization, 4x smaller than float32 with a small "
+            "loss of recall.\n"
+            "If `binary` - one bit per dimension, 32x smaller, meant for large "
+            "embeddings (768 dimensions and more) and used with `rescore`.\n"
+            "Native in `qdrant` and `milvus` (new collections only), built in "
+            "`numpy`, and ignored by the other vector stores."
+        ),
+    )
+    quantization_rescore: bool = Field(
+        True,
+        description=(
+            "Score the best candidates of the quantized search again with their "
+            "full precision embeddings, kept on disk."
+        ),
+    )
+    quantization_oversampling: float = Field(
+        3.0,
+        ge=1.0,
+        description=(
+            "Number of candidates re-scored per requested result, with "
+            "`quantization_rescore`."
+        ),
+    )
 
 
 class NodeStoreSettings(BaseModel):
-    database: Literal["simple", "postgres"]
+    database: Literal["simple", "postgres", "sqlite"] = Field(
+        description=(
+            "The node store to use:\n"
+            "If `simple` - the documents and the index are kept in memory, and saved "
+            "as a whole in JSON files after every change.\n"
+            "If `sqlite` - the documents and the index are stored in "
+            "`local_data/nodestore.db`, and every change only writes what changed. "
+            "An existing `simple` store is migrated on the first start.\n"
+            "If `postgres` - the documents and the index are stored in Postgres."
+        )
+    )
+    node_cache_size: int = Field(
+        1024,
+        description=(
+            "Number of nodes kept in memory by the chunks retrieval, which reads "
+            "the previous and next chunks of the results (`prev_next_chunks`). "
+            "0 disables the cache."
+        ),
+        ge=0,
+    )
 
 
 class LlamaCPPSettings(BaseModel):
@@ -195,6 +286,108 @@ class HuggingFaceSettings(BaseModel):
     )
 
 
+class QueryEmbeddingCacheSettings(BaseModel):
+    enabled: bool = Field(
+        default=True,
+        description=(
+            "If set to True, the embeddings of the user queries are kept in an LRU "
+            "cache, so repeated questions are not embedded again."
+        ),
+    )
+    max_size: int = Field(
+        default=1024,
+        description="Maximum number of query embeddings kept in the cache.",
+    )
+    ttl_s: float = Field(
+        default=0,
+        description="Time to live of a cached query embedding, in seconds. 0 means no expiration.",
+    )
+    persist_path: str | None = Field(
+        default=None,
+        description=(
+            "If set, the cache is saved to this file on shutdown and loaded on "
+            "startup. Relative paths are resolved against `data.local_data_folder`."
+        ),
+    )
+
+
+class TextEmbeddingCacheSettings(BaseModel):
+    enabled: bool = Field(
+        default=True,
+        description=(
+            "If set to True, the embeddings of the ingested chunks are stored on "
+            "disk, keyed by the embedding model and the embedded text, so "
+            "re-ingesting unchanged chunks does not call the embedding model again."
+        ),
+    )
+    path: str = Field(
+        default="embedding_cache",
+        description=(
+            "Folder of the cache, with one subfolder per embedding model. "
+            "Relative paths are resolved against `data.local_data_folder`."
+        ),
+    )
+
+
+class AdaptiveBatchSettings(BaseModel):
+    enabled: bool = Field(
+        default=True,
+        description=(
+            "If set to True, the ingested nodes are sorted by length and embedded "
+            "in batches whose size adapts to the measured latency and memory, "
+            "instead of the fixed batch size of the embedding model."
+        ),
+    )
+    initial_size: int = Field(default=16, description="Batch size of the first batch.")
+    min_size: int = Field(default=1, description="Smallest batch size.")
+    max_size: int = Field(default=256, description="Largest batch size.")
+    target_latency_s: float = Field(
+        default=2.0,
+        description=(
+            "The batch size doubles while a batch is embedded in less than half "
+            "this time, and halves when a batch takes longer."
+        ),
+    )
+    max_batch_chars: int = Field(
+        default=200_000,
+        description=(
+            "Maximum number of characters in a batch, which bounds the memory "
+            "used to embed batches of long chunks."
+        ),
+    )
+    max_memory_mb: int = Field(
+        default=0,
+        description=(
+            "The batch size halves when the memory of the process exceeds this "
+            "value, in MB. 0 disables the check."
+        ),
+    )
+
+
+class ParseWorkersSettings(BaseModel):
+    count: int | None = Field(
+        default=None,
+        description=(
+            "The number of worker processes parsing the ingested files, shared by "
+            "all the ingest modes. Defaults to `count_workers`."
+        ),
+    )
+    max_tasks_per_worker: int = Field(
+        default=100,
+        description=(
+            "A worker process is replaced after parsing this number of files, to "
+            "release the memory leaked by the parsers. 0 keeps the processes forever."
+        ),
+    )
+    timeout_s: float = Field(
+        default=600,
+        description=(
+            "Maximum time to parse a single file. A file taking longer fails, and "
+            "its worker process is killed. 0 disables the timeout."
+        ),
+    )
+
+
 class EmbeddingSettings(BaseModel):
     mode: Literal[
         "huggingface",
@@ -220,13 +413,24 @@ class EmbeddingSettings(BaseModel):
             "workers to use with `count_workers`.\n"
         ),
     )
+    ingest_upsert: bool = Field(
+        False,
+        description=(
+            "If set to True, ingesting a file that was already ingested replaces it "
+            "instead of adding a copy. Documents get deterministic ids (from the file "
+            "name and their position in the file), unchanged files and documents are "
+            "skipped based on their hash, and only the changed documents are "
+            "embedded again. Files are matched by their name."
+        ),
+    )
     count_workers: int = Field(
         2,
         description=(
             "The number of workers to use for file ingestion.\n"
             "In `batch` mode, this is the number of workers used to parse the files.\n"
             "In `parallel` mode, this is the number of workers used to parse the files and embed them.\n"
-            "In `pipeline` mode, this is the number of workers that can perform embeddings.\n"
+            "In `pipeline` mode, this is the number of workers used to parse the files, and "
+            "the number of workers that can perform embeddings.\n"
             "This is only used if `ingest_mode` is not `simple`.\n"
             "Do not go too high with this number, as it might cause memory issues. (especially in `parallel` mode)\n"
             "Do not set it higher than your number of threads of your CPU."
@@ -236,6 +440,18 @@ class EmbeddingSettings(BaseModel):
         384,
         description="The dimension of the embeddings stored in the Postgres database",
     )
+    query_cache: QueryEmbeddingCacheSettings = Field(
+        default_factory=lambda: QueryEmbeddingCacheSettings()
+    )
+    text_cache: TextEmbeddingCacheSettings = Field(
+        default_factory=lambda: TextEmbeddingCacheSettings()
+    )
+    parse_workers: ParseWorkersSettings = Field(
+        default_factory=lambda: ParseWorkersSettings()
+    )
+    adaptive_batch: AdaptiveBatchSettings = Field(
+        default_factory=lambda: AdaptiveBatchSettings()
+    )
 
 
 class SagemakerSettings(BaseModel):
@@ -370,6 +586,22 @@ class UISettings(BaseModel):
     delete_all_files_button_enabled: bool = Field(
         False, description="If the button to delete all files is enabled or not."
     )
+    chat_workers: int = Field(
+        8,
+        description=(
+            "Number of worker threads running the retrieval and the token generation "
+            "of the UI chat, off the event loop. It bounds the number of answers "
+            "generated at the same time; extra requests wait for a free worker."
+        ),
+    )
+    max_concurrent_chats_per_user: int = Field(
+        2,
+        description=(
+            "Maximum number of UI chat answers a user can generate at the same time. "
+            "Extra requests are rejected with a 429 status. Set it to 0 to disable "
+            "the limit."
+        ),
+    )
 
 
 class RerankSettings(BaseModel):
@@ -385,6 +617,18 @@ class RerankSettings(BaseModel):
         2,
         description="This value controls the number of documents returned by the RAG pipeline.",
     )
+    batch_window_ms: float = Field(
+        5,
+        description=(
+            "Time window (in milliseconds) during which the rerank candidates of "
+            "concurrent requests are gathered and scored in a single forward pass. "
+            "Set it to 0 to score every request on its own."
+        ),
+    )
+    max_batch_size: int = Field(
+        128,
+        description="Maximum number of (query, passage) pairs scored in a single rerank forward pass.",
+    )
 
 
 class RagSettings(BaseModel):
@@ -406,6 +650,33 @@ class SummarizeSettings(BaseModel):
     )
 
 
+class TracingSettings(BaseModel):
+    enabled: bool = Field(
+        default=False,
+        description="If set to True, a sample of the chat requests is traced.",
+    )
+    sample_rate: float = Field(
+        default=0.1,
+        ge=0,
+        le=1,
+        description="Fraction of the chat requests to trace, between 0 and 1.",
+    )
+    queue_size: int = Field(
+        default=1000,
+        description=(
+            "Maximum number of traces waiting to be written. "
+            "Traces are dropped when the queue is full, so tracing never slows down requests."
+        ),
+    )
+    path: str = Field(
+        default="traces/traces.jsonl",
+        description=(
+            "File where the traces are appended as JSON lines. "
+            "Relative paths are resolved against `data.local_data_folder`."
+        ),
+    )
+
+
 class ClickHouseSettings(BaseModel):
     host: str = Field(
         "localhost",
@@ -558,6 +829,45 @@ class QdrantSettings(BaseModel):
     )
 
 
+class NumpySettings(BaseModel):
+    path: str = Field(
+        default="numpy_vectors",
+        description=(
+            "Folder of the embedded numpy vector store. Relative paths are resolved "
+            "against `data.local_data_folder`."
+        ),
+    )
+    dtype: Literal["float32", "float16"] = Field(
+        default="float32",
+        description=(
+            "Type of the stored embeddings. `float16` halves the size of the store "
+            "for a negligible loss of precision. Only used when creating the store."
+        ),
+    )
+    ivf_lists: int = Field(
+        default=0,
+        description=(
+            "Number of lists of the IVF coarse quantizer, 0 to always search all "
+            "the vectors. Around 4 * sqrt(number of chunks) is a good start, e.g. "
+            "4096 for 1M chunks."
+        ),
+    )
+    ivf_nprobe: int = Field(
+        default=16,
+        description=(
+            "Number of lists searched by a query. Higher is slower, with a better "
+            "recall."
+        ),
+    )
+    ivf_min_rows: int = Field(
+        default=50_000,
+        description=(
+            "The quantizer is only trained once the store holds this number of "
+            "vectors, smaller stores (and filtered queries) are searched exactly."
+        ),
+    )
+
+
 class MilvusSettings(BaseModel):
     uri: str = Field(
         "local_data/private_gpt/milvus/milvus_local.db",
@@ -596,10 +906,12 @@ class Settings(BaseModel):
     nodestore: NodeStoreSettings
     rag: RagSettings
     summarize: SummarizeSettings
+    tracing: TracingSettings = Field(default_factory=lambda: TracingSettings())
     qdrant: QdrantSettings | None = None
     postgres: PostgresSettings | None = None
     clickhouse: ClickHouseSettings | None = None
     milvus: MilvusSettings | None = None
+    numpy: NumpySettings = Field(default_factory=lambda: NumpySettings())
 
 
 """
@@ -1,21 +1,25 @@
 import logging
 import os
 import json
-from pathlib import Path
-from typing import List
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from functools import cache, partial
+from typing import TYPE_CHECKING, List
 from enum import Enum
 from uuid import uuid4
 from datetime import datetime
 from urllib.parse import unquote
 
 from fastapi import APIRouter, Depends, Request, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.types import Receive, Scope, Send
 from llama_index.core.llms import ChatMessage, MessageRole
 from pydantic import BaseModel
 
 from private_gpt.open_ai.extensions.context_filter import ContextFilter
 from private_gpt.database import (
-    save_chat_message, 
     get_all_chat_sessions, 
     get_chat_history_by_session,
     create_user,
@@ -24,14 +28,22 @@ from private_gpt.database import (
     update_user_details,
     update_user_password,
     delete_user,
-    add_document_teams,
     get_document_teams,
+    get_allowed_doc_ids,
     admin_update_user
 )
+from private_gpt.database.history_writer import chat_history_writer
 from private_gpt.di import global_injector
 from private_gpt.server.chat.chat_service import ChatService
 from private_gpt.server.chunks.chunks_service import ChunksService
+from private_gpt.server.ingest.upload import UploadTooLargeError
 from private_gpt.settings.settings import settings
+from private_gpt.utils.async_utils import ConcurrencyLimiter, iterate_in_executor, run_in_executor
+from private_gpt.utils.metrics import register_metrics
+
+if TYPE_CHECKING:
+    from private_gpt.server.ingest.ingest_job_service import IngestJobService
+    from private_gpt.server.ingest.ingest_service import IngestService
 
 # This should match the value in launcher.py
 SESSION_MAX_AGE = 600
@@ -69,6 +81,51 @@ def get_ingest_service() -> "IngestService":
     from private_gpt.server.ingest.ingest_service import IngestService
     return global_injector.get(IngestService)
 
+def get_ingest_job_service() -> "IngestJobService":
+    from private_gpt.server.ingest.ingest_job_service import IngestJobService
+    return global_injector.get(IngestJobService)
+
+# --- Chat Concurrency ---
+
+@cache
+def get_chat_executor() -> ThreadPoolExecutor:
+    """Worker threads running the blocking retrieval and generation of the chat."""
+    return ThreadPoolExecutor(max_workers=settings().ui.chat_workers, thread_name_prefix="ui-chat")
+
+@cache
+def get_chat_limiter() -> ConcurrencyLimiter:
+    limiter = ConcurrencyLimiter(settings().ui.max_concurrent_chats_per_user)
+    register_metrics("ui_chat", lambda: {
+        "workers": settings().ui.chat_workers,
+        "active_chats": limiter.active(),
+        "rejected_chats": limiter.rejected,
+    })
+    return limiter
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """Streaming response calling `release` once it is sent, or abandoned.
+
+    Releasing from the body iterator is not enough: it never starts when the
+    client disconnects before the first chunk, and a generator that never
+    started does not run its `finally` on close.
+    """
+
+    def __init__(self, response: StreamingResponse, release: Callable[[], None]) -> None:
+        super().__init__(
+            response.body_iterator,
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            media_type=response.media_type,
+            background=response.background,
+        )
+        self._release = release
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
 # --- Utility and Authentication ---
 
 async def require_admin(request: Request):
@@ -159,7 +216,7 @@ async def get_chats(request: Request):
     user_id = request.session.get("user_id")
     if not user_id:
         return JSONResponse(content={"error": "User not authenticated"}, status_code=401)
-    sessions = get_all_chat_sessions(user_id)
+    sessions = await run_in_threadpool(get_all_chat_sessions, user_id)
     return JSONResponse(content=sessions)
 
 @api_router.get("/chat/history/{session_id}")
@@ -167,7 +224,7 @@ async def get_history_by_session(session_id: str, request: Request):
     user_id = request.session.get("user_id")
     if not user_id:
         return JSONResponse(content={"error": "User not authenticated"}, status_code=401)
-    history_data = get_chat_history_by_session(user_id, session_id)
+    history_data = await run_in_threadpool(get_chat_history_by_session, user_id, session_id)
     return JSONResponse(content={"history": history_data["messages"]})
 
 @api_router.post("/chat")
@@ -178,6 +235,30 @@ async def chat(
     chunks_service: ChunksService = Depends(get_chunks_service),
     ingest_service: "IngestService" = Depends(get_ingest_service)
 ):
+    # Reject instead of queueing, so one user can't hold every chat worker
+    limiter = get_chat_limiter()
+    limiter_key = request.session.get("user_id") or request.session.get("username")
+    if not limiter.try_acquire(limiter_key):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many chat requests in progress, wait for the current answers to complete.",
+        )
+    try:
+        response = await _chat_response(request, chat_body, chat_service, chunks_service, ingest_service)
+    except BaseException:
+        limiter.release(limiter_key)
+        raise
+    return ReleasingStreamingResponse(response, partial(limiter.release, limiter_key))
+
+async def _chat_response(
+    request: Request,
+    chat_body: ChatBody,
+    chat_service: ChatService,
+    chunks_service: ChunksService,
+    ingest_service: "IngestService",
+) -> StreamingResponse:
+    # Retrieval, reranking and generation are blocking: they run in the chat workers
+    executor = get_chat_executor()
     user_id = request.session.get("user_id")
     user_role = request.session.get("user_role")
     user_teams = request.session.get("user_teams", [])
@@ -192,7 +273,7 @@ async def chat(
         session_id = str(uuid4())
 
     if user_id:
-        save_chat_message(user_id, session_id, 'user', last_message.content, is_new_chat)
+        chat_history_writer.save(user_id, session_id, 'user', last_message.content, is_new_chat)
 
     # NEW: Conditionally add date context
     time_keywords = [
@@ -218,12 +299,13 @@ async def chat(
              context_filter = ContextFilter(docs_ids=chat_body.context_filter.get("docs_ids"))
 
         n_chunks = settings().rag.rerank.top_n if settings().rag.rerank.enabled else settings().rag.similarity_top_k
-        relevant_chunks = chunks_service.retrieve_relevant(
+        relevant_chunks = await run_in_executor(executor, partial(
+            chunks_service.retrieve_relevant,
             text=last_message.content, # Use original message for search
             limit=n_chunks, 
             prev_next_chunks=0,
             context_filter=context_filter
-        )
+        ))
         
         sources_data = [
             {
@@ -240,7 +322,7 @@ async def chat(
         ) or "No relevant documents found for your search."
         
         if user_id:
-            save_chat_message(user_id, session_id, 'assistant', search_response_text, False)
+            chat_history_writer.save(user_id, session_id, 'assistant', search_response_text, False)
 
         async def search_stream_generator():
             if is_new_chat:
@@ -255,12 +337,8 @@ async def chat(
     final_context_filter = None
 
     if user_role != 'admin':
-        all_docs = ingest_service.list_ingested()
-        allowed_doc_ids = [
-            doc.doc_id for doc in all_docs 
-            # --- FIX: Check if any of the user's teams are in the doc's teams ---
-            if any(team in get_document_teams(doc.doc_id) for team in user_teams)
-        ]
+        # Set lookup in the in-memory ACL index, no per-document query
+        allowed_doc_ids = get_allowed_doc_ids(user_teams)
         if not allowed_doc_ids:
             async def empty_stream():
                 yield f"data: {json.dumps({'delta': 'You do not have access to any documents.'})}\n\n"
@@ -273,12 +351,15 @@ async def chat(
                 async def denied_stream():
                     yield f"data: {json.dumps({'delta': 'Access denied to the selected document.'})}\n\n"
                 return StreamingResponse(denied_stream(), media_type="text/event-stream")
+        elif chat_service.vector_store_component.team_filter_enabled:
+            # Filtered in the vector store on the team tags of the chunks
+            final_context_filter = ContextFilter(docs_ids=None, teams=user_teams)
         else:
-            final_context_filter = ContextFilter(docs_ids=allowed_doc_ids)
+            final_context_filter = ContextFilter(docs_ids=sorted(allowed_doc_ids))
     
     elif chat_body.context_filter and chat_body.context_filter.get("docs_ids"):
         # Admin with a specific file selected
-        docs = ingest_service.list_ingested()
+        docs = await run_in_executor(executor, ingest_service.list_ingested)
         # The frontend sends the filename, not the doc_id. We need to find the doc_id.
         selected_filename = chat_body.context_filter.get("docs_ids")[0] # This is actually a filename
         
@@ -292,22 +373,25 @@ async def chat(
             # If no file is selected or found, admin can query all documents
             final_context_filter = None
 
-    completion_gen = chat_service.stream_chat(
+    completion_gen = await run_in_executor(executor, partial(
+        chat_service.stream_chat,
         messages=messages,
         use_context=True,
         context_filter=final_context_filter,
-    )
+    ))
 
     async def stream_generator():
         full_response = ""
         if is_new_chat:
             yield f"data: {json.dumps({'session_id': session_id})}\n\n"
-        for delta in completion_gen.response:
-            text_delta = delta if isinstance(delta, str) else delta.delta
-            full_response += text_delta
-            yield f"data: {json.dumps({'delta': text_delta})}\n\n"
+        # Closed on client disconnect too, which stops the generation in its worker
+        async with aclosing(iterate_in_executor(executor, completion_gen.response)) as deltas:
+            async for delta in deltas:
+                text_delta = delta if isinstance(delta, str) else delta.delta
+                full_response += text_delta
+                yield f"data: {json.dumps({'delta': text_delta})}\n\n"
         if user_id:
-            save_chat_message(user_id, session_id, 'assistant', full_response, False)
+            chat_history_writer.save(user_id, session_id, 'assistant', full_response, False)
         if completion_gen.sources:
             sources_data = [
                 {
@@ -325,35 +409,29 @@ async def chat(
 async def upload_files(
     files: List[UploadFile] = File(...), 
     teams: str = Form(...),
-    ingest_service: "IngestService" = Depends(get_ingest_service)
+    ingest_job_service: "IngestJobService" = Depends(get_ingest_job_service)
 ):
-    temp_paths = []
-    ingested_docs_info = []
-    
+    # The files are ingested in the background: the UI polls the job for progress
     try:
-        temp_dir = Path("temp_uploads")
-        temp_dir.mkdir(exist_ok=True)
-
-        for file in files:
-            temp_path = temp_dir / file.filename
-            with temp_path.open("wb") as buffer:
-                buffer.write(await file.read())
-            temp_paths.append(temp_path)
-            ingested_docs_info.append((str(file.filename), temp_path))
-
-        if ingested_docs_info:
-            ingested_docs = ingest_service.bulk_ingest(ingested_docs_info)
-            team_list = json.loads(teams)
-            
-            for doc in ingested_docs:
-                add_document_teams(doc.doc_id, team_list)
-            
-    finally:
-        for path in temp_paths:
-            if path.exists():
-                path.unlink()
-                
-    return JSONResponse(content={"message": f"{len(files)} file(s) uploaded successfully"}, status_code=200)
+        job = await run_in_threadpool(
+            ingest_job_service.submit,
+            [(str(file.filename), file.file) for file in files],
+            json.loads(teams),
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+
+    return JSONResponse(
+        content={"message": f"{len(files)} file(s) uploaded, ingestion started", "job_id": job.job_id},
+        status_code=202,
+    )
+
+@api_router.get("/upload/jobs/{job_id}", dependencies=[Depends(require_admin)])
+def get_upload_job(job_id: str, ingest_job_service: "IngestJobService" = Depends(get_ingest_job_service)):
+    job = ingest_job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found.")
+    return job
 
 @api_router.get("/files")
 def list_ingested_files(request: Request, ingest_service: "IngestService" = Depends(get_ingest_service)):
@@ -361,6 +439,7 @@ def list_ingested_files(request: Request, ingest_service: "IngestService" = Depe
     user_teams = request.session.get("user_teams", [])
     
     all_docs = ingest_service.list_ingested()
+    allowed_doc_ids = None if user_role == 'admin' else get_allowed_doc_ids(user_teams)
     visible_files = set()
 
     for doc in all_docs:
@@ -369,8 +448,7 @@ def list_ingested_files(request: Request, ingest_service: "IngestService" = Depe
             if not file_name:
                 continue
             
-            doc_teams = get_document_teams(doc.doc_id)
-            if user_role == 'admin' or any(team in doc_teams for team in user_teams):
+            if allowed_doc_ids is None or doc.doc_id in allowed_doc_ids:
                 visible_files.add(file_name)
     
     return JSONResponse(content=[[name] for name in sorted(list(visible_files))])
@@ -389,8 +467,7 @@ def delete_selected_file(file_name: str, ingest_service: "IngestService" = Depen
     if not doc_ids_to_delete:
         raise HTTPException(status_code=404, detail=f"File '{decoded_file_name}' not found.")
 
-    for doc_id in doc_ids_to_delete:
-        ingest_service.delete(doc_id)
+    ingest_service.delete_many(doc_ids_to_delete)
     
     return JSONResponse(content={"message": f"File '{decoded_file_name}' deleted successfully"}, status_code=200)
 
@@ -398,8 +475,7 @@ def delete_selected_file(file_name: str, ingest_service: "IngestService" = Depen
 @api_router.delete("/files", dependencies=[Depends(require_admin)])
 def delete_all_files(ingest_service: "IngestService" = Depends(get_ingest_service)):
     ingested_files = ingest_service.list_ingested()
-    for doc in ingested_files:
-        ingest_service.delete(doc.doc_id)
+    ingest_service.delete_many([doc.doc_id for doc in ingested_files])
     return {"message": "All files deleted successfully"}
 
 # --- Admin Endpoints ---
@@ -439,8 +515,7 @@ async def update_document_permissions(
     if not doc_ids_to_update:
         raise HTTPException(status_code=404, detail=f"No document found with name '{body.file_name}'.")
 
-    for doc_id in doc_ids_to_update:
-        add_document_teams(doc_id, body.teams)
+    await run_in_threadpool(ingest_service.set_document_teams, doc_ids_to_update, body.teams)
 
     return JSONResponse(content={"message": "Permissions updated successfully."})
 
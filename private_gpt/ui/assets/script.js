@@ -76,6 +76,27 @@ document.addEventListener('DOMContentLoaded', () => {
         uploadProgressBar.style.width = `${percent}%`;
     }
 
+    // Polls the ingestion job of an upload until it is finished, showing its progress
+    async function waitForUploadJob(jobId) {
+        while (true) {
+            const response = await fetch(`/api/upload/jobs/${jobId}`);
+            if (!response.ok) {
+                throw new Error(`Unable to get the ingestion progress (${response.status})`);
+            }
+            const job = await response.json();
+            if (job.status === 'succeeded' || job.status === 'failed') {
+                return job;
+            }
+            const total = job.file_names.length;
+            updateUploadProgress(Math.max(5, Math.round(100 * job.processed_files / total)));
+            let message = `Ingesting ${job.processed_files}/${total} file${total > 1 ? 's' : ''}`;
+            if (job.current_file) message += ` (${job.current_file})`;
+            if (job.eta && job.eta !== '(computing)') message += ` - ETA ${job.eta}`;
+            showStatus(message, 'loading');
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
     function setButtonLoading(button, loading) {
         button.classList.toggle('loading', loading);
         button.disabled = loading;
@@ -342,20 +363,18 @@ document.addEventListener('DOMContentLoaded', () => {
         formData.append('teams', JSON.stringify(teams));
     
         try {
-            let progress = 0;
-            const interval = setInterval(() => {
-                progress = Math.min(progress + Math.random() * 10, 90);
-                updateUploadProgress(progress);
-            }, 500);
-    
             const response = await fetch('/api/upload', { method: 'POST', body: formData });
-            clearInterval(interval);
-            updateUploadProgress(100);
     
             if (response.ok) {
                 const result = await response.json();
+                const job = await waitForUploadJob(result.job_id);
+                updateUploadProgress(100);
+                if (job.status === 'failed') {
+                    refreshFileList();
+                    throw new Error(`Ingestion failed: ${job.error || 'unknown error'}`);
+                }
                 setTimeout(() => {
-                    showStatus(result.message || 'Upload successful!', 'success');
+                    showStatus(`${fileCount} file${fileCount > 1 ? 's' : ''} ingested successfully!`, 'success');
                     updateUploadProgress(0);
                     refreshFileList();
                 }, 500);
@@ -0,0 +1,99 @@
+"""Helpers to call blocking code from async endpoints without stalling the loop."""
+
+import asyncio
+import threading
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Hashable, Iterator
+from concurrent.futures import Executor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+_END = object()
+
+
+async def run_in_executor(
+    executor: Executor | None, fn: Callable[..., T], *args: Any
+) -> T:
+    """Run the blocking `fn(*args)` in `executor` and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def iterate_in_executor(
+    executor: Executor | None, iterator: Iterator[T], max_buffer: int = 64
+) -> AsyncIterator[T]:
+    """Consume a blocking iterator in `executor`, yielding its items asynchronously.
+
+    A worker of `executor` drives the iterator and hands the items over through
+    a bounded queue, so a slow consumer pauses the producer instead of buffering
+    the whole output. If the consumer stops early (e.g. the client disconnected),
+    the producer stops at the next item and closes the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[Any] = asyncio.Queue()
+    # Backpressure is applied on the producer thread, which never waits on the loop
+    room = threading.Semaphore(max_buffer)
+    stopped = threading.Event()
+
+    def produce() -> None:
+        try:
+            for item in iterator:
+                room.acquire()
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            outcome: Any = _END
+        except BaseException as e:
+            outcome = e
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        if not stopped.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, outcome)
+
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            room.release()
+            yield item
+    finally:
+        stopped.set()
+        # Wake the producer up if it is waiting for room in the buffer
+        room.release()
+
+
+class ConcurrencyLimiter:
+    """Non-blocking limit on the number of concurrent operations per key."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._active: defaultdict[Hashable, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def try_acquire(self, key: Hashable) -> bool:
+        """Take a slot for `key`, or return False when all of them are in use."""
+        with self._lock:
+            if self.limit > 0 and self._active[key] >= self.limit:
+                self.rejected += 1
+                return False
+            self._active[key] += 1
+            return True
+
+    def release(self, key: Hashable) -> None:
+        with self._lock:
+            self._active[key] -= 1
+            if self._active[key] <= 0:
+                del self._active[key]
+
+    def active(self, key: Hashable | None = None) -> int:
+        with self._lock:
+            if key is not None:
+                return self._active.get(key, 0)
+            return sum(self._active.values())
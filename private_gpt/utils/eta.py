@@ -3,6 +3,7 @@ import logging
 import math
 import time
 from collections import deque
+from collections.abc import Iterable
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -35,9 +36,13 @@ def human_time(*args: Any, **kwargs: Any) -> str:
     return " ".join(parts)
 
 
-def eta(iterator: list[Any]) -> Any:
-    """Report an ETA after 30s and every 60s thereafter."""
-    total = len(iterator)
+def eta(iterator: Iterable[Any], total: int | None = None) -> Any:
+    """Report an ETA after 30s and every 60s thereafter.
+
+    `total` is required when `iterator` has no length.
+    """
+    if total is None:
+        total = len(iterator)  # type: ignore[arg-type]
     _eta = ETA(total)
     _eta.needReport(30)
     for processed, data in enumerate(iterator, start=1):
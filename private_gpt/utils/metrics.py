@@ -0,0 +1,37 @@
+"""In-process registry of runtime metrics.
+
+Components register a callable returning a snapshot of their own counters,
+and the metrics router collects all of them on demand. Snapshots must be cheap
+to compute and JSON serializable.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+MetricsProvider = Callable[[], dict[str, Any]]
+
+_providers: dict[str, MetricsProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def register_metrics(name: str, provider: MetricsProvider) -> None:
+    """Register (or replace) the metrics provider published under `name`."""
+    with _providers_lock:
+        _providers[name] = provider
+
+
+def collect_metrics() -> dict[str, dict[str, Any]]:
+    """Return a snapshot of every registered provider, keyed by name."""
+    with _providers_lock:
+        providers = dict(_providers)
+    snapshot: dict[str, dict[str, Any]] = {}
+    for name, provider in providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception:
+            logger.exception("Failed to collect metrics for provider=%s", name)
+    return snapshot
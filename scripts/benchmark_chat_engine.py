@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Measure the per-request cost of building the RAG chat engine.
+
+Compares building the index, retriever, postprocessors and chat engine from
+scratch on every request (the previous behavior) with the cached objects of
+`ChatService` and `ChunksService`. Only construction is timed: no retrieval
+or generation is run.
+
+Usage: PGPT_PROFILES=local python scripts/benchmark_chat_engine.py -n 500
+"""
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from llama_index.core.chat_engine import ContextChatEngine
+from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.indices.postprocessor import MetadataReplacementPostProcessor
+from llama_index.core.postprocessor import SimilarityPostprocessor
+
+from private_gpt.di import global_injector
+from private_gpt.open_ai.extensions.context_filter import ContextFilter
+from private_gpt.server.chat.chat_service import ChatService
+from private_gpt.server.chunks.chunks_service import ChunksService
+
+if TYPE_CHECKING:
+    from llama_index.core.postprocessor.types import BaseNodePostprocessor
+
+
+def _time_per_call(fn: Callable[[], object], iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(name: str, uncached: list[float], cached: list[float]) -> None:
+    before, after = statistics.median(uncached), statistics.median(cached)
+    print(
+        f"{name:<28} uncached p50={before:8.3f}ms  cached p50={after:8.3f}ms  "
+        f"speedup x{before / after if after else float('inf'):.1f}"
+    )
+
+
+def main(iterations: int) -> None:
+    chat_service = global_injector.get(ChatService)
+    chunks_service = global_injector.get(ChunksService)
+    settings = chat_service.settings
+
+    def build_engine_uncached(context_filter: ContextFilter | None) -> None:
+        index = VectorStoreIndex.from_vector_store(
+            chat_service.vector_store_component.vector_store,
+            storage_context=chat_service.storage_context,
+            llm=chat_service.llm_component.llm,
+            embed_model=chat_service.embedding_component.embedding_model,
+        )
+        retriever = chat_service.vector_store_component.get_retriever(
+            index=index,
+            context_filter=context_filter,
+            similarity_top_k=settings.rag.similarity_top_k,
+        )
+        node_postprocessors: list[BaseNodePostprocessor] = [
+            MetadataReplacementPostProcessor(target_metadata_key="window"),
+        ]
+        if settings.rag.similarity_value:
+            node_postprocessors.append(
+                SimilarityPostprocessor(similarity_cutoff=settings.rag.similarity_value)
+            )
+        if settings.rag.rerank.enabled:
+            node_postprocessors.append(
+                chat_service.rerank_component.postprocessor(settings.rag.rerank.top_n)
+            )
+        ContextChatEngine.from_defaults(
+            retriever=retriever,
+            llm=chat_service.llm_component.llm,
+            node_postprocessors=node_postprocessors,
+        )
+
+    def build_chunks_retriever_uncached() -> None:
+        index = VectorStoreIndex.from_vector_store(
+            chunks_service.vector_store_component.vector_store,
+            storage_context=chunks_service.storage_context,
+            llm=chunks_service.llm_component.llm,
+            embed_model=chunks_service.embedding_component.embedding_model,
+        )
+        chunks_service.vector_store_component.get_retriever(index=index)
+
+    context_filter = ContextFilter(docs_ids=["doc-1", "doc-2"])
+    for name, uncached, cached in [
+        (
+            "chat engine (no filter)",
+            lambda: build_engine_uncached(None),
+            lambda: chat_service._chat_engine(use_context=True),
+        ),
+        (
+            "chat engine (doc filter)",
+            lambda: build_engine_uncached(context_filter),
+            lambda: chat_service._chat_engine(
+                use_context=True, context_filter=context_filter
+            ),
+        ),
+        (
+            "chunks retriever",
+            build_chunks_retriever_uncached,
+            lambda: chunks_service.vector_store_component.get_retriever(
+                index=chunks_service.index
+            ),
+        ),
+    ]:
+        # Warm up the caches and lazy imports before timing
+        uncached()
+        cached()
+        _report(
+            name,
+            _time_per_call(uncached, iterations),
+            _time_per_call(cached, iterations),
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmark_chat_engine.py")
+    parser.add_argument(
+        "-n", "--iterations", type=int, default=200, help="Iterations per case"
+    )
+    main(parser.parse_args().iterations)
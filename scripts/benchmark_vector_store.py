@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Compare the embedded numpy vector store with a local (on disk) Qdrant.
+
+Random clustered vectors stand in for chunk embeddings. For each store the
+time to add them, the p50/p95 query latency and the recall@k against an exact
+search are reported. The numpy store is measured with an exact (flat) search,
+with its IVF quantizer, and with its int8 and binary quantizations (with and
+without the float re-scoring), for which the size of the searched vectors or
+codes is also reported.
+
+Usage: python scripts/benchmark_vector_store.py -n 100000 --dim 768
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+)
+
+from private_gpt.components.vector_store.numpy_vector_store import (
+    CODES_FILE,
+    VECTORS_FILE,
+    NumpyVectorStore,
+)
+
+ADD_BATCH = 1000
+
+
+def _node_id(i: int) -> str:
+    # Qdrant only accepts UUIDs (or integers) as point ids
+    return str(uuid.UUID(int=i))
+
+
+def _dataset(
+    count: int, dim: int, queries: int, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    # Clustered, like the embeddings of documents on a few topics
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 500, 1), dim))
+    vectors = centers[rng.integers(len(centers), size=count)] + rng.normal(
+        scale=0.5, size=(count, dim)
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_vectors = vectors[rng.integers(count, size=queries)] + rng.normal(
+        scale=0.1, size=(queries, dim)
+    )
+    return vectors.astype(np.float32), query_vectors.astype(np.float32)
+
+
+def _nodes(vectors: np.ndarray, start: int) -> list[TextNode]:
+    return [
+        TextNode(
+            id_=_node_id(start + i),
+            text="",
+            embedding=vector.tolist(),
+            relationships={
+                NodeRelationship.SOURCE: RelatedNodeInfo(
+                    node_id=f"doc-{(start + i) // 10}"
+                )
+            },
+        )
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def _run(
+    name: str,
+    store: BasePydanticVectorStore,
+    vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    expected: list[set[str]],
+    k: int,
+    train: bool = False,
+) -> None:
+    start = time.perf_counter()
+    for batch_start in range(0, len(vectors), ADD_BATCH):
+        store.add(_nodes(vectors[batch_start : batch_start + ADD_BATCH], batch_start))
+    if train:
+        assert isinstance(store, NumpyVectorStore)
+        store.train_ivf()
+    add_s = time.perf_counter() - start
+
+    timings = []
+    recalls = []
+    for query_vector, truth in zip(query_vectors, expected, strict=True):
+        start = time.perf_counter()
+        result = store.query(
+            VectorStoreQuery(query_embedding=query_vector.tolist(), similarity_top_k=k)
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(truth.intersection(result.ids or [])) / k)
+    timings.sort()
+    searched = ""
+    if isinstance(store, NumpyVectorStore):
+        # The matrix scanned by the queries: the codes, if quantized
+        root = Path(store.path)
+        codes = root / CODES_FILE
+        size = (codes if codes.exists() else root / VECTORS_FILE).stat().st_size
+        searched = f"  searched={size / 2**20:8.1f}MiB"
+    print(
+        f"{name:<22} add={add_s:7.2f}s  "
+        f"query p50={statistics.median(timings):8.3f}ms  "
+        f"p95={timings[int(len(timings) * 0.95)]:8.3f}ms  "
+        f"recall@{k}={statistics.mean(recalls):.3f}{searched}"
+    )
+
+
+def main(
+    count: int,
+    dim: int,
+    queries: int,
+    k: int,
+    ivf_lists: int,
+    nprobe: int,
+    oversampling: float,
+) -> None:
+    vectors, query_vectors = _dataset(count, dim, queries)
+    exact = np.argsort(-(query_vectors @ vectors.T), axis=1)[:, :k]
+    expected = [{_node_id(int(i)) for i in row} for row in exact]
+    ivf_lists = ivf_lists or max(int(4 * np.sqrt(count)), 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _run(
+            "numpy flat",
+            NumpyVectorStore(path=Path(tmp) / "flat"),
+            vectors,
+            query_vectors,
+            expected,
+            k,
+        )
+        _run(
+            f"numpy ivf/{nprobe}",
+            NumpyVectorStore(
+                path=Path(tmp) / "ivf", ivf_lists=ivf_lists, ivf_nprobe=nprobe
+            ),
+            vectors,
+            query_vectors,
+            expected,
+            k,
+            train=True,
+        )
+        for quantization in ("int8", "binary"):
+            for rescore in (False, True):
+                _run(
+                    f"numpy {quantization}{'+rescore' if rescore else ''}",
+                    NumpyVectorStore(
+                        path=Path(tmp) / f"{quantization}-{rescore}",
+                        quantization=quantization,
+                        rescore=rescore,
+                        oversampling=oversampling,
+                    ),
+                    vectors,
+                    query_vectors,
+                    expected,
+                    k,
+                )
+        try:
+            from llama_index.vector_stores.qdrant import (  # type: ignore
+                QdrantVectorStore,
+            )
+            from qdrant_client import QdrantClient  # type: ignore
+        except ImportError:
+            print(
+                "qdrant skipped, install with `poetry install --extras vector-stores-qdrant`"
+            )
+            return
+        client = QdrantClient(path=str(Path(tmp) / "qdrant"))
+        _run(
+            "qdrant local",
+            QdrantVectorStore(client=client, collection_name="benchmark"),
+            vectors,
+            query_vectors,
+            expected,
+            k,
+        )
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="benchmark_vector_store.py")
+    parser.add_argument("-n", "--count", type=int, default=50_000, help="Vectors")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension")
+    parser.add_argument("-q", "--queries", type=int, default=200, help="Queries")
+    parser.add_argument("-k", "--top-k", type=int, default=10, help="Top k")
+    parser.add_argument(
+        "--ivf-lists", type=int, default=0, help="IVF lists, 0 for 4 * sqrt(n)"
+    )
+    parser.add_argument("--nprobe", type=int, default=16, help="IVF lists probed")
+    parser.add_argument(
+        "--oversampling",
+        type=float,
+        default=3.0,
+        help="Candidates re-scored per result of the quantized searches",
+    )
+    args = parser.parse_args()
+    main(
+        args.count,
+        args.dim,
+        args.queries,
+        args.top_k,
+        args.ivf_lists,
+        args.nprobe,
+        args.oversampling,
+    )
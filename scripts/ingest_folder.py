@@ -2,6 +2,7 @@
 
 import argparse
 import logging
+from collections import Counter
 from pathlib import Path
 
 from private_gpt.di import global_injector
@@ -13,8 +14,11 @@ logger = logging.getLogger(__name__)
 
 
 class LocalIngestWorker:
-    def __init__(self, ingest_service: IngestService, setting: Settings) -> None:
+    def __init__(
+        self, ingest_service: IngestService, setting: Settings, upsert: bool = False
+    ) -> None:
         self.ingest_service = ingest_service
+        self.upsert = upsert
 
         self.total_documents = 0
         self.current_document_count = 0
@@ -59,7 +63,29 @@ class LocalIngestWorker:
 
     def _ingest_all(self, files_to_ingest: list[Path]) -> None:
         logger.info("Ingesting files=%s", [f.name for f in files_to_ingest])
-        self.ingest_service.bulk_ingest([(str(p.name), p) for p in files_to_ingest])
+        files = [(str(p.name), p) for p in files_to_ingest]
+        if not self.upsert:
+            self.ingest_service.bulk_ingest(files)
+            return
+        # Files are matched by name: homonyms would replace each other
+        names = Counter(name for name, _ in files)
+        duplicates = sorted(name for name, count in names.items() if count > 1)
+        if duplicates:
+            logger.warning(
+                "Files with the same name replace each other on upsert names=%s",
+                duplicates,
+            )
+        result = self.ingest_service.upsert(files)
+        logger.info(
+            "Upserted count=%s files: skipped=%s updated=%s added=%s deleted=%s documents "
+            "failed=%s files",
+            len(files),
+            result.skipped,
+            result.updated,
+            result.added,
+            len(result.deleted_doc_ids),
+            len(result.failed_files),
+        )
 
     def ingest_on_watch(self, changed_path: Path) -> None:
         logger.info("Detected change in at path=%s, ingesting", changed_path)
@@ -69,7 +95,10 @@ class LocalIngestWorker:
         try:
             if changed_path.exists():
                 logger.info(f"Started ingesting file={changed_path}")
-                self.ingest_service.ingest_file(changed_path.name, changed_path)
+                if self.upsert:
+                    self.ingest_service.upsert([(changed_path.name, changed_path)])
+                else:
+                    self.ingest_service.ingest_file(changed_path.name, changed_path)
                 logger.info(f"Completed ingesting file={changed_path}")
         except Exception:
             logger.exception(
@@ -85,6 +114,15 @@ parser.add_argument(
     action=argparse.BooleanOptionalAction,
     default=False,
 )
+parser.add_argument(
+    "--upsert",
+    help=(
+        "Replace the previously ingested version of the files, skipping the "
+        "unchanged ones, instead of ingesting them again. Files are matched by name"
+    ),
+    action=argparse.BooleanOptionalAction,
+    default=False,
+)
 parser.add_argument(
     "--ignored",
     nargs="*",
@@ -98,27 +136,30 @@ parser.add_argument(
     default=None,
 )
 
-args = parser.parse_args()
-
-# Set up logging to a file if a path is provided
-if args.log_file:
-    file_handler = logging.FileHandler(args.log_file, mode="a")
-    file_handler.setFormatter(
-        logging.Formatter(
-            "[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
+if __name__ == "__main__":
+    # Not at import time: the spawned parse worker processes import this module
+    args = parser.parse_args()
+
+    # Set up logging to a file if a path is provided
+    if args.log_file:
+        file_handler = logging.FileHandler(args.log_file, mode="a")
+        file_handler.setFormatter(
+            logging.Formatter(
+                "[%(asctime)s.%(msecs)03d] [%(levelname)s] %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S",
+            )
         )
-    )
-    logger.addHandler(file_handler)
+        logger.addHandler(file_handler)
 
-if __name__ == "__main__":
     root_path = Path(args.folder)
     if not root_path.exists():
         raise ValueError(f"Path {args.folder} does not exist")
 
     ingest_service = global_injector.get(IngestService)
     settings = global_injector.get(Settings)
-    worker = LocalIngestWorker(ingest_service, settings)
+    worker = LocalIngestWorker(
+        ingest_service, settings, upsert=args.upsert or settings.embedding.ingest_upsert
+    )
     worker.ingest_folder(root_path, args.ignored)
 
     if args.ignored:
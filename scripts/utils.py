@@ -1,6 +1,7 @@
 import argparse
 import os
 import shutil
+from pathlib import Path
 from typing import Any, ClassVar
 
 from private_gpt.paths import local_data_path
@@ -103,17 +104,49 @@ class Simple:
             wipe_file(str((local_data_path / store).absolute()))
 
 
+class Sqlite:
+    def wipe(self, store_type: str) -> None:
+        assert store_type == "nodestore"
+        from private_gpt.components.node_store.sqlite_kvstore import (
+            NODESTORE_DB_FILE,
+        )
+
+        # The write-ahead log files go with the database
+        for suffix in ("", "-wal", "-shm"):
+            wipe_file(
+                str((local_data_path / f"{NODESTORE_DB_FILE}{suffix}").absolute())
+            )
+
+
 class Chroma:
     def wipe(self, store_type: str) -> None:
         assert store_type == "vectorstore"
         wipe_tree(str((local_data_path / "chroma_db").absolute()))
 
 
-class Qdrant:
-    COLLECTION = (
-        "make_this_parameterizable_per_api_call"  # ?! see vector_store_component.py
-    )
+class Numpy:
+    @staticmethod
+    def _path() -> Path:
+        path = Path(settings().numpy.path)
+        return path if path.is_absolute() else local_data_path / path
 
+    def wipe(self, store_type: str) -> None:
+        assert store_type == "vectorstore"
+        wipe_tree(str(self._path().absolute()))
+
+    def stats(self, store_type: str) -> None:
+        from private_gpt.components.vector_store.numpy_vector_store import (
+            NumpyVectorStore,
+        )
+
+        print(f"Storage for Numpy {store_type}.")
+        metrics = NumpyVectorStore(path=self._path()).metrics()
+        print(f"\tVectors:       {metrics['size']:,}")
+        print(f"\tRows:          {metrics['rows']:,}")
+        print(f"\tIVF lists:     {metrics['ivf_lists']:,}")
+
+
+class Qdrant:
     def __init__(self) -> None:
         try:
             from qdrant_client import QdrantClient  # type: ignore
@@ -121,40 +154,70 @@ class Qdrant:
             raise ImportError("Qdrant dependencies not found") from None
         self.client = QdrantClient(**settings().qdrant.model_dump(exclude_none=True))
 
+    @staticmethod
+    def _collections() -> list[str]:
+        # The default collection, and the ones with an index in the node store
+        from private_gpt.components.ingest.ingest_component import (
+            COLLECTION_INDEX_PREFIX,
+        )
+        from private_gpt.components.node_store.node_store_component import (
+            NodeStoreComponent,
+        )
+        from private_gpt.di import global_injector
+
+        index_store = global_injector.get(NodeStoreComponent).index_store
+        collections = {
+            index_struct.index_id.removeprefix(COLLECTION_INDEX_PREFIX)
+            for index_struct in index_store.index_structs()
+            if index_struct.index_id.startswith(COLLECTION_INDEX_PREFIX)
+        }
+        collections.add(settings().vectorstore.default_collection)
+        return sorted(collections)
+
     def wipe(self, store_type: str) -> None:
         assert store_type == "vectorstore"
-        try:
-            self.client.delete_collection(self.COLLECTION)
-            print("Collection dropped successfully.")
-        except Exception as e:
-            print("Error dropping collection:", e)
+        for collection in self._collections():
+            try:
+                self.client.delete_collection(collection)
+                print(f"Collection {collection} dropped successfully.")
+            except Exception as e:
+                print(f"Error dropping collection {collection}:", e)
 
     def stats(self, store_type: str) -> None:
         print(f"Storage for Qdrant {store_type}.")
-        try:
-            collection_data = self.client.get_collection(self.COLLECTION)
-            if collection_data:
-                # Collection Info
-                # https://qdrant.tech/documentation/concepts/collections/
-                print(f"\tPoints:        {collection_data.points_count:,}")
-                print(f"\tVectors:       {collection_data.vectors_count:,}")
-                print(f"\tIndex Vectors: {collection_data.indexed_vectors_count:,}")
-                return
-        except ValueError:
-            pass
-        print("\t- Qdrant collection not found or empty")
+        for collection in self._collections():
+            try:
+                collection_data = self.client.get_collection(collection)
+                if collection_data:
+                    # Collection Info
+                    # https://qdrant.tech/documentation/concepts/collections/
+                    print(f"\tCollection:    {collection}")
+                    print(f"\tPoints:        {collection_data.points_count:,}")
+                    print(f"\tVectors:       {collection_data.vectors_count:,}")
+                    print(f"\tIndex Vectors: {collection_data.indexed_vectors_count:,}")
+                    continue
+            except ValueError:
+                pass
+            print(f"\t- Qdrant collection {collection} not found or empty")
 
 
 class Command:
     DB_HANDLERS: ClassVar[dict[str, Any]] = {
         "simple": Simple,  # node store
+        "sqlite": Sqlite,  # node store
         "chroma": Chroma,  # vector store
         "postgres": Postgres,  # node, index and vector store
         "qdrant": Qdrant,  # vector store
+        "numpy": Numpy,  # vector store
     }
 
     def for_each_store(self, cmd: str):
-        for store_type in ("nodestore", "vectorstore"):
+        # The node store lists the collections of the vector store, so it is
+        # wiped last
+        store_types = ("nodestore", "vectorstore")
+        if cmd == "wipe":
+            store_types = ("vectorstore", "nodestore")
+        for store_type in store_types:
             database = getattr(settings(), store_type).database
             handler_class = self.DB_HANDLERS.get(database)
             if handler_class is None:
@@ -171,14 +234,28 @@ class Command:
                     f"Unable to execute command '{cmd}' on '{store_type}' in database '{database}'"
                 )
 
+    def tag_teams(self) -> None:
+        from private_gpt.di import global_injector
+        from private_gpt.server.ingest.ingest_service import IngestService
+
+        ingest_service = global_injector.get(IngestService)
+        if not ingest_service.vector_store_component.team_filter_enabled:
+            print("vectorstore.team_filter is disabled or not supported, nothing to do")
+            return
+        print(f"Tagged {ingest_service.tag_all_teams():,} documents with their teams")
+
     def execute(self, cmd: str) -> None:
         if cmd in ("wipe", "stats"):
             self.for_each_store(cmd)
+        elif cmd == "tag-teams":
+            self.tag_teams()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("mode", help="select a mode to run", choices=["wipe", "stats"])
+    parser.add_argument(
+        "mode", help="select a mode to run", choices=["wipe", "stats", "tag-teams"]
+    )
     args = parser.parse_args()
 
     Command().execute(args.mode.lower())
@@ -0,0 +1,76 @@
+import time
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+from private_gpt.components.embedding.adaptive_batcher import AdaptiveEmbeddingBatcher
+
+
+class RecordingEmbedding(MockEmbedding):
+    batches: list[list[str]] = Field(default_factory=list)
+    delay_s: float = 0.0
+    oom_above: int = 0
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        if self.oom_above and len(texts) > self.oom_above:
+            raise RuntimeError("CUDA out of memory")
+        self.batches.append(texts)
+        time.sleep(self.delay_s)
+        return [[float(len(text))] * self.embed_dim for text in texts]
+
+
+def _nodes(lengths: list[int]) -> list[TextNode]:
+    return [TextNode(text="x" * length) for length in lengths]
+
+
+def test_nodes_are_embedded_sorted_by_length_in_their_original_order() -> None:
+    model = RecordingEmbedding(embed_dim=2)
+    batcher = AdaptiveEmbeddingBatcher(model, initial_batch_size=2)
+    nodes = _nodes([30, 10, 20, 40])
+
+    batcher(nodes)
+
+    assert [node.embedding for node in nodes] == [
+        [30.0, 30.0],
+        [10.0, 10.0],
+        [20.0, 20.0],
+        [40.0, 40.0],
+    ]
+    assert [len(text) for text in model.batches[0]] == [10, 20]
+
+
+def test_batch_size_grows_when_fast_and_shrinks_when_slow() -> None:
+    model = RecordingEmbedding(embed_dim=2)
+    batcher = AdaptiveEmbeddingBatcher(
+        model, initial_batch_size=2, max_batch_size=8, target_latency_s=0.05
+    )
+    batcher(_nodes([1] * 30))
+    assert [len(batch) for batch in model.batches] == [2, 4, 8, 8, 8]
+
+    model.delay_s = 0.1
+    batcher(_nodes([1] * 12))
+    assert batcher.batch_size == 2
+
+
+def test_batches_are_cut_by_the_char_budget() -> None:
+    model = RecordingEmbedding(embed_dim=2)
+    batcher = AdaptiveEmbeddingBatcher(
+        model, initial_batch_size=10, max_batch_chars=100
+    )
+
+    batcher(_nodes([40, 40, 40, 150]))
+
+    assert [len(batch) for batch in model.batches] == [2, 1, 1]
+
+
+def test_out_of_memory_batches_are_retried_smaller() -> None:
+    model = RecordingEmbedding(embed_dim=2, oom_above=3)
+    batcher = AdaptiveEmbeddingBatcher(model, initial_batch_size=8)
+    nodes = _nodes([1] * 8)
+
+    batcher(nodes)
+
+    assert all(node.embedding is not None for node in nodes)
+    assert max(len(batch) for batch in model.batches) <= 3
+    assert batcher.metrics()["max_batch_size"] == 2
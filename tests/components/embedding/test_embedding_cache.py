@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+from llama_index.core.embeddings import MockEmbedding
+
+from private_gpt.components.embedding.embedding_cache import CachedEmbedding
+
+
+class CountingEmbedding(MockEmbedding):
+    calls: int = 0
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        self.calls += 1
+        return [float(len(query))] * self.embed_dim
+
+
+def test_repeated_queries_are_served_from_the_cache() -> None:
+    model = CountingEmbedding(embed_dim=4)
+    cached = CachedEmbedding(model, max_size=10)
+
+    first = cached.get_query_embedding("What is PrivateGPT?")
+    second = cached.get_query_embedding("  What is   PrivateGPT? ")
+
+    assert first == second
+    assert model.calls == 1
+    assert cached.metrics()["hits"] == 1
+    assert cached.metrics()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted() -> None:
+    model = CountingEmbedding(embed_dim=4)
+    cached = CachedEmbedding(model, max_size=2)
+
+    cached.get_query_embedding("a")
+    cached.get_query_embedding("bb")
+    cached.get_query_embedding("a")
+    cached.get_query_embedding("ccc")  # Evicts "bb"
+    cached.get_query_embedding("a")
+    cached.get_query_embedding("bb")
+
+    assert model.calls == 4
+
+
+def test_expired_entries_are_embedded_again() -> None:
+    model = CountingEmbedding(embed_dim=4)
+    cached = CachedEmbedding(model, ttl_s=0.05)
+
+    cached.get_query_embedding("question")
+    time.sleep(0.1)
+    cached.get_query_embedding("question")
+
+    assert model.calls == 2
+
+
+def test_cache_is_persisted_across_restarts(tmp_path: Path) -> None:
+    persist_path = tmp_path / "query_cache.json"
+    cached = CachedEmbedding(CountingEmbedding(embed_dim=4), persist_path=persist_path)
+    embedding = cached.get_query_embedding("question")
+    cached.save()
+
+    model = CountingEmbedding(embed_dim=4)
+    restarted = CachedEmbedding(model, persist_path=persist_path)
+
+    assert restarted.get_query_embedding("question") == embedding
+    assert model.calls == 0
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import MockEmbedding
+
+from private_gpt.components.embedding.embedding_cache import CachedEmbedding
+from private_gpt.components.embedding.embedding_store import (
+    VECTORS_FILE,
+    PersistentEmbeddingStore,
+    embedding_key,
+)
+
+
+class CountingEmbedding(MockEmbedding):
+    embedded: list[str] = Field(default_factory=list)
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return [[float(len(text))] * self.embed_dim for text in texts]
+
+
+def test_embeddings_are_read_back_after_a_restart(tmp_path: Path) -> None:
+    store = PersistentEmbeddingStore(tmp_path)
+    store.put_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    restarted = PersistentEmbeddingStore(tmp_path)
+
+    assert restarted.get_many(["b", "c", "a"]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert len(restarted) == 2
+
+
+def test_partially_written_rows_are_dropped(tmp_path: Path) -> None:
+    store = PersistentEmbeddingStore(tmp_path)
+    store.put_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    with (tmp_path / VECTORS_FILE).open("r+b") as f:
+        f.truncate(12)  # Half of the second row is lost
+
+    restarted = PersistentEmbeddingStore(tmp_path)
+
+    assert restarted.get_many(["a", "b"]) == [[1.0, 2.0], None]
+    restarted.put_many(["b"], [[5.0, 6.0]])
+    assert PersistentEmbeddingStore(tmp_path).get_many(["b"]) == [[5.0, 6.0]]
+
+
+def test_only_unseen_texts_are_embedded(tmp_path: Path) -> None:
+    model = CountingEmbedding(embed_dim=2)
+    store = PersistentEmbeddingStore(tmp_path)
+    cached = CachedEmbedding(model, text_store=store)
+
+    first = cached.get_text_embedding_batch(["page 1", "page 2"])
+    second = cached.get_text_embedding_batch(["page 1", "page 2 changed", "page 2"])
+
+    assert second == [first[0], [14.0, 14.0], first[1]]
+    assert model.embedded == ["page 1", "page 2", "page 2 changed"]
+    assert store.get_many([embedding_key(model.model_name, "page 1")]) == [first[0]]
@@ -0,0 +1,64 @@
+import os
+import time
+from collections.abc import Iterator
+
+import pytest
+
+from private_gpt.components.ingest.parse_worker_pool import (
+    ParseTimeoutError,
+    ParseWorkerPool,
+)
+from tests.fixtures.mock_injector import MockInjector
+
+
+# The tasks are functions of the standard library: a function of this module
+# would make the worker processes import it, and the test fixtures, within the
+# timeout of their first task
+@pytest.fixture
+def parse_pool(injector: MockInjector) -> Iterator[ParseWorkerPool]:
+    injector.bind_settings(
+        {
+            "embedding": {
+                "parse_workers": {
+                    "count": 2,
+                    "max_tasks_per_worker": 2,
+                    "timeout_s": 0.5,
+                }
+            }
+        }
+    )
+    pool = injector.get(ParseWorkerPool)
+    yield pool
+    pool.close()
+
+
+def test_tasks_run_in_worker_processes_recycled_after_max_tasks(
+    parse_pool: ParseWorkerPool,
+) -> None:
+    pids = [parse_pool.apply(os.getpid) for _ in range(6)]
+
+    assert os.getpid() not in pids
+    # Never more than 2 tasks per process
+    assert all(pids.count(pid) <= 2 for pid in pids)
+    assert len(set(pids)) >= 3
+
+
+def test_hung_task_times_out_without_blocking_the_next_ones(
+    parse_pool: ParseWorkerPool,
+) -> None:
+    with pytest.raises(ParseTimeoutError):
+        parse_pool.apply(time.sleep, 5)
+
+    assert parse_pool.starmap(time.sleep, [(0.01,), (0.02,)]) == [None, None]
+    assert parse_pool.metrics()["timeouts"] == 1
+    assert parse_pool.metrics()["restarts"] == 1
+
+
+def test_imap_unordered_yields_the_errors_of_failing_items(
+    parse_pool: ParseWorkerPool,
+) -> None:
+    results = dict(parse_pool.imap_unordered(int, ["1", "unparsable", "3"]))
+
+    assert results["1"] == 1
+    assert isinstance(results["unparsable"], ValueError)
+    assert results["3"] == 3
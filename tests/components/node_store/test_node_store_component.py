@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.storage.kvstore import SimpleKVStore
+
+from private_gpt.components.node_store.bulk_docstore import (
+    BulkKVDocumentStore,
+    BulkReadKVStore,
+)
+from private_gpt.components.node_store.node_store_component import NodeStoreComponent
+from private_gpt.components.node_store.sqlite_kvstore import SqliteKVStore
+from tests.fixtures.mock_injector import MockInjector
+
+
+@pytest.mark.parametrize("database", ["simple", "sqlite"])
+def test_nodes_are_read_once_then_cached(
+    injector: MockInjector,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    database: str,
+) -> None:
+    monkeypatch.setattr(
+        "private_gpt.components.node_store.node_store_component.local_data_path",
+        tmp_path,
+    )
+    injector.bind_settings({"nodestore": {"database": database, "node_cache_size": 2}})
+    node_store = injector.get(NodeStoreComponent)
+    node_store.doc_store.add_documents(
+        [TextNode(id_=f"node-{i}", text=str(i)) for i in range(3)]
+    )
+    reads: list[str] = []
+    if database == "sqlite":
+        get_many = SqliteKVStore.get_many
+        monkeypatch.setattr(
+            SqliteKVStore,
+            "get_many",
+            lambda self, keys, collection: reads.extend(keys)
+            or get_many(self, keys, collection),
+        )
+    else:
+        get_document = node_store.doc_store.get_document
+        monkeypatch.setattr(
+            node_store.doc_store,
+            "get_document",
+            lambda node_id, raise_error: reads.append(node_id)
+            or get_document(node_id, raise_error),
+        )
+
+    nodes = node_store.get_nodes(["node-0", "node-1", "node-0", "missing"])
+    assert {i: node.get_content() for i, node in nodes.items()} == {
+        "node-0": "0",
+        "node-1": "1",
+    }
+    assert reads == ["node-0", "node-1", "missing"]
+
+    reads.clear()
+    node_store.get_nodes(["node-1", "node-2"])
+    # node-0 is the least recently used, evicted by node-2
+    node_store.get_nodes(["node-0", "node-1", "node-2"])
+    assert reads == ["node-2", "node-0"]
+
+
+def test_bulk_doc_store_reads_one_by_one_without_a_bulk_kvstore(
+    tmp_path: Path,
+) -> None:
+    assert isinstance(SqliteKVStore(tmp_path / "nodes.db"), BulkReadKVStore)
+    kvstore = SimpleKVStore()
+    assert not isinstance(kvstore, BulkReadKVStore)
+    doc_store = BulkKVDocumentStore(kvstore)
+    doc_store.add_documents([TextNode(id_="node-0", text="0")])
+
+    nodes = doc_store.get_many(["node-0", "missing"])
+
+    assert {i: node.get_content() for i, node in nodes.items()} == {"node-0": "0"}
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+from llama_index.core.schema import Document, TextNode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+
+from private_gpt.components.node_store.sqlite_kvstore import (
+    SqliteKVStore,
+    migrate_simple_stores,
+)
+
+
+def test_entries_are_upserted_and_deleted_one_by_one(tmp_path: Path) -> None:
+    kvstore = SqliteKVStore(tmp_path / "nodestore.db")
+    assert kvstore.is_empty()
+
+    kvstore.put_all([("a", {"value": 1}), ("b", {"value": 2})])
+    kvstore.put("a", {"value": 3})
+    kvstore.put("a", {"value": 4}, collection="other")
+
+    assert kvstore.get("a") == {"value": 3}
+    assert kvstore.get_all() == {"a": {"value": 3}, "b": {"value": 2}}
+    assert kvstore.delete("b")
+    assert not kvstore.delete("b")
+    assert kvstore.get_all("other") == {"a": {"value": 4}}
+
+
+async def test_async_methods_use_the_same_rows(tmp_path: Path) -> None:
+    kvstore = SqliteKVStore(tmp_path / "nodestore.db")
+
+    await kvstore.aput("a", {"value": 1})
+
+    assert await kvstore.aget("a") == {"value": 1}
+    assert await kvstore.adelete("a")
+    assert await kvstore.aget_all() == {}
+
+
+def test_simple_stores_are_migrated(tmp_path: Path) -> None:
+    simple = SimpleDocumentStore()
+    node = TextNode(text="Some text", id_="node-1")
+    node.relationships = {}
+    simple.add_documents([Document(text="Some text", id_="doc-1"), node])
+    simple.set_document_hash("doc-1", "hash-1")
+    simple.persist(str(tmp_path / "docstore.json"))
+
+    kvstore = SqliteKVStore(tmp_path / "nodestore.db")
+    assert migrate_simple_stores(kvstore, tmp_path) > 0
+
+    docstore = KVDocumentStore(kvstore)
+    assert docstore.get_node("node-1").get_content() == "Some text"
+    assert docstore.get_document_hash("doc-1") == "hash-1"
+
+
+def test_many_entries_are_read_at_once(tmp_path: Path) -> None:
+    kvstore = SqliteKVStore(tmp_path / "nodestore.db")
+    kvstore.put_all([(str(i), {"value": i}) for i in range(1200)])
+    kvstore.put("0", {"value": -1}, collection="other")
+
+    found = kvstore.get_many(["0", "1199", "missing", *map(str, range(600, 1100))])
+
+    assert found["0"] == {"value": 0}
+    assert found["1199"] == {"value": 1199}
+    assert "missing" not in found
+    assert len(found) == 502
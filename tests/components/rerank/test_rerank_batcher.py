@@ -0,0 +1,54 @@
+import threading
+
+from private_gpt.components.rerank.rerank_batcher import RerankBatcher
+
+
+def _score_by_length(pairs: list[tuple[str, str]]) -> list[float]:
+    return [float(len(passage)) for _, passage in pairs]
+
+
+def test_concurrent_requests_share_forward_passes() -> None:
+    calls: list[int] = []
+
+    def score_fn(pairs: list[tuple[str, str]]) -> list[float]:
+        calls.append(len(pairs))
+        return _score_by_length(pairs)
+
+    batcher = RerankBatcher(score_fn, window_ms=50, max_batch_size=64)
+    results: dict[int, list[float]] = {}
+
+    def request(i: int) -> None:
+        results[i] = batcher.score([(f"q{i}", "x" * (i + j)) for j in range(4)])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(8):
+        assert results[i] == [float(i + j) for j in range(4)]
+    assert sum(calls) == 32
+    assert len(calls) < 8
+    assert 0 < batcher.metrics()["batch_fill_ratio"] <= 1
+
+
+def test_batches_never_exceed_max_batch_size() -> None:
+    calls: list[int] = []
+
+    def score_fn(pairs: list[tuple[str, str]]) -> list[float]:
+        calls.append(len(pairs))
+        return _score_by_length(pairs)
+
+    batcher = RerankBatcher(score_fn, window_ms=50, max_batch_size=5)
+    threads = [
+        threading.Thread(target=batcher.score, args=([("q", "p")] * 3,))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(calls) == 12
+    assert max(calls) <= 5
@@ -0,0 +1,34 @@
+import json
+from pathlib import Path
+
+from private_gpt.components.tracing.tracing_component import TracingComponent
+from tests.fixtures.mock_injector import MockInjector
+
+
+def test_sampled_traces_are_written_in_background(
+    injector: MockInjector, tmp_path: Path
+) -> None:
+    trace_file = tmp_path / "traces.jsonl"
+    injector.bind_settings(
+        {"tracing": {"enabled": True, "sample_rate": 1, "path": str(trace_file)}}
+    )
+    tracing = injector.get(TracingComponent)
+
+    trace = tracing.start_trace("chat", use_context=True)
+    assert trace is not None
+    with trace.span("retrieve") as span:
+        span["sources"] = 3
+    trace.end()
+    tracing.close()
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert len(records) == 1
+    assert records[0]["name"] == "chat"
+    assert records[0]["attributes"] == {"use_context": True}
+    assert records[0]["spans"][0]["name"] == "retrieve"
+    assert records[0]["spans"][0]["attributes"] == {"sources": 3}
+
+
+def test_nothing_is_sampled_when_disabled(injector: MockInjector) -> None:
+    tracing = injector.get(TracingComponent)
+    assert tracing.start_trace("chat") is None
@@ -0,0 +1,241 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.node_parser import SentenceWindowNodeParser
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import (
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+)
+
+from private_gpt.components.vector_store import numpy_vector_store
+from private_gpt.components.vector_store.numpy_vector_store import (
+    DATA_DIR_PREFIX,
+    META_FILE,
+    NODES_FILE,
+    NumpyVectorStore,
+)
+
+
+def _node(node_id: str, embedding: list[float], doc_id: str, **metadata) -> TextNode:
+    return TextNode(
+        id_=node_id,
+        text=node_id,
+        embedding=embedding,
+        metadata=metadata,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+
+def _data(path: Path) -> Path:
+    """Directory of the data files of the store at `path`."""
+    version = json.loads((path / META_FILE).read_text())["version"]
+    return path / f"{DATA_DIR_PREFIX}{version}"
+
+
+def _query(store: NumpyVectorStore, embedding: list[float], k: int = 2, **kwargs):
+    return store.query(
+        VectorStoreQuery(query_embedding=embedding, similarity_top_k=k, **kwargs)
+    )
+
+
+def _store_with_nodes(path: Path, **kwargs) -> NumpyVectorStore:
+    store = NumpyVectorStore(path=path, **kwargs)
+    store.add(
+        [
+            _node("a", [1.0, 0.0], "doc-1", file_name="a.txt", page=1),
+            _node("b", [0.8, 0.6], "doc-1", file_name="a.txt", page=2),
+            _node("c", [0.0, 1.0], "doc-2", file_name="c.txt", page=1),
+        ]
+    )
+    return store
+
+
+def test_query_returns_the_most_similar_nodes_first(tmp_path: Path) -> None:
+    store = _store_with_nodes(tmp_path)
+
+    result = _query(store, [2.0, 0.1])
+
+    assert result.ids == ["a", "b"]
+    assert result.similarities[0] > result.similarities[1]
+    assert np.isclose(_query(store, [0.0, 3.0], k=1).similarities[0], 1.0)
+
+
+def test_query_filters_on_doc_ids_and_metadata(tmp_path: Path) -> None:
+    store = _store_with_nodes(tmp_path)
+
+    assert _query(store, [1.0, 0.0], k=3, doc_ids=["doc-2"]).ids == ["c"]
+    assert _query(store, [1.0, 0.0], k=3, doc_ids=[]).ids == []
+    filters = MetadataFilters(
+        filters=[
+            MetadataFilter(key="file_name", value="a.txt"),
+            MetadataFilter(key="page", value=1, operator=FilterOperator.GT),
+        ]
+    )
+    assert _query(store, [1.0, 0.0], k=3, filters=filters).ids == ["b"]
+    filters = MetadataFilters(
+        filters=[
+            MetadataFilter(
+                key="doc_id", value=["doc-1", "doc-2"], operator=FilterOperator.IN
+            )
+        ]
+    )
+    assert len(_query(store, [1.0, 0.0], k=3, filters=filters).ids) == 3
+
+
+def test_deleted_documents_are_not_returned_after_a_restart(tmp_path: Path) -> None:
+    store = _store_with_nodes(tmp_path)
+
+    store.delete("doc-1")
+    store.delete_nodes(node_ids=["c"])
+    store.add([_node("d", [1.0, 0.0], "doc-3")])
+    restarted = NumpyVectorStore(path=tmp_path)
+
+    assert _query(restarted, [1.0, 0.0], k=3).ids == ["d"]
+    assert restarted.count == 1
+
+
+def test_incomplete_rows_are_dropped_on_load(tmp_path: Path) -> None:
+    _store_with_nodes(tmp_path, dtype="float16")
+    with (_data(tmp_path) / NODES_FILE).open("a") as f:
+        f.write('["e", "doc-4", {}]\n')
+
+    store = NumpyVectorStore(path=tmp_path)
+
+    assert store.dtype == "float16"
+    assert store.count == 3
+    assert _query(store, [0.0, 1.0], k=1).ids == ["c"]
+
+
+def test_ivf_search_finds_the_nearest_neighbours(tmp_path: Path) -> None:
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(8, 16))
+    vectors = np.repeat(centers, 250, axis=0) + rng.normal(scale=0.1, size=(2000, 16))
+    store = NumpyVectorStore(
+        path=tmp_path, ivf_lists=8, ivf_nprobe=2, ivf_min_rows=1000
+    )
+    store.add(
+        [
+            _node(f"n{i}", vector.tolist(), f"doc-{i}")
+            for i, vector in enumerate(vectors)
+        ]
+    )
+
+    assert store.metrics()["ivf_lists"] == 8
+    hits = sum(
+        _query(store, vectors[i].tolist(), k=1).ids == [f"n{i}"]
+        for i in range(0, 2000, 50)
+    )
+    assert hits == 40
+
+
+def test_index_retrieves_the_nodes_of_the_allowed_documents(tmp_path: Path) -> None:
+    storage_context = StorageContext.from_defaults(
+        vector_store=NumpyVectorStore(path=tmp_path)
+    )
+    index = VectorStoreIndex(
+        [
+            _node("first", [1.0, 0.0], "doc-1"),
+            _node("second", [0.0, 1.0], "doc-2"),
+        ],
+        storage_context=storage_context,
+        store_nodes_override=True,
+        embed_model=MockEmbedding(embed_dim=2),
+        # Any node parser, only to avoid the default one (and its tokenizer)
+        transformations=[SentenceWindowNodeParser.from_defaults()],
+    )
+
+    retriever = index.as_retriever(similarity_top_k=5, doc_ids=["doc-2"])
+    nodes = retriever.retrieve("second")
+
+    assert [node.node.ref_doc_id for node in nodes] == ["doc-2"]
+    assert nodes[0].node.get_content() == "second"
+
+
+def test_queries_return_the_nodes_after_a_compaction(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(numpy_vector_store, "MIN_COMPACT_ROWS", 1)
+    store = _store_with_nodes(tmp_path)
+
+    store.delete("doc-1")
+    result = _query(store, [1.0, 0.0], k=3)
+
+    assert [node.get_content() for node in result.nodes] == ["c"]
+    assert result.nodes[0].ref_doc_id == "doc-2"
+    assert len((_data(tmp_path) / NODES_FILE).read_text().splitlines()) == 1
+    # Only the compacted data version is left
+    assert [p.name for p in tmp_path.glob(f"{DATA_DIR_PREFIX}*")] == ["data-1"]
+    assert _query(NumpyVectorStore(path=tmp_path), [1.0, 0.0]).nodes[0].text == "c"
+
+
+def test_an_interrupted_compaction_keeps_the_previous_version(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(numpy_vector_store, "MIN_COMPACT_ROWS", 1)
+    store = _store_with_nodes(tmp_path)
+
+    def crash(self: NumpyVectorStore, **entries: object) -> None:
+        raise OSError("Crashed before the switch")
+
+    with monkeypatch.context() as m:
+        m.setattr(NumpyVectorStore, "_update_meta", crash)
+        with pytest.raises(OSError):
+            store.delete("doc-1")
+    restarted = NumpyVectorStore(path=tmp_path)
+
+    assert _query(restarted, [1.0, 0.0], k=3).ids == ["c"]
+    assert [p.name for p in tmp_path.glob(f"{DATA_DIR_PREFIX}*")] == ["data-0"]
+
+
+def test_set_metadata_is_kept_after_a_restart(tmp_path: Path) -> None:
+    _store_with_nodes(tmp_path).set_metadata(["doc-1"], {"teams": ["A", "B"]})
+
+    store = NumpyVectorStore(path=tmp_path)
+    filters = MetadataFilters(
+        filters=[MetadataFilter(key="teams", value=["B"], operator=FilterOperator.IN)]
+    )
+
+    assert _query(store, [1.0, 0.0], k=3, filters=filters).ids == ["a", "b"]
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_search_rescores_the_candidates(
+    tmp_path: Path, quantization: str
+) -> None:
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(500, 64))
+    store = NumpyVectorStore(path=tmp_path, quantization=quantization, oversampling=10)
+    store.add(
+        [
+            _node(f"n{i}", vector.tolist(), f"doc-{i}")
+            for i, vector in enumerate(vectors)
+        ]
+    )
+
+    assert (_data(tmp_path) / numpy_vector_store.CODES_FILE).exists()
+    result = _query(store, vectors[7].tolist(), k=1)
+    # Re-scored with the float vector
+    assert result.ids == ["n7"]
+    assert np.isclose(result.similarities[0], 1.0)
+
+
+def test_codes_are_rebuilt_when_the_quantization_changes(tmp_path: Path) -> None:
+    _store_with_nodes(tmp_path)
+    codes_path = _data(tmp_path) / numpy_vector_store.CODES_FILE
+
+    store = NumpyVectorStore(path=tmp_path, quantization="int8", rescore=False)
+    assert codes_path.stat().st_size == 3 * 2
+    assert _query(store, [2.0, 0.1]).ids == ["a", "b"]
+    # Approximate scores without the re-scoring
+    assert 0.95 < _query(store, [0.0, 3.0], k=1).similarities[0] < 1.05
+
+    store = NumpyVectorStore(path=tmp_path)
+    assert not codes_path.exists()
+    assert store.count == 3
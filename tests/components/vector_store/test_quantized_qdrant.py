@@ -0,0 +1,63 @@
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from private_gpt.components.vector_store.quantized_qdrant import (
+    QuantizedQdrantVectorStore,
+    quantization_config,
+)
+
+
+def _store(client: QdrantClient, **kwargs) -> QuantizedQdrantVectorStore:
+    return QuantizedQdrantVectorStore(
+        client=client, collection_name="test", embed_dim=2, **kwargs
+    )
+
+
+def _node(text: str, embedding: list[float]) -> TextNode:
+    # The local qdrant only accepts UUIDs as point ids
+    return TextNode(id_=str(uuid.uuid4()), text=text, embedding=embedding)
+
+
+def test_added_nodes_are_searched_with_the_quantization_params() -> None:
+    client = QdrantClient(":memory:")
+    store = _store(client, quantization="int8", oversampling=2.0)
+    first = _node("first", [1.0, 0.0])
+    store.add([first, _node("second", [0.0, 1.0])])
+    client.search = MagicMock(wraps=client.search)
+
+    result = store.query(
+        VectorStoreQuery(query_embedding=[1.0, 0.1], similarity_top_k=1)
+    )
+
+    assert result.ids == [first.node_id]
+    vectors = client.get_collection("test").config.params.vectors
+    assert isinstance(vectors, models.VectorParams)
+    assert vectors.on_disk
+    search_params = client.search.call_args.kwargs["search_params"]
+    assert search_params.quantization.rescore
+    assert search_params.quantization.oversampling == 2.0
+
+
+def test_existing_collection_is_updated_to_the_quantization() -> None:
+    client = QdrantClient(":memory:")
+    _store(client, quantization="int8").add([_node("first", [1.0, 0.0])])
+    client.update_collection = MagicMock(wraps=client.update_collection)
+
+    _store(client, quantization="binary")
+
+    client.update_collection.assert_called_once()
+    kwargs = client.update_collection.call_args.kwargs
+    assert kwargs["quantization_config"] == quantization_config("binary")
+    assert kwargs["vectors_config"] == {"": models.VectorParamsDiff(on_disk=True)}
+
+
+@pytest.mark.parametrize("name", ["dense_config", "quantization_config"])
+def test_vector_configs_set_by_the_store_are_rejected(name: str) -> None:
+    with pytest.raises(TypeError, match=name):
+        _store(QdrantClient(":memory:"), quantization="int8", **{name: None})
@@ -0,0 +1,139 @@
+import uuid
+from pathlib import Path
+
+import pytest
+from llama_index.core import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.node_parser import SentenceWindowNodeParser
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.core.vector_stores.types import FilterOperator, VectorStoreQuery
+
+from private_gpt.components.vector_store.vector_store_component import (
+    VectorStoreComponent,
+    _doc_id_metadata_filter,
+)
+from private_gpt.open_ai.extensions.context_filter import ContextFilter
+from tests.fixtures.mock_injector import MockInjector
+
+
+def _node(embedding: list[float], doc_id: str) -> TextNode:
+    return TextNode(
+        # Qdrant only accepts UUIDs as point ids
+        id_=str(uuid.uuid4()),
+        text=doc_id,
+        embedding=embedding,
+        metadata={"doc_id": doc_id},
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+
+def test_long_doc_id_lists_are_compiled_to_a_single_in_filter() -> None:
+    context_filter = ContextFilter(docs_ids=["doc-1", "doc-2", "doc-3"])
+
+    filters = _doc_id_metadata_filter(context_filter, "postgres")
+    assert len(filters.filters) == 1
+    assert filters.filters[0].operator == FilterOperator.IN
+    assert filters.filters[0].value == ["doc-1", "doc-2", "doc-3"]
+
+    # Backends without a native IN filter keep one filter per document
+    assert len(_doc_id_metadata_filter(context_filter, "clickhouse").filters) == 3
+
+
+@pytest.mark.parametrize("database", ["numpy", "qdrant"])
+def test_team_filter_only_retrieves_the_documents_of_the_teams(
+    injector: MockInjector, tmp_path: Path, database: str
+) -> None:
+    injector.bind_settings(
+        {
+            "vectorstore": {"database": database, "team_filter": True},
+            "numpy": {"path": str(tmp_path / "numpy")},
+            "qdrant": {"path": str(tmp_path / "qdrant")},
+        }
+    )
+    component = injector.get(VectorStoreComponent)
+    component.vector_store.add(
+        [
+            _node([1.0, 0.0], "doc-1"),
+            _node([0.9, 0.1], "doc-2"),
+            _node([0.8, 0.2], "doc-3"),
+        ]
+    )
+    component.set_document_teams(["doc-1", "doc-2"], ["A"])
+    component.set_document_teams(["doc-2"], ["B"])
+    index = VectorStoreIndex.from_vector_store(
+        component.vector_store,
+        embed_model=MockEmbedding(embed_dim=2),
+        # Not the default splitter, which downloads its tokenizer
+        transformations=[SentenceWindowNodeParser.from_defaults()],
+    )
+
+    retriever = component.get_retriever(
+        index, ContextFilter(docs_ids=None, teams=["A"]), similarity_top_k=5
+    )
+    result = component.vector_store.query(
+        VectorStoreQuery(
+            query_embedding=[1.0, 0.0],
+            query_str="query",
+            similarity_top_k=5,
+            filters=retriever._filters,
+        )
+    )
+    component.close()
+
+    # doc-2 moved to team B, doc-3 has no team
+    assert result.nodes is None or all(
+        node.ref_doc_id == "doc-1" for node in result.nodes
+    )
+    assert len(result.ids) == 1
+
+
+@pytest.mark.parametrize("database", ["numpy", "qdrant"])
+def test_collections_are_searched_apart(
+    injector: MockInjector, tmp_path: Path, database: str
+) -> None:
+    injector.bind_settings(
+        {
+            "vectorstore": {"database": database},
+            "numpy": {"path": str(tmp_path / "numpy")},
+            "qdrant": {"path": str(tmp_path / "qdrant")},
+        }
+    )
+    component = injector.get(VectorStoreComponent)
+    component.get_vector_store().add([_node([1.0, 0.0], "doc-1")])
+    team_store = component.get_vector_store("team-a")
+    assert component.get_vector_store("team-a") is team_store
+    team_store.add([_node([0.9, 0.1], "doc-2")])
+
+    result = team_store.query(
+        VectorStoreQuery(query_embedding=[1.0, 0.0], similarity_top_k=5)
+    )
+    with pytest.raises(ValueError):
+        component.get_vector_store("../team-a")
+    component.close()
+
+    assert result.nodes is not None
+    assert [node.ref_doc_id for node in result.nodes] == ["doc-2"]
+
+
+@pytest.mark.parametrize("database", ["numpy", "qdrant"])
+def test_quantized_vector_stores_find_the_nearest_chunks(
+    injector: MockInjector, tmp_path: Path, database: str
+) -> None:
+    injector.bind_settings(
+        {
+            "vectorstore": {"database": database, "quantization": "binary"},
+            "embedding": {"embed_dim": 2},
+            "numpy": {"path": str(tmp_path / "numpy")},
+            "qdrant": {"path": str(tmp_path / "qdrant")},
+        }
+    )
+    component = injector.get(VectorStoreComponent)
+    component.vector_store.add([_node([1.0, 0.0], "doc-1"), _node([0.0, 1.0], "doc-2")])
+
+    result = component.vector_store.query(
+        VectorStoreQuery(query_embedding=[0.1, 1.0], similarity_top_k=1)
+    )
+    component.close()
+
+    assert result.nodes is not None
+    assert [node.ref_doc_id for node in result.nodes] == ["doc-2"]
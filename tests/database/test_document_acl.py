@@ -0,0 +1,24 @@
+from private_gpt.database.acl import DocumentAclIndex
+
+
+def test_allowed_doc_ids_is_the_union_of_team_documents() -> None:
+    acl = DocumentAclIndex()
+    acl.load([("doc-1", "A"), ("doc-2", "A"), ("doc-2", "B"), ("doc-3", "C")])
+
+    assert acl.allowed_doc_ids(["A"]) == {"doc-1", "doc-2"}
+    assert acl.allowed_doc_ids(["B", "C"]) == {"doc-2", "doc-3"}
+    assert acl.allowed_doc_ids(["unknown"]) == set()
+    assert acl.teams_for("doc-2") == ["A", "B"]
+
+
+def test_index_is_updated_in_place() -> None:
+    acl = DocumentAclIndex()
+    acl.load([("doc-1", "A"), ("doc-2", "A")])
+
+    acl.set_document_teams("doc-1", ["B"])
+    assert acl.allowed_doc_ids(["A"]) == {"doc-2"}
+    assert acl.allowed_doc_ids(["B"]) == {"doc-1"}
+
+    acl.remove_documents(["doc-1", "doc-2"])
+    assert acl.allowed_doc_ids(["A", "B"]) == set()
+    assert acl.teams_for("doc-1") == []
@@ -0,0 +1,46 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import private_gpt.database as database
+from private_gpt.database.history_writer import ChatHistoryWriter
+
+
+@pytest.fixture
+def user_id(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> int:
+    monkeypatch.setattr(database, "DB_FOLDER", tmp_path)
+    monkeypatch.setattr(database, "DB_FILE", tmp_path / "test.db")
+    database.init_db()
+    user = database.get_user("admin")
+    assert user is not None
+    return int(user["id"])
+
+
+def test_queued_messages_are_flushed_on_stop(user_id: int) -> None:
+    writer = ChatHistoryWriter()
+
+    async def chat() -> None:
+        await writer.start()
+        writer.save(user_id, "s1", "user", "what is private gpt", True)
+        writer.save(user_id, "s1", "assistant", "an answer", False)
+        await writer.stop()
+
+    asyncio.run(chat())
+
+    history = database.get_chat_history_by_session(user_id, "s1")
+    assert [m["role"] for m in history["messages"]] == ["user", "assistant"]
+    assert database.get_all_chat_sessions(user_id) == [
+        {"session_id": "s1", "name": "what is private gpt"}
+    ]
+    assert writer.metrics()["written"] == 2
+
+
+def test_save_is_synchronous_when_not_started(user_id: int) -> None:
+    writer = ChatHistoryWriter()
+
+    writer.save(user_id, "s2", "user", "hello", True)
+
+    assert database.get_chat_history_by_session(user_id, "s2")["messages"] == [
+        {"role": "user", "content": "hello"}
+    ]
@@ -0,0 +1,62 @@
+import sqlite3
+from pathlib import Path
+
+from private_gpt.database.migrations import SCHEMA_VERSION, get_schema_version, migrate
+
+
+def _legacy_database(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(
+        """
+        CREATE TABLE chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            message TEXT NOT NULL,
+            session_name TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE document_teams (
+            doc_id TEXT NOT NULL,
+            team TEXT NOT NULL,
+            PRIMARY KEY (doc_id, team)
+        );
+        INSERT INTO chat_history (user_id, session_id, role, message, session_name, timestamp)
+        VALUES
+            (1, 's1', 'user', 'first question', 'first question', '2024-01-01 10:00:00'),
+            (1, 's1', 'assistant', 'answer', NULL, '2024-01-01 10:00:05'),
+            (1, 's2', 'user', 'second', 'second', '2024-01-02 10:00:00'),
+            (2, 's3', 'user', 'other user', 'other user', '2024-01-03 10:00:00');
+        """
+    )
+    return conn
+
+
+def test_migrate_backfills_chat_sessions(tmp_path: Path) -> None:
+    conn = _legacy_database(tmp_path / "legacy.db")
+
+    assert migrate(conn) == SCHEMA_VERSION
+    conn.commit()
+
+    rows = conn.execute(
+        "SELECT session_id, name, created_at, last_activity FROM chat_sessions "
+        "WHERE user_id = 1 ORDER BY created_at DESC"
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [
+        ("s2", "second", "2024-01-02 10:00:00", "2024-01-02 10:00:00"),
+        ("s1", "first question", "2024-01-01 10:00:00", "2024-01-01 10:00:05"),
+    ]
+    indexes = {row["name"] for row in conn.execute("PRAGMA index_list(chat_history)")}
+    assert "idx_chat_history_user_session" in indexes
+
+
+def test_migrate_is_idempotent(tmp_path: Path) -> None:
+    conn = _legacy_database(tmp_path / "legacy.db")
+    migrate(conn)
+    conn.commit()
+
+    assert migrate(conn) == SCHEMA_VERSION
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0] == 3
@@ -0,0 +1,68 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from private_gpt.database.pool import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path: Path):
+    pool = ConnectionPool(tmp_path / "test.db")
+    pool.write(lambda conn: conn.execute("CREATE TABLE t (v INTEGER UNIQUE)"))
+    yield pool
+    pool.close()
+
+
+def test_connections_are_per_thread_and_use_wal(pool: ConnectionPool) -> None:
+    conn = pool.connection()
+    assert pool.connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other: list[sqlite3.Connection] = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_concurrent_writes_are_serialized(pool: ConnectionPool) -> None:
+    threads = [
+        threading.Thread(
+            target=lambda i=i: pool.write(
+                lambda conn: conn.execute("INSERT INTO t (v) VALUES (?)", (i,))
+            )
+        )
+        for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pool.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 20
+    assert pool.write_count == 21
+
+
+def test_failed_write_is_rolled_back(pool: ConnectionPool) -> None:
+    def insert_duplicates(conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT INTO t (v) VALUES (1)")
+        conn.execute("INSERT INTO t (v) VALUES (1)")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        pool.write(insert_duplicates)
+    assert pool.connection().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_connection_is_closed_when_its_thread_exits(pool: ConnectionPool) -> None:
+    pool.connection()
+    connections = pool.metrics()["connections"]
+    other: list[sqlite3.Connection] = []
+    thread = threading.Thread(target=lambda: other.append(pool.connection()))
+    thread.start()
+    thread.join()
+
+    assert pool.metrics()["connections"] == connections
+    with pytest.raises(sqlite3.ProgrammingError):
+        other[0].execute("SELECT 1")
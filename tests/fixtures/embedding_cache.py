@@ -0,0 +1,23 @@
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from private_gpt.paths import local_data_path
+from private_gpt.settings.settings import unsafe_typed_settings
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _wipe_text_embedding_cache() -> Iterator[None]:
+    """Run the tests with an empty text embedding cache, and remove it after.
+
+    The tests ingest into `local_data/tests`, where the cache of the embedded
+    chunks would otherwise grow from one run to the next.
+    """
+    cache_path = Path(unsafe_typed_settings.embedding.text_cache.path)
+    if not cache_path.is_absolute():
+        cache_path = local_data_path / cache_path
+    shutil.rmtree(cache_path, ignore_errors=True)
+    yield
+    shutil.rmtree(cache_path, ignore_errors=True)
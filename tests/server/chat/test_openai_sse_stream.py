@@ -0,0 +1,25 @@
+from collections.abc import AsyncIterator
+
+from private_gpt.open_ai.openai_models import to_openai_sse_stream
+
+
+async def _tokens() -> AsyncIterator[str]:
+    for token in ["Hello", " world"]:
+        yield token
+
+
+async def test_async_token_stream_gives_an_async_event_stream() -> None:
+    events = to_openai_sse_stream(_tokens())
+
+    assert isinstance(events, AsyncIterator)
+    received = [event async for event in events]
+    assert len(received) == 4
+    assert '"content":"Hello"' in received[0]
+    assert received[-1] == "data: [DONE]\n\n"
+
+
+def test_sync_token_stream_gives_a_sync_event_stream() -> None:
+    events = list(to_openai_sse_stream(iter(["Hello", " world"])))
+
+    assert len(events) == 4
+    assert events[-1] == "data: [DONE]\n\n"
@@ -0,0 +1,36 @@
+from itertools import pairwise
+
+from llama_index.core.schema import (
+    NodeRelationship,
+    NodeWithScore,
+    RelatedNodeInfo,
+    TextNode,
+)
+
+from private_gpt.components.node_store.node_store_component import NodeStoreComponent
+from private_gpt.server.chunks.chunks_service import ChunksService
+from tests.fixtures.mock_injector import MockInjector
+
+
+def _chain(texts: list[str]) -> list[TextNode]:
+    nodes = [TextNode(id_=f"sibling-{text}", text=text) for text in texts]
+    for previous, following in pairwise(nodes):
+        previous.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(
+            node_id=following.node_id
+        )
+        following.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(
+            node_id=previous.node_id
+        )
+    return nodes
+
+
+def test_sibling_chunks_are_walked_together(injector: MockInjector) -> None:
+    nodes = _chain(["0", "1", "2", "3", "4"])
+    injector.get(NodeStoreComponent).doc_store.add_documents(nodes)
+    chunks_service = injector.get(ChunksService)
+
+    siblings = chunks_service._get_sibling_nodes_texts(
+        [NodeWithScore(node=nodes[2]), NodeWithScore(node=nodes[0])], 3
+    )
+
+    assert siblings == [(["1", "0"], ["3", "4"]), ([], ["1", "2", "3"])]
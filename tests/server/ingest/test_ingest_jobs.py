@@ -0,0 +1,168 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+from private_gpt.server.ingest.ingest_job_service import IngestJobService
+from private_gpt.server.ingest.ingest_service import IngestService
+from private_gpt.server.ingest.model import IngestJob
+from tests.fixtures.mock_injector import MockInjector
+
+
+def _wait_for(test_client: TestClient, job_id: str) -> IngestJob:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        response = test_client.get(f"/v1/ingest/jobs/{job_id}")
+        assert response.status_code == 200
+        job = IngestJob.model_validate(response.json())
+        if job.status in ("succeeded", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"Ingest job {job_id} did not finish")
+
+
+def test_ingest_job_ingests_the_files_in_the_background(
+    test_client: TestClient,
+) -> None:
+    path = Path(__file__).parents[0] / "test.txt"
+    files = [
+        ("files", ("first.txt", path.open("rb"))),
+        ("files", ("second.txt", path.open("rb"))),
+    ]
+
+    response = test_client.post("/v1/ingest/jobs", files=files)
+
+    assert response.status_code == 202
+    job = _wait_for(test_client, response.json()["job_id"])
+    assert job.status == "succeeded"
+    assert job.processed_files == 2
+    assert len(job.doc_ids) == 2
+    listed = {
+        doc["doc_id"] for doc in test_client.get("/v1/ingest/list").json()["data"]
+    }
+    assert set(job.doc_ids) <= listed
+
+
+def test_unknown_ingest_job_is_not_found(test_client: TestClient) -> None:
+    assert test_client.get("/v1/ingest/jobs/unknown").status_code == 404
+
+
+def test_ingest_jobs_restarted_before_the_workers_are_done_keep_running(
+    injector: MockInjector,
+) -> None:
+    running = threading.Event()
+    release = threading.Event()
+    workers: dict[str, threading.Thread] = {}
+
+    def ingest_file(file_name: str, *args: Any) -> list[Any]:
+        workers[file_name] = threading.current_thread()
+        if file_name == "first.txt":
+            running.set()
+            release.wait(timeout=30)
+        return []
+
+    ingest_service = injector.bind_mock(IngestService)
+    ingest_service.max_upload_size = 1024 * 1024
+    ingest_service.ingest_file = MagicMock(side_effect=ingest_file)
+    service = injector.get(IngestJobService)
+    path = Path(__file__).parents[0] / "test.txt"
+
+    first = service.submit([("first.txt", path.open("rb"))])
+    assert running.wait(timeout=30)
+    service.stop()
+    # The restart waits for the stopped worker to finish the first job
+    restart = threading.Thread(target=service.start)
+    restart.start()
+    release.set()
+    restart.join(timeout=30)
+    second = service.submit([("second.txt", path.open("rb"))])
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = service.get(second.job_id)
+        if job is not None and job.status == "succeeded":
+            break
+        time.sleep(0.05)
+    assert job is not None
+    assert job.status == "succeeded"
+    finished_first = service.get(first.job_id)
+    assert finished_first is not None
+    assert finished_first.status == "succeeded"
+    # The stopped worker exited instead of taking the jobs of the new ones
+    assert workers["second.txt"] is not workers["first.txt"]
+    service.stop()
+
+
+def _wait_for_job(service: IngestJobService, job_id: str) -> IngestJob:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = service.get(job_id)
+        if job is not None and job.status in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Ingest job {job_id} did not finish")
+
+
+def _ingested(file_name: str) -> MagicMock:
+    return MagicMock(doc_id=f"{file_name}-doc")
+
+
+def test_ingest_job_ingests_the_files_by_batches(injector: MockInjector) -> None:
+    injector.bind_settings({"data": {"ingest_job_batch_size": 2}})
+    ingest_service = injector.bind_mock(IngestService)
+    ingest_service.max_upload_size = 1024 * 1024
+    ingest_service.bulk_ingest = MagicMock(
+        side_effect=lambda files, *args: [_ingested(name) for name, _ in files]
+    )
+    ingest_service.ingest_file = MagicMock(
+        side_effect=lambda file_name, *args: [_ingested(file_name)]
+    )
+    service = injector.get(IngestJobService)
+    path = Path(__file__).parents[0] / "test.txt"
+    names = ["first.txt", "second.txt", "third.txt"]
+
+    submitted = service.submit([(name, path.open("rb")) for name in names])
+
+    job = _wait_for_job(service, submitted.job_id)
+    service.stop()
+    assert job.status == "succeeded"
+    assert job.processed_files == 3
+    assert job.doc_ids == [f"{name}-doc" for name in names]
+    batches = [
+        [name for name, _ in call.args[0]]
+        for call in ingest_service.bulk_ingest.call_args_list
+    ]
+    assert batches == [["first.txt", "second.txt"]]
+    # A batch of a single file is ingested like one file
+    assert ingest_service.ingest_file.call_args.args[0] == "third.txt"
+
+
+def test_ingest_job_retries_a_failed_batch_file_by_file(
+    injector: MockInjector,
+) -> None:
+    def ingest_file(file_name: str, *args: Any) -> list[Any]:
+        if file_name == "broken.txt":
+            raise ValueError("Unreadable")
+        return [_ingested(file_name)]
+
+    injector.bind_settings({"data": {"ingest_job_batch_size": 2}})
+    ingest_service = injector.bind_mock(IngestService)
+    ingest_service.max_upload_size = 1024 * 1024
+    ingest_service.bulk_ingest = MagicMock(side_effect=ValueError("Unreadable"))
+    ingest_service.ingest_file = MagicMock(side_effect=ingest_file)
+    service = injector.get(IngestJobService)
+    path = Path(__file__).parents[0] / "test.txt"
+
+    submitted = service.submit(
+        [("broken.txt", path.open("rb")), ("fine.txt", path.open("rb"))]
+    )
+
+    job = _wait_for_job(service, submitted.job_id)
+    service.stop()
+    assert job.status == "failed"
+    assert job.processed_files == 2
+    assert job.doc_ids == ["fine.txt-doc"]
+    assert job.error == "broken.txt: Unreadable"
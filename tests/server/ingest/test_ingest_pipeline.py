@@ -0,0 +1,86 @@
+import uuid
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+from llama_index.core.schema import BaseNode, TransformComponent
+
+from private_gpt.components.ingest.ingest_component import PipelineIngestComponent
+from private_gpt.components.ingest.parse_worker_pool import ParseWorkerPool
+from private_gpt.server.ingest.ingest_service import IngestService
+from tests.fixtures.mock_injector import MockInjector
+
+
+class _FailOn(TransformComponent):
+    """Fails on the nodes containing `text`, while it is set."""
+
+    text: str | None
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        if self.text and any(self.text in node.get_content() for node in nodes):
+            raise ValueError(f"Cannot embed {self.text}")
+        return nodes
+
+
+def test_pipeline_parses_in_workers_and_skips_unreadable_files(
+    injector: MockInjector, tmp_path: Path
+) -> None:
+    service = injector.get(IngestService)
+    component = PipelineIngestComponent(
+        service.storage_context,
+        embed_model=service.ingest_component.embed_model,
+        transformations=service.ingest_component.transformations,
+        parse_pool=injector.get(ParseWorkerPool),
+        count_workers=2,
+    )
+    files = []
+    for i in range(5):
+        path = tmp_path / f"{uuid.uuid4()}.txt"
+        path.write_text(f"Content of the file number {i}.")
+        files.append((path.name, path))
+    files.append(("missing.txt", tmp_path / "missing.txt"))
+
+    documents = component.bulk_ingest(files)
+
+    assert sorted(doc.metadata["file_name"] for doc in documents) == sorted(
+        name for name, _ in files[:5]
+    )
+    stats = component.stats.metrics()
+    assert (stats["parse"]["files"], stats["parse"]["documents"]) == (5, 5)
+    assert stats["embed"]["files"] == 5
+    assert stats["write"]["files"] == 5
+    # Saved in the shared docstore, not in the index of the service
+    ref_docs = service.storage_context.docstore.get_all_ref_doc_info() or {}
+    ingested = {ref_doc.metadata["file_name"] for ref_doc in ref_docs.values()}
+    assert {name for name, _ in files[:5]} <= ingested
+
+
+def test_pipeline_upsert_does_not_record_the_files_that_failed(
+    injector: MockInjector, tmp_path: Path
+) -> None:
+    service = injector.get(IngestService)
+    fail_on = _FailOn(text="broken")
+    component = PipelineIngestComponent(
+        service.storage_context,
+        embed_model=service.ingest_component.embed_model,
+        transformations=[fail_on, *service.ingest_component.transformations],
+        parse_pool=injector.get(ParseWorkerPool),
+        count_workers=2,
+    )
+    good = tmp_path / f"{uuid.uuid4()}.txt"
+    good.write_text("A good file.")
+    bad = tmp_path / f"{uuid.uuid4()}.txt"
+    bad.write_text("A broken file.")
+    files = [(good.name, good), (bad.name, bad)]
+
+    first = component.upsert(files)
+    assert first.failed_files == [bad.name]
+    assert [doc.metadata["file_name"] for doc in first.documents] == [good.name]
+    assert (first.added, first.updated) == (1, 0)
+
+    # The failed file is ingested again, the other one is unchanged
+    fail_on.text = None
+    second = component.upsert(files)
+    assert second.failed_files == []
+    assert [doc.metadata["file_name"] for doc in second.documents] == [bad.name]
+    assert (second.added, second.skipped) == (1, 1)
@@ -1,10 +1,13 @@
 import tempfile
+import uuid
 from pathlib import Path
 
 from fastapi.testclient import TestClient
 
 from private_gpt.server.ingest.ingest_router import IngestResponse
+from private_gpt.server.ingest.ingest_service import IngestService
 from tests.fixtures.ingest_helper import IngestHelper
+from tests.fixtures.mock_injector import MockInjector
 
 
 def test_ingest_accepts_txt_files(ingest_helper: IngestHelper) -> None:
@@ -44,3 +47,82 @@ def test_ingest_plain_text(test_client: TestClient) -> None:
     assert response.status_code == 200
     ingest_result = IngestResponse.model_validate(response.json())
     assert len(ingest_result.data) == 1
+
+
+def test_ingest_bulk_delete_removes_the_documents(test_client: TestClient) -> None:
+    doc_ids = []
+    for text in ("first text", "second text"):
+        response = test_client.post(
+            "/v1/ingest/text", json={"file_name": "bulk_delete", "text": text}
+        )
+        doc_ids.extend(doc["doc_id"] for doc in response.json()["data"])
+
+    response = test_client.request(
+        "DELETE", "/v1/ingest", json={"doc_ids": [*doc_ids, "unknown-doc-id"]}
+    )
+
+    assert response.status_code == 200
+    listed = {
+        doc["doc_id"] for doc in test_client.get("/v1/ingest/list").json()["data"]
+    }
+    assert listed.isdisjoint(doc_ids)
+
+
+def test_ingest_delete_of_an_unknown_document_is_not_found(
+    test_client: TestClient,
+) -> None:
+    response = test_client.post(
+        "/v1/ingest/text", json={"file_name": "single_delete", "text": "text"}
+    )
+    doc_id = response.json()["data"][0]["doc_id"]
+
+    assert test_client.delete(f"/v1/ingest/{doc_id}").status_code == 200
+    assert test_client.delete(f"/v1/ingest/{doc_id}").status_code == 404
+
+
+def test_ingest_collections_are_listed_and_deleted_apart(
+    test_client: TestClient,
+) -> None:
+    collection = "test-collection"
+    response = test_client.post(
+        "/v1/ingest/text",
+        json={"file_name": "collection", "text": "text", "collection": collection},
+    )
+    assert response.status_code == 200
+    doc_ids = [doc["doc_id"] for doc in response.json()["data"]]
+
+    def listed(params: dict[str, str]) -> set[str]:
+        response = test_client.get("/v1/ingest/list", params=params)
+        return {doc["doc_id"] for doc in response.json()["data"]}
+
+    assert listed({"collection": collection}) == set(doc_ids)
+    assert not listed({}) & set(doc_ids)
+
+    # The documents of other collections are not deleted
+    test_client.request("DELETE", "/v1/ingest", json={"doc_ids": doc_ids})
+    assert listed({"collection": collection}) == set(doc_ids)
+    test_client.request(
+        "DELETE", "/v1/ingest", json={"doc_ids": doc_ids, "collection": collection}
+    )
+    assert listed({"collection": collection}) == set()
+
+    response = test_client.get("/v1/ingest/list", params={"collection": "a/b"})
+    assert response.status_code == 422
+
+
+def test_reading_an_unknown_collection_does_not_create_it(
+    test_client: TestClient, injector: MockInjector
+) -> None:
+    # The stores of the tests are kept between runs
+    collection = f"unknown-{uuid.uuid4().hex}"
+    response = test_client.get("/v1/ingest/list", params={"collection": collection})
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+    response = test_client.delete("/v1/ingest/doc", params={"collection": collection})
+    assert response.status_code == 404
+    response = test_client.request(
+        "DELETE", "/v1/ingest", json={"doc_ids": ["doc"], "collection": collection}
+    )
+    assert response.status_code == 200
+
+    assert collection not in injector.get(IngestService).collections()
@@ -0,0 +1,64 @@
+import uuid
+from pathlib import Path
+
+from private_gpt.server.ingest.ingest_service import IngestService
+from tests.fixtures.mock_injector import MockInjector
+
+
+def _write(path: Path, text: str) -> tuple[str, Path]:
+    path.write_text(text)
+    return path.name, path
+
+
+def test_upsert_skips_unchanged_files_and_replaces_changed_ones(
+    injector: MockInjector, tmp_path: Path
+) -> None:
+    service = injector.get(IngestService)
+    path = tmp_path / f"{uuid.uuid4()}.txt"
+
+    first = service.upsert([_write(path, "The first version of the file.")])
+    assert (first.added, first.updated, first.skipped) == (1, 0, 0)
+
+    unchanged = service.upsert([_write(path, "The first version of the file.")])
+    assert (unchanged.added, unchanged.updated, unchanged.skipped) == (0, 0, 1)
+    assert unchanged.documents == []
+
+    changed = service.upsert([_write(path, "The second version of the file.")])
+    assert (changed.added, changed.updated, changed.skipped) == (0, 1, 0)
+    assert changed.documents[0].doc_id == first.documents[0].doc_id
+
+    ingested = [
+        doc
+        for doc in service.list_ingested()
+        if doc.doc_id == first.documents[0].doc_id
+    ]
+    assert len(ingested) == 1
+
+
+def test_upsert_returns_the_unchanged_documents(
+    injector: MockInjector, tmp_path: Path
+) -> None:
+    service = injector.get(IngestService)
+    service.upsert_enabled = True
+    path = tmp_path / f"{uuid.uuid4()}.txt"
+
+    ingested = service.ingest_file(*_write(path, "Some content."))
+    ingested_again = service.ingest_file(path.name, path)
+
+    assert [doc.doc_id for doc in ingested_again] == [doc.doc_id for doc in ingested]
+    assert ingested_again[0].doc_metadata == ingested[0].doc_metadata
+
+
+def test_deleted_documents_are_restored_by_the_next_upsert(
+    injector: MockInjector, tmp_path: Path
+) -> None:
+    service = injector.get(IngestService)
+    path = tmp_path / f"{uuid.uuid4()}.txt"
+    first = service.upsert([_write(path, "Some content.")])
+
+    service.delete_many([doc.doc_id for doc in first.documents])
+    restored = service.upsert([(path.name, path)])
+
+    assert (restored.added, restored.updated, restored.skipped) == (0, 1, 0)
+    listed = {doc.doc_id for doc in service.list_ingested()}
+    assert first.documents[0].doc_id in listed
@@ -0,0 +1,43 @@
+import io
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from private_gpt.server.ingest.ingest_service import IngestService
+from private_gpt.server.ingest.upload import (
+    UploadTooLargeError,
+    spool_upload,
+    upload_directory,
+)
+from tests.fixtures.mock_injector import MockInjector
+
+
+def test_uploads_with_the_same_name_do_not_collide() -> None:
+    with upload_directory() as directory:
+        first = spool_upload(io.BytesIO(b"first"), directory, "../report.pdf")
+        second = spool_upload(io.BytesIO(b"second"), directory, "report.pdf")
+
+        assert first != second
+        assert first.name == second.name == "report.pdf"
+        assert first.is_relative_to(directory)
+        assert (first.read_bytes(), second.read_bytes()) == (b"first", b"second")
+    assert not directory.exists()
+
+
+def test_uploads_larger_than_the_maximum_size_are_rejected() -> None:
+    with upload_directory() as directory, pytest.raises(UploadTooLargeError):
+        spool_upload(io.BytesIO(b"x" * 11), directory, "big.txt", max_size=10)
+
+
+def test_ingest_file_route_rejects_too_large_files(
+    test_client: TestClient, injector: MockInjector
+) -> None:
+    injector.get(IngestService).max_upload_size = 10
+    path = Path(__file__).parents[0] / "test.txt"
+
+    response = test_client.post(
+        "/v1/ingest/file", files={"file": (path.name, path.open("rb"))}
+    )
+
+    assert response.status_code == 413
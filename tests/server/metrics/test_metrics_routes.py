@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from private_gpt.components.rerank.rerank_component import RerankComponent
+from private_gpt.server.metrics.metrics_router import MetricsResponse
+from tests.fixtures.mock_injector import MockInjector
+
+
+def test_metrics_include_rerank_component(
+    test_client: TestClient, injector: MockInjector
+) -> None:
+    injector.get(RerankComponent)
+    response = test_client.get("/v1/metrics")
+    assert response.status_code == 200
+    metrics_response = MetricsResponse.model_validate(response.json())
+    assert metrics_response.data["rerank"]["enabled"] is False
+    assert metrics_response.data["rerank"]["calls"] == 0
@@ -0,0 +1,34 @@
+import contextlib
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+
+from private_gpt.ui.api import ReleasingStreamingResponse
+
+
+async def test_chat_slot_is_released_when_the_client_is_gone() -> None:
+    started = False
+
+    async def body() -> AsyncIterator[str]:
+        nonlocal started
+        started = True
+        yield "data: {}\n\n"
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict[str, Any]) -> None:
+        raise OSError("The client is gone")
+
+    released = []
+    response = ReleasingStreamingResponse(
+        StreamingResponse(body(), media_type="text/event-stream"),
+        lambda: released.append(True),
+    )
+    with contextlib.suppress(OSError):
+        await response({"type": "http"}, receive, send)
+
+    assert not started
+    assert released == [True]
+    assert response.media_type == "text/event-stream"
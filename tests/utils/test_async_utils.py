@@ -0,0 +1,77 @@
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+
+import pytest
+
+from private_gpt.utils.async_utils import (
+    ConcurrencyLimiter,
+    iterate_in_executor,
+    run_in_executor,
+)
+
+
+async def test_blocking_calls_run_in_the_executor() -> None:
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-worker") as pool:
+        thread_name = await run_in_executor(
+            pool, lambda: threading.current_thread().name
+        )
+    assert thread_name.startswith("test-worker")
+
+
+async def test_iterate_in_executor_yields_every_item() -> None:
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        items = [item async for item in iterate_in_executor(pool, iter(range(100)), 4)]
+    assert items == list(range(100))
+
+
+async def test_iterate_in_executor_propagates_errors() -> None:
+    def failing() -> Iterator[int]:
+        yield 1
+        raise ValueError("boom")
+
+    received = []
+
+    async def consume(pool: ThreadPoolExecutor) -> None:
+        async for item in iterate_in_executor(pool, failing()):
+            received.append(item)
+
+    with (
+        ThreadPoolExecutor(max_workers=1) as pool,
+        pytest.raises(ValueError, match="boom"),
+    ):
+        await consume(pool)
+    assert received == [1]
+
+
+async def test_iterate_in_executor_closes_the_iterator_on_early_exit() -> None:
+    closed = threading.Event()
+
+    def endless() -> Iterator[int]:
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        async with aclosing(iterate_in_executor(pool, endless(), 1)) as items:
+            async for item in items:
+                if item == 3:
+                    break
+    assert closed.wait(timeout=5)
+
+
+def test_concurrency_limiter_is_per_key() -> None:
+    limiter = ConcurrencyLimiter(limit=1)
+
+    assert limiter.try_acquire("alice")
+    assert not limiter.try_acquire("alice")
+    assert limiter.try_acquire("bob")
+    limiter.release("alice")
+    assert limiter.try_acquire("alice")
+    assert limiter.active() == 2
+    assert limiter.rejected == 1